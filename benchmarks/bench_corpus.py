@@ -0,0 +1,333 @@
+"""
+Benchmarks of the corpus processing functions on the saved topic corpora.
+
+Each `data/corpus_*.pkl` corpus is benchmarked as saved and scaled up with
+synthetic copies of its documents. Results are written as JSON so that runs
+of two commits can be compared:
+
+    python -m benchmarks.bench_corpus --output before.json
+    python -m benchmarks.bench_corpus --output after.json --compare before.json
+
+The approximate neighbors are also scored by their recall against the exact ones.
+"""
+import os
+import re
+import sys
+import copy
+import glob
+import json
+import time
+import pickle
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+import pandas as pd
+from utils.tools import clean_paragraph
+from utils.func_retrieval import search_engine
+from utils.func_processing import (
+    calculate_similarity_articles,
+    calculate_similarity_neighbors,
+    process_similarity_pairs,
+)
+
+# The dense similarity matrix grows with the square of the number of documents
+DENSE_SIMILARITY_LIMIT = 5000
+# Number of displayed results, as in the app
+RESULTS_SIZE = 15
+
+
+def load_corpus(path:str):
+    """
+    Load a fresh copy of a saved corpus, without its cached tokens, statistics and index.
+
+    Args:
+        path (str): The path to the corpus pickle.
+
+    Returns:
+        Corpus: The corpus.
+    """
+    with open(path, 'rb') as file:
+        corpus = pickle.load(file)
+    # Always build the index instead of loading a persisted one
+    corpus.index_path = None
+    return corpus
+
+
+def scale_corpus(path:str, scale:int):
+    """
+    Load a corpus with `scale` copies of each of its documents. Copies get a
+    numbered title so that every document stays distinct.
+
+    Args:
+        path (str): The path to the corpus pickle.
+        scale (int): The number of copies of each document.
+
+    Returns:
+        Corpus: The scaled corpus.
+    """
+    corpus = load_corpus(path)
+    originals = list(corpus.documents.values())
+    for copy_number in range(1, scale):
+        for doc in originals:
+            synthetic_doc = copy.copy(doc)
+            synthetic_doc.title = f'{doc.title} ({copy_number})'
+            corpus.add(synthetic_doc, doc.author if doc.author is not None else 'Anonymous')
+    return corpus
+
+
+def frequent_words(corpus, count:int=3) -> List[str]:
+    """
+    Returns:
+        list: The most frequent words of the corpus, used as search keywords.
+    """
+    stats = corpus.get_stats()
+    ranked = sorted(zip(stats['count'], stats['word']), reverse=True)
+    return [word for _, word in ranked[:count]]
+
+
+def neighbors_recall(exact:pd.DataFrame, approximate:pd.DataFrame) -> float:
+    """
+    Measure the recall of approximate neighbors. An approximate neighbor is
+    relevant when it is as similar as the least similar exact neighbor, so that
+    neighbors with tied similarities are interchangeable.
+
+    Args:
+        exact (pd.DataFrame): The exact neighbors of `calculate_similarity_neighbors`.
+        approximate (pd.DataFrame): The approximate neighbors of the same articles.
+
+    Returns:
+        float: The share of the exact neighbors found, 1.0 without exact neighbors.
+    """
+    if len(exact) == 0:
+        return 1.0
+    grouped = exact.groupby('unique_id')['similarity']
+    expected = grouped.size()
+    approximate = approximate.join(grouped.min().rename('least_similar'), on='unique_id')
+    relevant = approximate[approximate['similarity'] >= approximate['least_similar'] - 1e-6]
+    found = relevant.groupby('unique_id').size().reindex(expected.index, fill_value=0)
+    return float(found.clip(upper=expected).sum() / expected.sum())
+
+
+def corpus_benchmarks(path:str, scale:int) -> Tuple[int, Dict[str, tuple], Dict[str, Callable]]:
+    """
+    Prepare the benchmarks of a corpus.
+
+    The inputs of the benchmarks, such as the index or the exact neighbors, are
+    built on the first setup needing them, so only the inputs of the benchmarks
+    run are built.
+
+    Args:
+        path (str): The path to the corpus pickle.
+        scale (int): The number of copies of each document.
+
+    Returns:
+        tuple: The number of documents of the scaled corpus, for each benchmark
+            name, a setup function returning the arguments of the timed function and
+            the timed function, and for some benchmarks a function computing their
+            quality measures, such as the 'recall' of the approximate neighbors.
+            Setups and measures are not timed.
+    """
+    corpus = scale_corpus(path, scale)
+    # Derived structures are not pickled, the copies are always fresh
+    frozen = lru_cache(maxsize=None)(lambda: pickle.dumps(corpus))
+    fresh_corpus = lambda: (pickle.loads(frozen()),)
+
+    collection = lru_cache(maxsize=None)(corpus.docs_to_collection)
+    texts = lru_cache(maxsize=None)(lambda: [doc.text for doc in collection()])
+    keywords = lru_cache(maxsize=None)(lambda: frequent_words(corpus))
+    index = lru_cache(maxsize=None)(corpus.get_index)
+
+    @lru_cache(maxsize=None)
+    def df():
+        df = corpus.to_dataframe()
+        df['unique_id'] = df['source'].astype(str) + '_' + df['id'].astype(str)
+        return df
+
+    neighbors = lru_cache(maxsize=None)(lambda: calculate_similarity_neighbors(df().copy(), k=3))
+    approximate_neighbors = lru_cache(maxsize=None)(
+        lambda: calculate_similarity_neighbors(df().copy(), k=3, method='ann'))
+
+    benchmarks = {
+        'clean_paragraph': (lambda: (texts(),), lambda texts: [clean_paragraph(text) for text in texts]),
+        'get_stats': (fresh_corpus, lambda corpus: corpus.get_stats()),
+        'build_index': (fresh_corpus, lambda corpus: corpus.get_index()),
+        'search_engine': (lambda: (collection(), keywords(), index()),
+                          lambda collection, keywords, index: search_engine(collection, keywords, index=index)),
+        'calculate_similarity_neighbors': (lambda: (df().copy(),),
+                                           lambda df: calculate_similarity_neighbors(df, k=3)),
+        'calculate_similarity_neighbors_ann': (lambda: (df().copy(),),
+                                               lambda df: calculate_similarity_neighbors(df, k=3, method='ann')),
+        'process_similarity_pairs': (lambda: (df(), neighbors(), df()['unique_id'].head(RESULTS_SIZE)),
+                                     process_similarity_pairs),
+        'calculate_word_freq_per_year': (lambda: (pickle.loads(frozen()), keywords()),
+                                         lambda corpus, keywords: corpus.calculate_word_freq_per_year(keywords)),
+    }
+    if len(corpus.documents) <= DENSE_SIMILARITY_LIMIT:
+        benchmarks['calculate_similarity_articles'] = (lambda: (df().copy(),), calculate_similarity_articles)
+    measures = {
+        'calculate_similarity_neighbors_ann': lambda: {'recall': neighbors_recall(neighbors(), approximate_neighbors())},
+    }
+    return len(corpus.documents), benchmarks, measures
+
+
+def time_benchmark(setup:Callable, function:Callable, repeat:int) -> List[float]:
+    """
+    Time a function, its arguments being prepared by `setup` before each run.
+
+    Returns:
+        list: The durations of the runs, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def git_commit() -> str | None:
+    """
+    Returns:
+        str | None: The current git commit, or None outside a git repository.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(paths:List[str], scales:List[int], repeat:int=3, only:List[str]=None) -> dict:
+    """
+    Run the benchmarks of every corpus at every scale.
+
+    Args:
+        paths (list): The paths to the corpus pickles.
+        scales (list): The scales of the corpora.
+        repeat (int, optional): The number of runs of each benchmark. Defaults to 3.
+        only (list, optional): The names of the benchmarks to run. Defaults to all.
+
+    Returns:
+        dict: The run with its 'meta' data and its 'results', one per corpus,
+            scale and benchmark, with the 'min' and 'median' durations in seconds
+            and the quality measures of the benchmark.
+    """
+    results = []
+    for path in paths:
+        topic = re.sub(r'^corpus_|\.pkl$', '', os.path.basename(path))
+        for scale in scales:
+            documents, benchmarks, measures = corpus_benchmarks(path, scale)
+            for name, (setup, function) in benchmarks.items():
+                if only and name not in only:
+                    continue
+                timings = time_benchmark(setup, function, repeat)
+                quality = measures[name]() if name in measures else {}
+                results.append({
+                    'corpus': topic,
+                    'scale': scale,
+                    'documents': documents,
+                    'benchmark': name,
+                    'min': min(timings),
+                    'median': statistics.median(timings),
+                    'repeat': repeat,
+                    **quality,
+                })
+                quality = ''.join(f' {measure}={value:.3f}' for measure, value in quality.items())
+                logging.info(f'{topic} x{scale} ({documents} documents) {name}: {min(timings):.4f}s{quality}')
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline:dict, current:dict, threshold:float=1.1, min_delta:float=0.001) -> List[dict]:
+    """
+    Compare the minimum durations of two runs.
+
+    Args:
+        baseline (dict): The reference run, as returned by `run`.
+        current (dict): The run to compare.
+        threshold (float, optional): The ratio of durations above which a benchmark
+            is a regression. Defaults to 1.1.
+        min_delta (float, optional): The slowdown in seconds under which a benchmark
+            is not a regression, whatever the ratio. Defaults to 0.001.
+
+    Returns:
+        list: For each benchmark of both runs, its key, both durations, their
+            ratio and whether it is a regression.
+    """
+    key = lambda result: (result['corpus'], result['scale'], result['benchmark'])
+    baseline_results = {key(result): result for result in baseline['results']}
+    comparison = []
+    for result in current['results']:
+        reference = baseline_results.get(key(result))
+        if reference is None:
+            continue
+        ratio = result['min'] / reference['min'] if reference['min'] > 0 else float('inf')
+        comparison.append({
+            'corpus': result['corpus'],
+            'scale': result['scale'],
+            'benchmark': result['benchmark'],
+            'baseline': reference['min'],
+            'current': result['min'],
+            'ratio': ratio,
+            'regression': ratio > threshold and result['min'] - reference['min'] > min_delta,
+        })
+    return comparison
+
+
+def main(argv:List[str]=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data', default='data', help='directory of the corpus_*.pkl files')
+    parser.add_argument('--topics', nargs='*', help='topics to benchmark, defaults to all')
+    parser.add_argument('--scales', default='1,10,100', help='comma separated corpus scales')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark')
+    parser.add_argument('--only', nargs='*', help='benchmarks to run, defaults to all')
+    parser.add_argument('--output', help='JSON file of the results, defaults to stdout')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.1, help='slowdown ratio of a regression')
+    parser.add_argument('--min-delta', type=float, default=0.001, help='slowdown in seconds of a regression')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    paths = sorted(glob.glob(os.path.join(args.data, 'corpus_*.pkl')))
+    if args.topics:
+        paths = [path for path in paths
+                 if re.sub(r'^corpus_|\.pkl$', '', os.path.basename(path)) in args.topics]
+    scales = [int(scale) for scale in args.scales.split(',')]
+
+    current = run(paths, scales, repeat=args.repeat, only=args.only)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(current, file, indent=2)
+    else:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        comparison = compare(baseline, current, args.threshold, args.min_delta)
+        for row in comparison:
+            flag = ' REGRESSION' if row['regression'] else ''
+            print(f"{row['corpus']:>16} x{row['scale']:<4} {row['benchmark']:<32} "
+                  f"{row['baseline']:.4f}s -> {row['current']:.4f}s ({row['ratio']:.2f}x){flag}",
+                  file=sys.stderr)
+        return 1 if any(row['regression'] for row in comparison) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
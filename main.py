@@ -1,26 +1,23 @@
 import os
 import logging
+import multiprocessing
 import time
 import pandas as pd
 import plotly.graph_objs as go
 import dash_bootstrap_components as dbc
 from config import img
-from dash import Dash, dash_table, html, dcc
+from dash import Dash, dash_table, html, dcc, ctx, no_update
 from dash.dependencies import Input, Output, State
+from flask import Response
+from modules.jobs import DEFAULT_WORKERS, JobQueue, PENDING, RUNNING, FAILED, CANCELLED
 from utils.tools import (
-    clean_paragraph, 
     clean_text, 
     normalize_value,
     label_from_normalized_value,
 )
-from utils.func_processing import (
-    calculate_similarity_articles,
-    process_similarity_pairs,
-)
-from utils.func_retrieval import (
-    search_documents,
-    search_engine,   
-)
+from utils.func_pipeline import search_pipeline
+from utils.func_warmup import warm_up
+from utils.instrumentation import METRICS, enable, record_counters, record_spans, timed
 
 path = os.path.dirname(os.path.abspath(__file__))
 
@@ -28,6 +25,14 @@ df = pd.read_csv(f'{path}/data/subjects.csv', header=0)
 df.rename(columns={0: 'Subject', 1: 'Subreddit'}, inplace=True)
 
 PAGE_SIZE = 15
+RESULTS_SIZE = 15
+# Interval between two progress updates of a search, in milliseconds
+POLL_INTERVAL = 500
+
+# Searches run in worker processes, started after the warm-up. Each worker ends
+# up with its own copy of the warm corpora, so their number bounds the memory
+SEARCH_WORKERS = int(os.environ.get('SEARCH_WORKERS', DEFAULT_WORKERS))
+jobs = JobQueue(max_workers=SEARCH_WORKERS)
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.BOOTSTRAP])
 
@@ -67,6 +72,16 @@ keyword_input = html.Div(
             color="secondary",
         ),
         html.Br(),
+        dbc.RadioItems(
+            options=[
+                {"label": "Cosine", "value": "cosine"},
+                {"label": "BM25", "value": "bm25"},
+                {"label": "BM25F", "value": "bm25f"},
+            ],
+            value="cosine",
+            id="ranking-select",
+            inline=True,
+        ),
     ],
     className="mb-6",
 )
@@ -75,8 +90,16 @@ loading_obj = dbc.Spinner(
     id="tab-response",
     children=[html.Div([html.Div(id="loading-output-2")])],
     color="primary",
+    # Progress polls are quick, the spinner only shows for the final rendering
+    delay_show=POLL_INTERVAL,
 )
 
+job_progress = html.Div([
+    html.Div(id="job-progress"),
+    dcc.Store(id="job-id"),
+    dcc.Interval(id="job-poll", interval=POLL_INTERVAL, disabled=True),
+])
+
 button = dbc.Button("Submit", color="primary", className="me-1", id="add-btn")
 
 form = dbc.Form([
@@ -91,6 +114,7 @@ form = dbc.Form([
         dbc.Col(
             html.Div([
                 dbc.Col(html.Div([html.H2("Search Results")])),
+                job_progress,
                 html.Div([loading_obj]),
             ])
         ),
@@ -100,13 +124,184 @@ form = dbc.Form([
 app.layout = dbc.Container(form, fluid=True)
 
 
+@timed('render_results')
+def render_results(data:dict) -> tuple:
+    """
+    Build the results page and the word trends figure of a search.
+
+    Args:
+        data (dict): The results of `search_pipeline`.
+
+    Returns:
+        tuple: The results component and the trends figure.
+    """
+    fig = go.Figure()
+    if len(data['results']) == 0:
+        response =  dbc.Alert(
+            [
+                html.I(className="bi bi-exclamation-triangle-fill me-2"),
+                "No data found for this topic and keyword combination",
+            ],
+            color="warning",
+            className="d-flex align-items-center",
+        )
+        return response, fig
+
+    accordion_content = []
+    for result in data['results']:
+        document = result['document']
+        s_cards = [dbc.Col(html.Div([html.H4("Similar content")])), html.Br()]
+        for similar_doc in result['similar']:
+            normalized_score = normalize_value(similar_doc['similarity'], 0, 0.01)
+            score = label_from_normalized_value(normalized_score)
+            if score == 2:
+                score_etiqute = dbc.Button("Very Hight", size="sm", color="success", href=similar_doc['url'], target="_blank"),
+            elif score == 1:
+                score_etiqute = dbc.Button("High", size="sm", color="info", href=similar_doc['url'], target="_blank"),
+            else:   
+                score_etiqute = dbc.Button("Low", size="sm", color="secondary", href=similar_doc['url'], target="_blank"),
+                
+            if similar_doc['source'] == 'reddit':
+                img_path = img.get('reddit_logo')
+            else:
+                img_path = img.get('arxiv_logo')
+            s_cards.append(
+                dbc.Card(
+                    [
+                        dbc.CardBody(
+                            [
+                                dbc.Row([
+                                    dbc.Col(html.H5(f"{similar_doc['source']}", className="card-title")),
+                                    dbc.Col(html.Img(src=img_path, width="25", height="25"),width="auto")
+                                ]),
+                                html.P(f"{similar_doc['title']}"),
+                                html.Hr(),
+                                html.A("Article link", href=similar_doc['url'], target="_blank"),
+                                html.Br(),
+                                dbc.Row([
+                                    dbc.Col(dbc.FormText(f"Similarity etiquet:"), width="auto"),
+                                    dbc.Col(score_etiqute, width="auto")
+                                ]),
+                            ]
+                        )
+                    ],
+                    style={"width": "18rem"},
+                )
+            )
+
+        similarity_cards = dbc.Row(
+            [dbc.Col(card, width="auto") if len(s_cards) > 0 else html.Div([html.H4("No similar content")])
+             for card in s_cards]
+        )
+        if document['source'] == 'reddit':
+            acc_img_path = img.get('reddit_logo')
+        else:  
+            acc_img_path = img.get('arxiv_logo')
+            
+        accordion_content.append(
+            dbc.AccordionItem(
+                html.Div(
+                    [   
+                        
+                        dbc.Row([
+                            dbc.Col(html.Img(src=acc_img_path, width="25", height="25"),width="auto"),
+                            dbc.Col(html.H1(clean_text(document['title']))), 
+                        ]),
+                        dbc.Col(html.P(document['text'])),
+                        dbc.Col(dbc.FormText(f"Author: {document['author']}")),
+                        dbc.Col(dbc.CardLink("Article link", href=document['url'],target="_blank")),
+                        dbc.Col(dbc.Row(similarity_cards))
+                    ]
+                ),
+                str(document),
+                title=f"{document['id']}-{clean_text(document['title'])} - {document['source']}",
+                item_id=f"item-{len(accordion_content)}"
+            )
+        )
+
+    response = dbc.Row([
+        dbc.FormText(f"Showing {len(accordion_content)} of {data['total_hits']} results"),
+        dbc.Row([
+            html.Div(
+                dbc.Accordion(
+                    accordion_content,
+                    flush=True,
+                    active_item="item-0",
+                ),
+            )
+        ])
+    ])
+
+    word_trends = data['trends']
+    for word in word_trends.columns:
+        fig.add_trace(go.Scatter(x=word_trends.index, y=word_trends[word], mode='lines+markers', name=word))
+     
+    fig.update_layout(
+        title='Evolution of Word Usage Over Time',
+        xaxis_title='Year',
+        yaxis_title='Word Count',
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+    )
+    return response, fig
+
+
+def poll_search(job_id:str) -> tuple:
+    """
+    Report the progress of a search job, or render its results once done.
+
+    Args:
+        job_id (str): The id of the search job.
+
+    Returns:
+        tuple: The outputs of `render_tab_content`.
+    """
+    try:
+        status = jobs.status(job_id)
+    except KeyError:
+        return no_update, no_update, None, None, True
+
+    if status['state'] in (PENDING, RUNNING):
+        progress = dbc.Progress(value=100 * (status['progress'] or 0),
+                                label=status['stage'] or 'Waiting', striped=True, animated=True)
+        return no_update, no_update, progress, job_id, False
+    if status['state'] == CANCELLED:
+        return no_update, no_update, None, None, True
+    if status['state'] == FAILED:
+        logging.error(status['error'])
+        response = dbc.Alert(
+            [
+                html.I(className="bi bi-x-octagon-fill me-2"),
+                f"The search failed: {status['error']}",
+            ],
+            color="danger",
+            className="d-flex align-items-center",
+        )
+        return response, go.Figure(), None, None, True
+
+    data = jobs.result(job_id)
+    # Stages and cache lookups run in a worker process, count them here once
+    record_spans(data.pop('spans', []))
+    record_counters(data.pop('counters', {}))
+    response, fig = render_results(data)
+    return response, fig, None, None, True
+
+
 @app.callback(
     Output('tab-response', 'children'),
     Output('word-evo-graph', 'figure'),
-    [Input("add-btn", "n_clicks"), State("keyword-text", "value"), State("tbl", "active_cell")]
+    Output('job-progress', 'children'),
+    Output('job-id', 'data'),
+    Output('job-poll', 'disabled'),
+    [Input("add-btn", "n_clicks"), Input("job-poll", "n_intervals"),
+     State("keyword-text", "value"), State("tbl", "active_cell"),
+     State("ranking-select", "value"), State("job-id", "data")]
 )
-def render_tab_content(n_clicks, keyword_text, active_cell):
+@timed('render_tab_content')
+def render_tab_content(n_clicks, n_intervals, keyword_text, active_cell, ranking, job_id):
     
+    if ctx.triggered_id == 'job-poll' and job_id is not None:
+        return poll_search(job_id)
+
     # default response
     response = dbc.Alert(
         [
@@ -117,151 +312,34 @@ def render_tab_content(n_clicks, keyword_text, active_cell):
         className="d-flex align-items-center",
     ),
     
-    fig = go.Figure()
     if active_cell and keyword_text is not None:
         arxiv_kw = df.iloc[active_cell['row']]['Subject']
         subreddit_kw = df.iloc[active_cell['row']]['Subreddit']
 
-        try:
-            search_request = [
-                {'type': 'reddit', 'keyword': subreddit_kw, 'topic': subreddit_kw, 'quantity': 100},
-                {'type': 'arxiv', 'keyword': arxiv_kw, 'topic': subreddit_kw, 'quantity': 100}
-            ]
-
-            corpus = search_documents(search_request)
-            tokens_kw = clean_paragraph(keyword_text)
-            df_corpus = corpus.to_dataframe()
-
-            response_search_engine = search_engine(corpus.docs_to_collection(), tokens_kw)
-            df_scores = pd.DataFrame(response_search_engine)
-            
-            if len(df_scores) > 0:
-                df_scores['id'] = df_scores['id'].astype(str)
-                df_corpus['id'] = df_corpus['id'].astype(str)
-                df_corpus['unique_id'] = df_corpus['source'] + '_' + df_corpus['id'].astype(str)
-
-                df_corpus_filtered = df_corpus[df_corpus['id'].isin(df_scores['id'])]
-                similarity_df = calculate_similarity_articles(df_corpus)
-
-                similarity_pairs = process_similarity_pairs(df_corpus, similarity_df)
-                accordion_content = []
-
-                for document in df_corpus_filtered.to_dict('records'):
-                    s_cards = [dbc.Col(html.Div([html.H4("Similar content")])), html.Br()]
-                    if len(accordion_content) < 15:
-                        if str(document['id']) in similarity_pairs[document['source']]:
-                            for similar_document in similarity_pairs[document['source']][str(document['id'])]:
-                                similar_doc = corpus.get_document(similar_document['similar_id'])
-                                normalized_score = normalize_value(float(similar_document['similarity']), 0, 0.01)
-                                score = label_from_normalized_value(normalized_score)
-                                if score == 2:
-                                    score_etiqute = dbc.Button("Very Hight", size="sm", color="success", href=similar_doc.url, target="_blank"),
-                                elif score == 1:
-                                    score_etiqute = dbc.Button("High", size="sm", color="info", href=similar_doc.url, target="_blank"),
-                                else:   
-                                    score_etiqute = dbc.Button("Low", size="sm", color="secondary", href=similar_doc.url, target="_blank"),
-                                    
-                                if similar_doc.source == 'reddit':
-                                    img_path = img.get('reddit_logo')
-                                else:
-                                    img_path = img.get('arxiv_logo')
-                                s_cards.append(
-                                    dbc.Card(
-                                        [
-                                            dbc.CardBody(
-                                                [
-                                                    dbc.Row([
-                                                        dbc.Col(html.H5(f"{similar_doc.source}", className="card-title")),
-                                                        dbc.Col(html.Img(src=img_path, width="25", height="25"),width="auto")
-                                                    ]),
-                                                    html.P(f"{similar_doc.title}"),
-                                                    html.Hr(),
-                                                    html.A("Article link", href=similar_doc.url, target="_blank"),
-                                                    html.Br(),
-                                                    dbc.Row([
-                                                        dbc.Col(dbc.FormText(f"Similarity etiquet:"), width="auto"),
-                                                        dbc.Col(score_etiqute, width="auto")
-                                                    ]),
-                                                ]
-                                            )
-                                        ],
-                                        style={"width": "18rem"},
-                                    )
-                                )
-
-                        similarity_cards = dbc.Row(
-                            [dbc.Col(card, width="auto") if len(s_cards) > 0 else html.Div([html.H4("No similar content")])
-                             for card in s_cards]
-                        )
-                        if document['source'] == 'reddit':
-                            acc_img_path = img.get('reddit_logo')
-                        else:  
-                            acc_img_path = img.get('arxiv_logo')
-                            
-                        accordion_content.append(
-                            dbc.AccordionItem(
-                                html.Div(
-                                    [   
-                                        
-                                        dbc.Row([
-                                            dbc.Col(html.Img(src=acc_img_path, width="25", height="25"),width="auto"),
-                                            dbc.Col(html.H1(clean_text(document['title']))), 
-                                        ]),
-                                        dbc.Col(html.P(document['text'])),
-                                        dbc.Col(dbc.FormText(f"Author: {document['author']}")),
-                                        dbc.Col(dbc.CardLink("Article link", href=document['url'],target="_blank")),
-                                        dbc.Col(dbc.Row(similarity_cards))
-                                    ]
-                                ),
-                                str(document),
-                                title=f"{document['id']}-{clean_text(document['title'])} - {document['source']}",
-                                item_id=f"item-{len(accordion_content)}"
-                            )
-                        )
-                    else:
-                        break
-
-                response = dbc.Row([
-                    dbc.Row([
-                        html.Div(
-                            dbc.Accordion(
-                                accordion_content,
-                                flush=True,
-                                active_item="item-0",
-                            ),
-                        )
-                    ])
-                ])
+        # Identical searches share a job, a new search cancels the previous one
+        job_id = jobs.submit((subreddit_kw, arxiv_kw, keyword_text, ranking), search_pipeline,
+                             subreddit_kw, arxiv_kw, keyword_text, ranking=ranking,
+                             top_k=RESULTS_SIZE, cache_dir=f'{path}/data', supersedes=job_id)
+        return poll_search(job_id)
 
-                
-                word_freq_per_year = corpus.calculate_word_freq_per_year(tokens_kw)
-                for word in tokens_kw:
-                    word_freqs = {key[1]: word_freq_per_year[(word.lower(), key[1])] for key in word_freq_per_year if key[0] == word.lower()}
-                    years, frequency = zip(*sorted(word_freqs.items()))
-                    fig.add_trace(go.Scatter(x=years, y=frequency, mode='lines+markers', name=word))
-                 
-                fig.update_layout(
-                    title='Evolution of Word Usage Over Time',
-                    xaxis_title='Year',
-                    yaxis_title='Word Count',
-                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                )
-                response
-            else:
-                response =  dbc.Alert(
-                    [
-                        html.I(className="bi bi-exclamation-triangle-fill me-2"),
-                        "No data found for this topic and keyword combination",
-                    ],
-                    color="warning",
-                    className="d-flex align-items-center",
-                )
+    return response, go.Figure(), None, job_id, True
 
-        except (TypeError, ValueError) as e:
-            logging.error(e)
-            raise e
+@app.server.route('/metrics')
+def metrics():
+    """
+    Latency histograms of the application stages and counters of the search
+    cache of the workers, in the Prometheus text format.
+    """
+    return Response(METRICS.to_prometheus(), mimetype='text/plain; version=0.0.4')
 
-    return response, fig
 
 if __name__ == '__main__':
+    # Record the stages of the app and of the search workers forked afterwards
+    enable()
+    # Load and index the saved corpora before serving the first query
+    topics = df['Subreddit'].dropna().tolist() if 'Subreddit' in df else None
+    warm_up(topics)
+    # Forked workers inherit the warm corpora, workers started otherwise load them
+    initializer = None if multiprocessing.get_start_method() == 'fork' else warm_up
+    jobs.start(initializer=initializer, initargs=(topics, None, 3, False))
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,109 @@
+import heapq
+from collections import deque
+from typing import Iterable, Iterator, Tuple
+
+
+class AhoCorasick:
+    """
+    Class representing an Aho-Corasick automaton.
+
+    It finds every occurrence of a set of literal patterns in a single pass
+    over a text, whatever the number of patterns.
+    """
+    def __init__(self, patterns: Iterable[str]) -> None:
+        """
+        Initialize an AhoCorasick object and build its automaton.
+
+        Args:
+            patterns (list): The literal patterns to search for. Empty and
+                duplicated patterns are ignored.
+        """
+        self.patterns = [pattern for pattern in dict.fromkeys(patterns) if pattern]
+        self.__goto = [dict()]
+        self.__fail = [0]
+        self.__output = [list()]
+
+        for pattern_index, pattern in enumerate(self.patterns):
+            self.__insert(pattern, pattern_index)
+        self.__build_failure_links()
+
+    def __insert(self, pattern: str, pattern_index: int) -> None:
+        """
+        Add a pattern to the trie of the automaton.
+
+        Args:
+            pattern (str): The pattern to add.
+            pattern_index (int): The index of the pattern.
+        """
+        node = 0
+        for char in pattern:
+            if char not in self.__goto[node]:
+                self.__goto.append(dict())
+                self.__fail.append(0)
+                self.__output.append(list())
+                self.__goto[node][char] = len(self.__goto) - 1
+            node = self.__goto[node][char]
+        self.__output[node].append(pattern_index)
+
+    def __build_failure_links(self) -> None:
+        """
+        Link every node to its longest proper suffix in the trie, breadth first.
+        """
+        queue = deque(self.__goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.__goto[node].items():
+                queue.append(child)
+                fallback = self.__fail[node]
+                while fallback and char not in self.__goto[fallback]:
+                    fallback = self.__fail[fallback]
+                suffix = self.__goto[fallback].get(char, 0)
+                self.__fail[child] = suffix if suffix != child else 0
+                self.__output[child] = self.__output[child] + self.__output[self.__fail[child]]
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        Find the occurrences of the patterns in a text, overlapping ones included.
+
+        Args:
+            text (str): The text to search.
+
+        Yields:
+            tuple: The start and end positions of the match and the pattern index,
+                in order of end position.
+        """
+        goto = self.__goto
+        fail = self.__fail
+        output = self.__output
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern_index in output[node]:
+                yield position + 1 - len(self.patterns[pattern_index]), position + 1, pattern_index
+
+    def finditer_by_start(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """
+        Find the occurrences of the patterns in a text, in order of start position.
+
+        A match is held back until no later match can start before it, which
+        ends at most the length of the longest pattern further, so stopping
+        the iteration early also stops the scan of the text.
+
+        Args:
+            text (str): The text to search.
+
+        Yields:
+            tuple: The start and end positions of the match and the pattern index,
+                in order of start then end position.
+        """
+        longest = max(map(len, self.patterns), default=0)
+        pending = []
+        for start, end, pattern_index in self.finditer(text):
+            # Later matches end after `end`, so they start from `end - longest`
+            while pending and pending[0][0] <= end - longest:
+                yield heapq.heappop(pending)
+            heapq.heappush(pending, (start, end, pattern_index))
+        while pending:
+            yield heapq.heappop(pending)
@@ -0,0 +1,185 @@
+import numpy as np
+from typing import Tuple
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+
+class ClusterIndex:
+    """
+    Class representing an approximate nearest neighbour index of vectors by
+    cosine similarity, such as the TF-IDF rows of a corpus.
+
+    The vectors are grouped by spherical k-means into clusters. A query only
+    compares its vector with the members of the `n_probe` clusters whose
+    centroids are the most similar to it, instead of with every vector.
+    More probed clusters raise the recall and the latency.
+    """
+    def __init__(self,
+                 n_clusters: int = None,
+                 n_probe: int = 8,
+                 n_iter: int = 10,
+                 seed: int = 1) -> None:
+        """
+        Initialize a ClusterIndex object.
+
+        Args:
+            n_clusters (int, optional): The number of clusters. Defaults to the
+                square root of the number of vectors.
+            n_probe (int, optional): The number of clusters searched by a query.
+                Defaults to 8.
+            n_iter (int, optional): The number of k-means iterations. Defaults to 10.
+            seed (int, optional): The seed of the initial centroids. Defaults to 1.
+
+        Raises:
+            ValueError: If a parameter is not positive.
+        """
+        if (n_clusters is not None and n_clusters < 1) or n_probe < 1 or n_iter < 0:
+            raise ValueError('n_clusters and n_probe must be positive')
+        self.n_clusters = n_clusters
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.matrix = None
+        self.centroids = None
+        self.labels = None
+        self.members = list()
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: The number of indexed vectors.
+        """
+        return 0 if self.matrix is None else self.matrix.shape[0]
+
+    def fit(self, matrix) -> 'ClusterIndex':
+        """
+        Cluster and index the rows of a matrix.
+
+        Args:
+            matrix: The vectors, a sparse or dense matrix with one row per vector.
+
+        Returns:
+            ClusterIndex: The index itself.
+        """
+        self.matrix = normalize(sparse.csr_matrix(matrix, dtype=np.float32))
+        n_docs = self.matrix.shape[0]
+        n_clusters = self.n_clusters or max(1, int(np.sqrt(n_docs)))
+        n_clusters = max(1, min(n_clusters, n_docs))
+
+        generator = np.random.default_rng(self.seed)
+        centroids = self.matrix[generator.choice(n_docs, n_clusters, replace=False)].toarray()
+        labels = self.__assign(centroids)
+        for _ in range(self.n_iter):
+            # Centroids are the normalized sums of their members, empty clusters keep theirs
+            membership = sparse.csr_matrix((np.ones(n_docs, dtype=np.float32), (labels, np.arange(n_docs))),
+                                           shape=(n_clusters, n_docs))
+            sums = np.asarray((membership @ self.matrix).todense())
+            empty = np.asarray(membership.sum(axis=1)).ravel() == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+            new_labels = self.__assign(centroids)
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+        self.centroids = centroids.astype(np.float32)
+        self.labels = labels
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(n_clusters + 1))
+        self.members = [order[bounds[c]:bounds[c + 1]] for c in range(n_clusters)]
+        return self
+
+    def __assign(self, centroids: np.ndarray) -> np.ndarray:
+        """
+        Get the most similar centroid of every vector.
+        """
+        return np.asarray(self.matrix @ centroids.T).argmax(axis=1)
+
+    def __probes(self, positions: np.ndarray, n_probe: int) -> np.ndarray:
+        """
+        Get the clusters searched for the vectors at the given positions.
+        """
+        similarities = np.asarray(self.matrix[positions] @ self.centroids.T)
+        n_probe = min(n_probe, len(self.members))
+        return np.argpartition(-similarities, n_probe - 1, axis=1)[:, :n_probe]
+
+    def __check_fitted(self) -> None:
+        if self.matrix is None:
+            raise ValueError('The index must be fitted before being queried')
+
+    def query(self, position: int, k: int = 3, n_probe: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the approximate nearest neighbours of an indexed vector.
+
+        Args:
+            position (int): The position of the vector.
+            k (int, optional): The number of neighbours. Defaults to 3.
+            n_probe (int, optional): The number of clusters searched. Defaults to `n_probe`.
+
+        Returns:
+            tuple: The positions of the neighbours and their cosine similarity, by
+                decreasing similarity. The vector itself and null similarities are
+                left out, so fewer than `k` neighbours may be returned.
+
+        Raises:
+            ValueError: If the index is not fitted.
+        """
+        self.__check_fitted()
+        probes = self.__probes(np.array([position]), n_probe or self.n_probe)[0]
+        candidates = np.concatenate([self.members[cluster] for cluster in probes])
+        candidates = candidates[candidates != position]
+        scores = np.asarray((self.matrix[candidates] @ self.matrix[position].T).todense()).ravel()
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        keep = scores[order] > 0
+        return candidates[order][keep], scores[order][keep]
+
+    def kneighbors(self, k: int = 3, n_probe: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the approximate nearest neighbours of every indexed vector.
+
+        Clusters are visited one at a time, each compared at once with all the
+        vectors probing it, and the best `k` neighbours of every vector are kept.
+
+        Args:
+            k (int, optional): The number of neighbours. Defaults to 3.
+            n_probe (int, optional): The number of clusters searched. Defaults to `n_probe`.
+
+        Returns:
+            tuple: The positions and the similarities of the neighbours, two arrays
+                of one row per vector sorted by decreasing similarity. Missing
+                neighbours have the position -1 and a null similarity.
+
+        Raises:
+            ValueError: If the index is not fitted.
+        """
+        self.__check_fitted()
+        n_docs = len(self)
+        best = np.full((n_docs, k), -1, dtype=np.int64)
+        best_scores = np.zeros((n_docs, k), dtype=np.float32)
+        if k < 1:
+            return best, best_scores
+
+        probes = self.__probes(np.arange(n_docs), n_probe or self.n_probe)
+        for cluster, members in enumerate(self.members):
+            queries = np.flatnonzero((probes == cluster).any(axis=1))
+            if len(queries) == 0 or len(members) == 0:
+                continue
+            block = (self.matrix[queries] @ self.matrix[members].T).toarray()
+            block[queries[:, None] == members[None, :]] = 0  # not its own neighbour
+
+            # Merge the best members of the cluster with the best neighbours so far
+            candidates = np.hstack([best[queries], np.broadcast_to(members, block.shape)])
+            scores = np.hstack([best_scores[queries], block])
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best[queries] = np.take_along_axis(candidates, top, axis=1)
+            best_scores[queries] = np.take_along_axis(scores, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best[best_scores <= 0] = -1
+        best_scores[best_scores <= 0] = 0
+        return best, best_scores
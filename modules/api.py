@@ -1,7 +1,10 @@
+import time
 import logging
 import requests
 import xmltodict
 import datetime
+import xml.etree.ElementTree as ET
+from typing import Iterator
 import praw
 import config
 from praw.exceptions import RedditAPIException
@@ -72,8 +75,12 @@ class RedditApi:
     
     
 class ArxivApi:
+
+    ATOM_NAMESPACE = '{http://www.w3.org/2005/Atom}'
+    # Delay between two paginated requests asked by the ArXiv API terms of use, in seconds
+    PAGE_DELAY = 3.0
     
-    def __init__(self, keyword: str, start: int = 0, max_results: int = 1) -> None:
+    def __init__(self, keyword: str, start: int = 0, max_results: int = 1, page_size: int = 100) -> None:
         """
         Initializes an ArxivApi object.
 
@@ -83,10 +90,12 @@ class ArxivApi:
             keyword (str): The keyword to search for.
             start (int): The starting index of the search results.
             max_results (int): The maximum number of results to retrieve.
+            page_size (int): The number of results requested per page by `iter_documents`.
         """
         self.keyword = keyword
         self.start = start
         self.max_results = max_results
+        self.page_size = page_size
         self.create_query_string(keyword=self.keyword,
                                 start=self.start,
                                 max_results=self.max_results)
@@ -116,15 +125,95 @@ class ArxivApi:
             logging.error('Error retrieving data from ARXIV API')
         return None
     
+    def iter_documents(self, page_size: int = None) -> Iterator[ArxivDocument]:
+        """
+        Retrieves the documents page by page, parsing each response incrementally
+        while it is downloaded. Pages are requested `PAGE_DELAY` seconds apart.
+
+        Args:
+            page_size (int, optional): The number of results per request. Defaults
+                to the `page_size` of the object.
+
+        Yields:
+            ArxivDocument: The documents, as their entries arrive.
+
+        Raises:
+            ValueError: If a request fails after documents were yielded, so the
+                documents are not mistaken for the complete results. A failing
+                first request only logs the error and yields nothing.
+        """
+        page_size = int(page_size or self.page_size)
+        total = int(self.max_results)
+        fetched = 0
+
+        while fetched < total:
+            if fetched:
+                time.sleep(self.PAGE_DELAY)
+            window = min(page_size, total - fetched)
+            params = dict(self.query_params, start=int(self.start) + fetched, max_results=window)
+            page_count = 0
+            error = None
+            try:
+                with self.session.get(url=self.base_url, params=params, stream=True) as response:
+                    if response.status_code != 200:
+                        error = f'Error retrieving data from ARXIV API: {response.status_code}'
+                    else:
+                        response.raw.decode_content = True
+                        root = None
+                        for event, element in ET.iterparse(response.raw, events=('start', 'end')):
+                            if root is None:
+                                root = element
+                            elif event == 'end' and element.tag == self.ATOM_NAMESPACE + 'entry':
+                                yield self.entry_to_document(element)
+                                page_count += 1
+                                # Drop the parsed entries to keep the memory flat
+                                root.clear()
+            except requests.RequestException as e:
+                error = f'Error retrieving data from ARXIV API: {e}'
+            except ET.ParseError as e:
+                error = f'Invalid response from ARXIV API: {e}'
+
+            if error is not None:
+                logging.error(error)
+                if fetched + page_count == 0:
+                    return
+                raise ValueError(f'{error}, after {fetched + page_count} documents')
+
+            fetched += page_count
+            if page_count < window:
+                break
+
+    def entry_to_document(self, entry: ET.Element) -> ArxivDocument:
+        """
+        Converts an Atom entry element to a document.
+
+        Args:
+            entry (xml.etree.ElementTree.Element): The entry element of the feed.
+
+        Returns:
+            ArxivDocument: The converted document.
+        """
+        namespace = self.ATOM_NAMESPACE
+        return ArxivDocument(
+            title=entry.findtext(namespace + 'title'),
+            date=datetime.datetime.strptime(entry.findtext(namespace + 'published'), "%Y-%m-%dT%H:%M:%SZ").date(),
+            authors=[author.findtext(namespace + 'name') for author in entry.findall(namespace + 'author')],
+            url=entry.findtext(namespace + 'id'),
+            source='arxiv',
+            text=str(entry.findtext(namespace + 'summary')).replace('\n', ' ')
+        )
+
     def set_documents(self) -> list:
         """
         Sets the documents based on the retrieved data.
+
+        If no data was retrieved yet, the documents are streamed with `iter_documents`.
         
         Returns:
             list: A list of Document objects.
         """
         if self.data is None:
-            self.get_data()
+            return list(self.iter_documents())
 
         try:
             entries = self.data['entry']
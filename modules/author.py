@@ -1,31 +1,102 @@
+import datetime
+from collections import Counter
+
+
 class Author:
     """
     Class representing an author.
+
+    The documents of the author are kept as postings of corpus document ids,
+    their texts stay in the corpus.
     """
     def __init__(self, name: str) -> None:
         """
         Initialize an Author object.
-        
+
         Args::
             name (str): The name of the author.
         """
         self.name = name
-        self.production = list()
+        self.doc_ids = list()
         self.nDoc = 0
-    
+        self.first_date = None
+        self.last_date = None
+        self.sources = Counter()
+
     def __str__(self) -> str:
         """
         Return a string representation of the Author object.
         """
         return f'Author: {self.name} \tNumber of art:{self.nDoc}'
-        
-    def add(self, article: str) -> None:
+
+    def __getstate__(self) -> dict:
         """
-        Add an article to the author's production.
-        
+        Returns:
+            dict: The state to pickle, without the postings and statistics
+                rebuilt by the corpus from its documents.
+        """
+        return {'name': self.name, 'nDoc': self.nDoc}
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Restore a pickled author with empty postings, rebuilt by the corpus.
+        The texts of the production of older authors are dropped.
+
+        Args::
+            state (dict): The pickled attributes.
+        """
+        state.pop('production', None)
+        state.setdefault('doc_ids', list())
+        state.setdefault('first_date', None)
+        state.setdefault('last_date', None)
+        state.setdefault('sources', Counter())
+        self.__dict__.update(state)
+
+    def add(self,
+            doc_id: int,
+            date: datetime.date | datetime.datetime = None,
+            source: str = None) -> None:
+        """
+        Add a document to the author's production.
+
         Args::
-            article (str): The article to add.
+            doc_id (int): The ID of the document in the corpus.
+            date (date | datetime, optional): The date of the document.
+            source (str, optional): The source of the document.
+        """
+        self.nDoc += 1
+        self.doc_ids.append(doc_id)
+        if source is not None:
+            self.sources[source] += 1
+        if date is not None:
+            # Reddit posts have a time, arXiv papers only a day
+            if isinstance(date, datetime.datetime):
+                date = date.date()
+            if self.first_date is None or date < self.first_date:
+                self.first_date = date
+            if self.last_date is None or date > self.last_date:
+                self.last_date = date
+
+    def clear(self) -> None:
+        """
+        Remove the documents of the author, keeping its name.
+        """
+        self.doc_ids = list()
+        self.nDoc = 0
+        self.first_date = None
+        self.last_date = None
+        self.sources = Counter()
+
+    def get_stats(self) -> dict:
+        """
+        Returns:
+            dict: The name, the number of documents, the date range and the
+                number of documents per source of the author.
         """
-        self.nDoc += 1 
-        self.production.append(article)
-        
+        return {
+            'name': self.name,
+            'documents': self.nDoc,
+            'first_date': self.first_date,
+            'last_date': self.last_date,
+            'sources': dict(self.sources),
+        }
@@ -0,0 +1,86 @@
+from threading import Lock
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """
+    Class representing a bounded cache evicting the least recently used entries.
+
+    It counts its hits and misses and can be shared between threads.
+    """
+    def __init__(self, maxsize: int = 128) -> None:
+        """
+        Initialize a LRUCache object.
+
+        Args:
+            maxsize (int): The maximum number of entries.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: The number of entries in the cache.
+        """
+        return len(self.__entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        Returns:
+            bool: Whether the key is cached, without counting a hit or a miss.
+        """
+        return key in self.__entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a cached value and mark it as the most recently used.
+
+        Args:
+            key: The key of the value.
+            default: The value returned on a miss.
+
+        Returns:
+            The cached value, or `default` if the key is not cached.
+        """
+        with self.__lock:
+            if key not in self.__entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.__entries.move_to_end(key)
+            return self.__entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Cache a value, evicting the least recently used entries beyond `maxsize`.
+
+        Args:
+            key: The key of the value.
+            value: The value to cache.
+        """
+        with self.__lock:
+            self.__entries[key] = value
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the counters.
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The number of hits, misses and entries and the maximum size.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self), 'maxsize': self.maxsize}
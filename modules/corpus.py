@@ -1,22 +1,69 @@
 import re
+import uuid
+import heapq
 import pickle
+from functools import lru_cache
+from itertools import islice
 import pandas as pd
 from pprint import pformat
 from tabulate import tabulate
 from modules.author import Author
+from modules.aho_corasick import AhoCorasick
+from modules.ann import ClusterIndex
+from modules.dedup import NearDuplicateIndex
+from modules.index import InvertedIndex
+from modules.term_stats import TermStatistics
 from collections import defaultdict
-from utils.tools import clean_paragraph
-from modules.singleton import SingletonMeta
-from collections import Counter
-from typing import List, Tuple
+from utils.tools import TOKENIZER, hash_documents
+from utils.instrumentation import span
+from modules.store import ColumnarStore
+from modules.snapshot import CorpusSnapshot, write_snapshot
+from typing import Dict, List, Tuple
 
 
-class Corpus(metaclass=SingletonMeta):
+@lru_cache(maxsize=128)
+def _compile_pattern(pattern: str) -> re.Pattern:
+    """
+    Compile a regular expression, caching the most recently used ones.
+    """
+    return re.compile(pattern)
+
+
+@lru_cache(maxsize=32)
+def _build_automaton(keywords: Tuple[str, ...]) -> AhoCorasick:
+    """
+    Build the Aho-Corasick automaton of literal keywords, caching the most
+    recently used ones.
+    """
+    return AhoCorasick(keywords)
+
+
+class Corpus:
     """
     Class representing a corpus of documents.
     """
 
-    __concated_text = None
+    __index = None
+    __tokens = None
+    __term_stats = None
+    __doc_author = None
+    __uid = None
+    __content_hash = None
+    __dedup = None
+    __dedup_params = None
+    __ann = None
+
+    # Incremented when documents are added or loaded, invalidating the cached search results
+    version = 0
+
+    # Path of the persisted search index, see `get_index`
+    index_path = None
+    # Per source fetch timings and errors, see `search_documents`
+    ingestion_report = None
+    # Whether a source failed during the ingestion, such corpora are not saved
+    incomplete = False
+    # Near-duplicates skipped by `add`, see `enable_deduplication`
+    dedup_report = None
 
     def __init__(self):
         """
@@ -28,6 +75,7 @@ class Corpus(metaclass=SingletonMeta):
         self.__author_to_id = dict()
         self.__document_count = 0
         self.__author_count = 0
+        self.__doc_author = dict()
 
     def __repr__(self):
         """
@@ -49,113 +97,428 @@ class Corpus(metaclass=SingletonMeta):
         stats = self.get_stats()
         return tabulate(list(stats.items()))
 
-    def add(self, doc, author):
+    def __getstate__(self):
+        """
+        Returns:
+            dict: The state to pickle, without the derived index, tokens and statistics,
+                nor the uid, so every unpickled copy gets its own.
+        """
+        state = self.__dict__.copy()
+        state.pop('_Corpus__uid', None)
+        state.pop('_Corpus__index', None)
+        state.pop('_Corpus__tokens', None)
+        state.pop('_Corpus__term_stats', None)
+        state.pop('_Corpus__dedup', None)
+        state.pop('_Corpus__ann', None)
+        # Text concatenation cache of older corpora
+        state.pop('_Corpus__concated_text', None)
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore a pickled corpus, rebuilding the author postings of corpora
+        saved when authors kept the texts of their documents.
+
+        Args:
+            state (dict): The pickled attributes.
+        """
+        self.__dict__.update(state)
+        if any(len(author.doc_ids) != author.nDoc for author in self.authors.values()):
+            self.__index_authors()
+
+    def add(self, doc, author) -> int | None:
         """
         Add a document to the corpus.
 
+        The term statistics and the search index, once built, are updated with
+        the new document instead of being recomputed. Once deduplication is
+        enabled, near-duplicates of the documents of the corpus are reported
+        in `dedup_report` instead of being added.
+
         Args:
             doc: The document to add.
             author: The author of the document.
+
+        Returns:
+            int | None: The ID of the document, or None if it is a near-duplicate.
         """
+        dedup = self.__get_dedup_index()
+        if dedup is not None:
+            text = self.__dedup_text(doc)
+            signature = dedup.hasher.signature(text)
+            matches = dedup.query(text, signature)
+            if matches:
+                duplicate_of, similarity = matches[0]
+                self.dedup_report.append({
+                    'title': doc.title,
+                    'source': doc.source,
+                    'url': doc.url,
+                    'author': author,
+                    'duplicate_of': duplicate_of,
+                    'similarity': similarity,
+                })
+                return None
+            dedup.add(self.__document_count + 1, text, signature)
+
         if author not in self.__author_to_id:  # Setting up author unique ID
             self.__author_count += 1
             self.authors[self.__author_count] = Author(author)
             self.__author_to_id[author] = self.__author_count
-        self.authors[self.__author_to_id[author]].add(doc.text)
 
         self.__document_count += 1
         self.documents[self.__document_count] = doc
+        self.authors[self.__author_to_id[author]].add(self.__document_count, doc.date, doc.source)
+        self.version += 1
+        if self.__doc_author is None:
+            self.__doc_author = dict()
+        self.__doc_author[self.__document_count] = self.__author_to_id[author]
+
+        if self.__term_stats is not None or self.__index is not None:
+            tokens = self.get_tokens()[self.__document_count]
+            if self.__term_stats is not None:
+                self.__term_stats.add(doc, tokens, self.__author_to_id[author])
+            if self.__index is not None:
+                self.__index.add(doc, tokens)
+        return self.__document_count
+
+    def enable_deduplication(self,
+                             threshold: float = 0.8,
+                             num_perm: int = 128,
+                             bands: int = None,
+                             shingle_size: int = 5) -> None:
+        """
+        Skip the documents added from now on when they are near-duplicates of a
+        document of the corpus, such as crossposts or new versions of a paper.
 
-    def __concat_data(self) -> None:
+        Titles and texts are compared by the estimated Jaccard similarity of
+        their word shingles, see `modules.dedup.NearDuplicateIndex`.
+
+        Args:
+            threshold (float, optional): The similarity of near-duplicates. Defaults to 0.8.
+            num_perm (int, optional): The number of MinHash permutations. Defaults to 128.
+            bands (int, optional): The number of LSH bands. Defaults to the optimal banding.
+            shingle_size (int, optional): The number of words of a shingle. Defaults to 5.
+
+        Raises:
+            ValueError: If the threshold or the number of bands is invalid.
         """
-        Concatenate all documents in the corpus if not concated.
+        self.__dedup_params = {'threshold': threshold, 'num_perm': num_perm,
+                               'bands': bands, 'shingle_size': shingle_size}
+        self.__dedup = None
+        if self.dedup_report is None:
+            self.dedup_report = list()
+        self.__get_dedup_index()
+
+    def __get_dedup_index(self) -> NearDuplicateIndex | None:
         """
-        if self.__concated_text is None:
-            self.__concated_text = "".join([doc.text for doc in self.documents.values()])
+        Get the near-duplicate index, built over the documents of the corpus
+        when deduplication is enabled and rebuilt after unpickling.
 
-    def search_text(self, keyword: str) -> List[Tuple[int, int, int]]:
+        Returns:
+            NearDuplicateIndex | None: The index, or None if deduplication is disabled.
+        """
+        if self.__dedup is None and self.__dedup_params is not None:
+            dedup = NearDuplicateIndex(**self.__dedup_params)
+            for doc_id, doc in self.documents.items():
+                dedup.add(doc_id, self.__dedup_text(doc))
+            self.__dedup = dedup
+        return self.__dedup
+
+    @staticmethod
+    def __dedup_text(doc) -> str:
+        """
+        Get the text of a document compared for deduplication.
+        """
+        return f'{doc.title or ""} {doc.text or ""}'
+
+    def search_text(self,
+                    keyword: str | List[str],
+                    mode: str = 'regex',
+                    max_per_doc: int = None) -> List[Tuple[int, int, int]]:
         """
         Search for passages in the documents containing the given keyword.
 
         Args:
-            keyword (str): The keyword to search for.
+            keyword (str | list): The keyword to search for, or a list of keywords.
+            mode (str): 'regex' to search the keywords as regular expressions, or
+                'literal' to search all of them as plain strings in a single pass
+                over each document. Defaults to 'regex'.
+            max_per_doc (int, optional): The maximum number of matches per document,
+                the first ones by position. The scan of a document stops once found.
 
         Returns:
             list: A list of tuples containing the matched key word start, end 
-                positions and document id.
+                positions and document id, in order of position in each document.
+
+        Raises:
+            ValueError: If the mode is not supported.
         """
-        self.__concat_data()
+        keywords = [keyword] if isinstance(keyword, str) else list(keyword)
+
+        if mode == 'regex':
+            patterns = [_compile_pattern(pattern) for pattern in keywords]
+            # The matches of every keyword are merged lazily by position
+            find_matches = lambda text: heapq.merge(
+                *(((m.start(), m.end()) for m in pattern.finditer(text)) for pattern in patterns)
+            )
+        elif mode == 'literal':
+            automaton = _build_automaton(tuple(keywords))
+            find_matches = lambda text: (
+                (start, end) for start, end, _ in automaton.finditer_by_start(text)
+            )
+        else:
+            raise ValueError(f'Unsupported search mode: {mode}')
 
         matches = []
         for doc_id, doc in self.documents.items():
-            match = re.finditer(keyword, doc.text)
-            for m in match:
-                matches.append((m.start(), m.end(), doc_id))
+            for start, end in islice(find_matches(doc.text), max_per_doc):
+                matches.append((start, end, doc_id))
 
         return matches
 
-    def __clean_text(self, doc:str=None) -> None:
+    def get_stats(self, as_dataframe: bool = False) -> dict | pd.DataFrame:
         """
-        Clean the text of a document.
+        Calculate statistics about the corpus from its term statistics.
 
         Args:
-            doc (str): The document to clean. If None, clean the entire corpus.
+            as_dataframe (bool): Return the statistics as a DataFrame.
 
         Returns:
-            str: The cleaned document.
+            dict | pd.DataFrame: The statistics with, for every word, an id, the
+                number of occurrences in the corpus and the number of documents
+                containing it.
         """
+        term_stats = self.get_term_stats()
+        count = term_stats.term_freq
+        counter_docs = term_stats.doc_freq
+
+        words = list(count.keys())
+        data = {
+            'id': list(range(1, len(words) + 1)),
+            'word': words,
+            'count': [count[word] for word in words],
+            'counter_docs': [counter_docs[word] for word in words],
+        }
+
+        if as_dataframe:
+            return pd.DataFrame(data)
+        return data
 
-        if doc is None:
-            self.__concat_data()
-            cleaned_doc = self.__concated_text
+    def docs_to_collection(self) -> List[str]:
+        """
+        Get all documents in the corpus in a list.
+        Used as collection of all documents objects in the corpus.
 
-        else:
-            cleaned_doc = doc
+        Returns:
+            list: A list of documents.
+        """
+        return list(self.documents.values())
+
+    def get_tokens(self) -> Dict[int, List[str]]:
+        """
+        Get the cleaned tokens of the document texts.
+        Each document is tokenized once, the tokens are cached by document id.
+
+        Returns:
+            dict: The list of tokens of every document, keyed by document id.
+        """
+        if self.__tokens is None:
+            self.__tokens = dict()
+        if len(self.__tokens) < len(self.documents):
+            missing = [doc_id for doc_id in self.documents if doc_id not in self.__tokens]
+            with span('tokenize', documents=len(missing)):
+                tokenized = TOKENIZER.tokenize_many(self.documents[doc_id].text for doc_id in missing)
+                self.__tokens.update(zip(missing, tokenized))
+        return self.__tokens
+
+    def __get_author_id(self, doc_id: int) -> int | None:
+        """
+        Get the id of the author a document was added with.
+
+        Args:
+            doc_id (int): The ID of the document.
+
+        Returns:
+            int | None: The author ID, or None if the author is unknown.
+        """
+        if self.__doc_author is not None and doc_id in self.__doc_author:
+            return self.__doc_author[doc_id]
+        # Corpora saved before documents were mapped to their authors
+        author = self.documents[doc_id].author
+        return self.__author_to_id.get(author if author is not None else 'Anonymous')
+
+    def __index_authors(self) -> None:
+        """
+        Rebuild the document postings and statistics of the authors.
+        """
+        for author in self.authors.values():
+            author.clear()
+        for doc_id, doc in self.documents.items():
+            author_id = self.__get_author_id(doc_id)
+            if author_id is not None:
+                self.authors[author_id].add(doc_id, doc.date, doc.source)
+
+    def get_author(self, name: str) -> Author:
+        """
+        Get an author of the corpus by name.
+
+        Args:
+            name (str): The name of the author.
 
-        words = clean_paragraph(cleaned_doc)
-        cleaned_doc = ' '.join(words)
+        Returns:
+            Author: The author.
 
-        return cleaned_doc
+        Raises:
+            ValueError: If the author has no document in the corpus.
+        """
+        if name not in self.__author_to_id:
+            raise ValueError(f'Unknown author: {name}')
+        return self.authors[self.__author_to_id[name]]
 
-    def get_stats(self) -> pd.DataFrame:
+    def get_author_documents(self, name: str) -> Dict[int, object]:
         """
-        Calculate statistics about the corpus.
+        Get the documents of an author from its postings.
+
+        Args:
+            name (str): The name of the author.
 
         Returns:
-            pd.DataFrame: A DataFrame containing the statistics.
+            dict: The documents of the author, keyed by document id.
         """
-        cleaned_doc = self.__clean_text()
-        words = list()
-        count = list()
-        counter_docs = list()
-        splited_text = list()
-        ids = list()
-        counter = 0
-        for doc in self.documents:
-            splited_text.append(self.__clean_text(self.documents[doc].text).split(' '))
+        return {doc_id: self.documents[doc_id] for doc_id in self.get_author(name).doc_ids}
 
-        splited_text.sort()  # Sort the splited_text list alphabetically
+    def get_author_stats(self, name: str, top_n: int = 10) -> dict:
+        """
+        Get the statistics of an author with its most frequent terms, taken from
+        the term statistics of the corpus.
 
-        for word in set(cleaned_doc.split(' ')):
-            counter += 1
-            ids.append(counter)
-            words.append(word)
-            count.append(cleaned_doc.count(word))
-            counter_docs.append(sum([1 for doc in splited_text if word in doc]))
+        Args:
+            name (str): The name of the author.
+            top_n (int, optional): The number of terms. Defaults to 10.
 
-        data = {'id': ids, 'word': words, 'count': count, 'counter_docs': counter_docs}
+        Returns:
+            dict: The statistics of `Author.get_stats` with the 'terms' of the
+                author and their number of occurrences.
+        """
+        author = self.get_author(name)
+        term_freq = self.get_term_stats().author_term_freq[self.__author_to_id[name]]
+        stats = author.get_stats()
+        stats['terms'] = term_freq.most_common(top_n)
+        return stats
 
-        return data
+    def get_term_stats(self) -> TermStatistics:
+        """
+        Get the term statistics of the corpus, computed in a single pass over
+        the documents on first use and then updated by `add`.
 
-    def docs_to_collection(self) -> List[str]:
+        Returns:
+            TermStatistics: The term, document, author and year counts.
         """
-        Get all documents in the corpus in a list.
-        Used as collection of all documents objects in the corpus.
+        if self.__term_stats is None:
+            tokens = self.get_tokens()
+            with span('term_stats', documents=len(tokens)):
+                term_stats = TermStatistics()
+                for doc_id, doc in self.documents.items():
+                    term_stats.add(doc, tokens[doc_id], self.__get_author_id(doc_id))
+            self.__term_stats = term_stats
+        return self.__term_stats
+
+    @property
+    def uid(self) -> str:
+        """
+        Returns:
+            str: An identifier of this corpus object, unique in the process.
+        """
+        if self.__uid is None:
+            self.__uid = uuid.uuid4().hex
+        return self.__uid
+
+    def content_hash(self) -> str:
+        """
+        Hash the ids, sources, titles and texts of the documents, once per
+        version of the corpus.
 
         Returns:
-            list: A list of documents.
+            str: The SHA-256 hex digest of the corpus contents.
         """
-        return list(self.documents.values())
+        state = (self.version, len(self.documents))
+        if self.__content_hash is None or self.__content_hash[0] != state:
+            self.__content_hash = (state, hash_documents(
+                (doc_id, doc.source, doc.title, doc.text) for doc_id, doc in self.documents.items()
+            ))
+        return self.__content_hash[1]
+
+    def get_index(self) -> InvertedIndex:
+        """
+        Get the inverted index of the corpus, built on first use.
+        Positions in the index follow the order of `docs_to_collection`.
+
+        If `index_path` is set, the index is loaded from this file when it
+        matches the corpus contents, otherwise it is rebuilt with its TF-IDF
+        model and saved there.
+
+        Returns:
+            InvertedIndex: The index of the corpus documents.
+        """
+        if self.__index is None:
+            checksum = None
+            if self.index_path is not None:
+                checksum = self.content_hash()
+                with span('load_index'):
+                    self.__index = InvertedIndex.load(self.index_path, checksum)
+
+            if self.__index is None:
+                collection = self.docs_to_collection()
+                tokens = self.get_tokens()
+                with span('build_index', documents=len(collection)):
+                    self.__index = InvertedIndex(collection, [tokens[doc_id] for doc_id in self.documents])
+                if self.index_path is not None:
+                    with span('fit_tfidf', documents=len(collection)):
+                        self.__index.fit_tfidf(collection)
+                    self.__index.save(self.index_path, checksum)
+        return self.__index
+
+    def get_ann_index(self) -> ClusterIndex:
+        """
+        Get the approximate nearest neighbour index of the TF-IDF vectors of the
+        documents, built once per version of the corpus.
+        Positions in the index follow the order of `docs_to_collection`.
+
+        Returns:
+            ClusterIndex: The index of the corpus documents.
+        """
+        state = (self.version, len(self.documents))
+        if self.__ann is None or self.__ann[0] != state:
+            index = self.get_index()
+            if index.tfidf_matrix is None:
+                collection = self.docs_to_collection()
+                with span('fit_tfidf', documents=len(collection)):
+                    index.fit_tfidf(collection)
+            with span('build_ann', documents=len(self.documents)):
+                ann = ClusterIndex().fit(index.tfidf_matrix)
+            doc_ids = list(self.documents)
+            self.__ann = (state, ann, doc_ids, {doc_id: i for i, doc_id in enumerate(doc_ids)})
+        return self.__ann[1]
+
+    def get_similar_documents(self, doc_id: int, k: int = 3, n_probe: int = None) -> List[Tuple[int, float]]:
+        """
+        Get the documents most similar to a document, by approximate cosine
+        similarity of their titles and texts, see `get_ann_index`.
+
+        Args:
+            doc_id (int): The ID of the document.
+            k (int, optional): The number of similar documents. Defaults to 3.
+            n_probe (int, optional): The number of clusters searched, more raise the
+                recall and the latency. Defaults to `ClusterIndex.n_probe`.
+
+        Returns:
+            list: The IDs of the similar documents with their similarity, by
+                decreasing similarity.
+        """
+        ann = self.get_ann_index()
+        _, _, doc_ids, position_of = self.__ann
+        positions, scores = ann.query(position_of[int(doc_id)], k=k, n_probe=n_probe)
+        return [(doc_ids[position], float(score)) for position, score in zip(positions, scores)]
 
     def get_corpus_contents(self):
         """
@@ -188,9 +551,15 @@ class Corpus(metaclass=SingletonMeta):
         """
         Convert the corpus to a DataFrame.
 
+        With a columnar store, see `use_columnar_store`, the columns are exported
+        from the store arrays.
+
         Returns:
             pd.DataFrame: A DataFrame representation of the corpus.
         """
+        if isinstance(self.documents, ColumnarStore):
+            return self.documents.to_dataframe()
+
         data = list()
         for doc_id, doc in self.documents.items():
             data.append({
@@ -204,6 +573,14 @@ class Corpus(metaclass=SingletonMeta):
             })
         return pd.DataFrame(data)
 
+    def use_columnar_store(self) -> None:
+        """
+        Move the documents to a ColumnarStore. The corpus keeps working the same
+        way, its documents becoming read-only DocumentView objects.
+        """
+        if not isinstance(self.documents, ColumnarStore):
+            self.documents = ColumnarStore.from_documents(self.documents)
+
     def from_pkl_file(self, path: str) -> None:
         """
         Load the corpus from a pickle file.
@@ -216,8 +593,81 @@ class Corpus(metaclass=SingletonMeta):
             self.documents = data['documents']
             self.authors = data['authors']
             self.__author_to_id = data['__author_to_id']
-            
-    
+        # New documents and authors get ids after the loaded ones
+        self.__document_count = max(self.documents, default=0)
+        self.__author_count = max(self.authors, default=0)
+        self.__index = None
+        self.__tokens = None
+        self.__term_stats = None
+        self.__doc_author = None
+        # The detector is rebuilt from the loaded documents on the next add
+        self.__dedup = None
+        self.__index_authors()
+        self.version += 1
+
+    def save_snapshot(self, path: str) -> None:
+        """
+        Save the documents of the corpus to a snapshot file, see `modules.snapshot`.
+
+        Args:
+            path (str): The path to the snapshot file.
+        """
+        write_snapshot(self.documents, path)
+
+    @classmethod
+    def from_snapshot(cls, path: str):
+        """
+        Open a corpus from a snapshot file.
+
+        The documents stay in the mapped file and are decoded when accessed. The
+        authors are rebuilt from the author, date and source columns.
+
+        Args:
+            path (str): The path to the snapshot file.
+
+        Returns:
+            Corpus: The corpus.
+        """
+        corpus = cls()
+        snapshot = CorpusSnapshot(path)
+        corpus.documents = snapshot
+
+        columns = snapshot.columns
+        names = [snapshot.authors[code] if code >= 0 else 'Anonymous'
+                 for code in columns['author_codes'].tolist()]
+        dates = [ColumnarStore.decode_date(value, kind) for value, kind
+                 in zip(columns['dates'].tolist(), columns['date_kinds'].tolist())]
+        sources = [snapshot.sources[code] if code >= 0 else None
+                   for code in columns['source_codes'].tolist()]
+        for doc_id, author, date, source in zip(columns['ids'].tolist(), names, dates, sources):
+            if author not in corpus.__author_to_id:
+                corpus.__author_count += 1
+                corpus.authors[corpus.__author_count] = Author(author)
+                corpus.__author_to_id[author] = corpus.__author_count
+            corpus.authors[corpus.__author_to_id[author]].add(doc_id, date, source)
+            corpus.__doc_author[doc_id] = corpus.__author_to_id[author]
+            corpus.__document_count = max(corpus.__document_count, doc_id)
+        return corpus
+
+    def get_word_trends(self,
+                        words: List[str],
+                        granularity: str = 'year',
+                        normalize: bool = False) -> pd.DataFrame:
+        """
+        Get the counts of words over time, see `TermTimeIndex.series`.
+
+        Args:
+            words (list): The words to count.
+            granularity (str): 'year', 'month' or 'week'. Defaults to 'year'.
+            normalize (bool): Divide the counts by the number of documents of
+                each bucket. Defaults to False.
+
+        Returns:
+            pd.DataFrame: The counts with a column per lower cased word, indexed
+                by bucket label.
+        """
+        return self.get_term_stats().term_time.series(words, granularity, normalize)
+
     def calculate_word_freq_per_year(self, words_to_track:List[str]) -> defaultdict:
         """
         Calculates the word frequency per year for the given list of words.
@@ -229,22 +679,10 @@ class Corpus(metaclass=SingletonMeta):
             defaultdict: A nested defaultdict containing the word frequency per year.
         """
         word_freq_per_year = defaultdict(lambda: defaultdict(int))
+        trends = self.get_word_trends(words_to_track)
 
-        for doc in self.documents.values():
-            try:
-                date = doc.date
-                year = date.year
-            except (ValueError, AttributeError):
-                continue
-
-            text = (doc.text + ' ' + doc.title).lower()
-            word_counter = Counter(text.split())
-
-            for word in words_to_track:
-                word_freq = word_counter[word.lower()]
-                key = (word.lower(), str(year))
-                if key in word_freq_per_year.keys():
-                    word_freq += word_freq_per_year[key]
-                word_freq_per_year[key] = word_freq
+        for word, counts in trends.items():
+            for year, count in counts.items():
+                word_freq_per_year[(word, year)] = int(count)
 
         return word_freq_per_year
@@ -0,0 +1,207 @@
+import re
+import zlib
+import numpy as np
+from collections import defaultdict
+from typing import Hashable, List, Set, Tuple
+
+# Largest prime below 2**32, products of two 32-bit values stay below 2**64
+PRIME = np.uint64(4294967291)
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def shingles(text: str, size: int = 5) -> Set[int]:
+    """
+    Hash the word shingles of a text, the sequences of `size` consecutive
+    lower cased words.
+
+    Args:
+        text (str): The text.
+        size (int, optional): The number of words of a shingle. Defaults to 5.
+
+    Returns:
+        set: The CRC32 of the shingles. A text shorter than `size` words is a
+            single shingle, an empty text has none.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+            for i in range(len(words) - size + 1)}
+
+
+def optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose the LSH banding minimizing the probabilities of missing a pair
+    above the threshold and of comparing a pair below it.
+
+    Args:
+        threshold (float): The Jaccard similarity of the near-duplicates.
+        num_perm (int): The number of MinHash permutations.
+
+    Returns:
+        tuple: The number of bands and of rows per band.
+    """
+    similarities = np.linspace(0, 1, 201)
+    best, best_error = (num_perm, 1), float('inf')
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        # Probability that two documents share at least one band
+        candidate = 1 - (1 - similarities ** rows) ** bands
+        error = (candidate[similarities < threshold].sum()
+                 + (1 - candidate[similarities >= threshold]).sum())
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """
+    Class representing a family of MinHash permutations of the shingles.
+
+    The permutations are `(a * x + b) mod PRIME` with random `a` and `b` drawn
+    from a fixed seed, so signatures can be compared across processes.
+    """
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1) -> None:
+        """
+        Initialize a MinHasher object.
+
+        Args:
+            num_perm (int, optional): The number of permutations. Defaults to 128.
+            shingle_size (int, optional): The number of words of a shingle. Defaults to 5.
+            seed (int, optional): The seed of the permutations. Defaults to 1.
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        generator = np.random.default_rng(seed)
+        self.a = generator.integers(1, int(PRIME), size=num_perm, dtype=np.uint64)
+        self.b = generator.integers(0, int(PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            np.ndarray: The minimum of every permutation over the shingles, all
+                PRIME for a text without shingles.
+        """
+        hashes = np.fromiter(shingles(text, self.shingle_size), dtype=np.uint64)
+        if len(hashes) == 0:
+            return np.full(self.num_perm, PRIME, dtype=np.uint64)
+        permuted = (np.outer(hashes % PRIME, self.a) % PRIME + self.b) % PRIME
+        return permuted.min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    Class representing a MinHash LSH index detecting near-duplicate texts.
+
+    Signatures are cut into bands, each band hashed into its own buckets.
+    A new text is only compared with the texts sharing one of its buckets,
+    so a lookup does not depend on the number of indexed texts.
+    """
+    def __init__(self,
+                 threshold: float = 0.8,
+                 num_perm: int = 128,
+                 bands: int = None,
+                 shingle_size: int = 5,
+                 seed: int = 1) -> None:
+        """
+        Initialize a NearDuplicateIndex object.
+
+        Args:
+            threshold (float, optional): The estimated Jaccard similarity of the
+                shingles above which texts are near-duplicates. Defaults to 0.8.
+            num_perm (int, optional): The number of MinHash permutations. Defaults to 128.
+            bands (int, optional): The number of LSH bands, a divisor of `num_perm`.
+                Defaults to the optimal banding for the threshold.
+            shingle_size (int, optional): The number of words of a shingle. Defaults to 5.
+            seed (int, optional): The seed of the permutations. Defaults to 1.
+
+        Raises:
+            ValueError: If the threshold or the number of bands is invalid.
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError('threshold must be in ]0, 1]')
+        if bands is None:
+            bands, rows = optimal_bands(threshold, num_perm)
+        elif bands <= 0 or num_perm % bands:
+            raise ValueError('bands must divide num_perm')
+        else:
+            rows = num_perm // bands
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.signatures = dict()
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: The number of indexed texts.
+        """
+        return len(self.signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.signatures
+
+    def __band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """
+        Cut a signature into the bucket keys of its bands.
+        """
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, text: str, signature: np.ndarray = None) -> List[Tuple[Hashable, float]]:
+        """
+        Find the indexed near-duplicates of a text.
+
+        Args:
+            text (str): The text.
+            signature (np.ndarray, optional): The signature of the text, if already computed.
+
+        Returns:
+            list: The keys of the near-duplicates with their estimated similarity,
+                from the most to the least similar.
+        """
+        if signature is None:
+            signature = self.hasher.signature(text)
+        # Texts without words are never near-duplicates
+        if (signature == PRIME).all():
+            return []
+        candidates = set()
+        for band, key in zip(self.buckets, self.__band_keys(signature)):
+            candidates.update(band.get(key, ()))
+
+        matches = []
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= self.threshold:
+                matches.append((candidate, similarity))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def add(self, key: Hashable, text: str, signature: np.ndarray = None) -> None:
+        """
+        Index a text.
+
+        Args:
+            key: The key of the text, such as a document id.
+            text (str): The text.
+            signature (np.ndarray, optional): The signature of the text, if already computed.
+
+        Raises:
+            ValueError: If the key is already indexed.
+        """
+        if key in self.signatures:
+            raise ValueError(f'{key} is already indexed')
+        if signature is None:
+            signature = self.hasher.signature(text)
+        self.signatures[key] = signature
+        if (signature == PRIME).all():
+            return
+        for band, band_key in zip(self.buckets, self.__band_keys(signature)):
+            band[band_key].append(key)
@@ -0,0 +1,276 @@
+import math
+import pickle
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List
+from sklearn.feature_extraction.text import TfidfVectorizer
+from utils.tools import TOKENIZER, atomic_open, clean_paragraph
+
+# Bump when the layout of the index changes to invalidate the saved artifacts
+INDEX_VERSION = 1
+
+
+class InvertedIndex:
+    """
+    Class representing an inverted index over a collection of documents.
+
+    Every term maps to its postings, a dictionary of collection position to
+    term frequency, so a query only visits the documents containing its terms.
+    Titles and texts are indexed as separate fields for BM25F.
+    """
+
+    FIELDS = ('title', 'text')
+
+    def __init__(self, collection: list = None, tokens: List[List[str]] = None) -> None:
+        """
+        Initialize an InvertedIndex object.
+
+        Args:
+            collection (list): The documents to index, in collection order.
+            tokens (list): The cleaned tokens of each document text, in collection
+                order. If None, the texts are cleaned with `clean_paragraph`.
+        """
+        self.postings = dict()
+        self.field_postings = {'title': dict(), 'text': self.postings}
+        self.doc_lengths = {field: list() for field in self.FIELDS}
+        self.sources = list()
+        self.doc_norms = list()
+
+        # Collection statistics, refreshed by `update_statistics`
+        self.avg_lengths = dict()
+        self.idf = dict()
+        self.document_idf = dict()
+        self.__stale = True
+
+        # TF-IDF model over titles and texts, fitted by `fit_tfidf`
+        self.tfidf_vectorizer = None
+        self.tfidf_matrix = None
+
+        if collection is not None:
+            if tokens is None:
+                tokens = TOKENIZER.tokenize_many(doc.text for doc in collection)
+            for doc, doc_tokens in zip(collection, tokens):
+                self.add(doc, doc_tokens)
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: The number of indexed documents.
+        """
+        return len(self.sources)
+
+    def add(self, doc, tokens: List[str] = None) -> int:
+        """
+        Add a document at the end of the index.
+
+        Args:
+            doc: The document to index.
+            tokens (list): The cleaned tokens of the document text. If None,
+                the text is cleaned with `clean_paragraph`.
+
+        Returns:
+            int: The position of the document in the index.
+        """
+        position = len(self.sources)
+        if tokens is None:
+            tokens = clean_paragraph(doc.text)
+        fields = {'title': clean_paragraph(doc.title or ''), 'text': tokens}
+
+        for field, field_tokens in fields.items():
+            term_counts = Counter(field_tokens)
+            for term, frequency in term_counts.items():
+                self.field_postings[field].setdefault(term, dict())[position] = frequency
+            self.doc_lengths[field].append(len(field_tokens))
+            if field == 'text':
+                self.doc_norms.append(math.sqrt(sum(tf * tf for tf in term_counts.values())))
+
+        self.sources.append(doc.source)
+        self.__stale = True
+        self.tfidf_vectorizer = None
+        self.tfidf_matrix = None
+        return position
+
+    def fit_tfidf(self, collection: list) -> None:
+        """
+        Fit the TF-IDF model over the titles and texts of the indexed collection.
+
+        Args:
+            collection (list): The indexed documents, in collection order.
+        """
+        self.tfidf_vectorizer = TfidfVectorizer(stop_words='english')
+        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(
+            [f'{doc.title} {doc.text}' for doc in collection]
+        )
+
+    def save(self, path: str, checksum: str) -> None:
+        """
+        Save the index with its statistics to a pickle file.
+
+        Args:
+            path (str): The path to the index file, replaced atomically.
+            checksum (str): The content hash of the indexed corpus.
+        """
+        self.__ensure_statistics()
+        artifact = {'version': INDEX_VERSION, 'checksum': checksum, 'index': self}
+        with atomic_open(path) as file:
+            pickle.dump(artifact, file)
+
+    @classmethod
+    def load(cls, path: str, checksum: str):
+        """
+        Load an index saved with `save`.
+
+        Args:
+            path (str): The path to the index file.
+            checksum (str): The content hash of the corpus the index must match.
+
+        Returns:
+            InvertedIndex | None: The index, or None if the file is missing, unreadable,
+                from another index version or built from other corpus contents.
+        """
+        try:
+            with open(path, 'rb') as file:
+                artifact = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError) as e:
+            logging.warning(f'Ignoring unreadable index {path}: {e}')
+            return None
+
+        if not isinstance(artifact, dict) or artifact.get('version') != INDEX_VERSION:
+            return None
+        if artifact.get('checksum') != checksum:
+            return None
+        return artifact['index']
+
+    def update_statistics(self) -> None:
+        """
+        Compute the average field lengths and the IDF tables used by BM25.
+        """
+        n_docs = len(self)
+        self.avg_lengths = {
+            field: sum(lengths) / n_docs if n_docs else 0.0
+            for field, lengths in self.doc_lengths.items()
+        }
+        self.idf = {
+            term: self.__idf(n_docs, len(postings))
+            for term, postings in self.postings.items()
+        }
+
+        # BM25F counts a document once when the term is in any of its fields
+        title_postings = self.field_postings['title']
+        self.document_idf = dict()
+        for term in self.postings.keys() | title_postings.keys():
+            positions = self.postings.get(term, dict()).keys() | title_postings.get(term, dict()).keys()
+            self.document_idf[term] = self.__idf(n_docs, len(positions))
+        self.__stale = False
+
+    @staticmethod
+    def __idf(n_docs: int, doc_freq: int) -> float:
+        """
+        Returns:
+            float: The non-negative BM25 inverse document frequency.
+        """
+        return math.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def __ensure_statistics(self) -> None:
+        """
+        Refresh the collection statistics if documents were added since the last update.
+        """
+        if self.__stale:
+            self.update_statistics()
+
+    def score_cosine(self, terms: Iterable[str]) -> Dict[int, float]:
+        """
+        Score documents with the cosine similarity between their term
+        frequencies and a binary query vector.
+
+        Args:
+            terms (list): The query terms.
+
+        Returns:
+            dict: The cosine score of every document containing a query term,
+                keyed by position.
+        """
+        query_terms = {term for term in terms if term in self.postings}
+        if not query_terms:
+            return dict()
+
+        scores = dict()
+        for term in query_terms:
+            for position, frequency in self.postings[term].items():
+                scores[position] = scores.get(position, 0) + frequency
+
+        query_norm = math.sqrt(len(query_terms))
+        return {
+            position: score / (query_norm * self.doc_norms[position])
+            for position, score in scores.items()
+        }
+
+    def score_bm25(self, terms: Iterable[str], k1: float = 1.2, b: float = 0.75) -> Dict[int, float]:
+        """
+        Score documents with Okapi BM25 over the text field.
+
+        Args:
+            terms (list): The query terms.
+            k1 (float): The term frequency saturation.
+            b (float): The document length normalization.
+
+        Returns:
+            dict: The BM25 score of every document containing a query term,
+                keyed by position.
+        """
+        self.__ensure_statistics()
+        lengths = self.doc_lengths['text']
+        avg_length = self.avg_lengths['text'] or 1.0
+
+        scores = dict()
+        for term in set(terms):
+            if term not in self.postings:
+                continue
+            idf = self.idf[term]
+            for position, frequency in self.postings[term].items():
+                norm = k1 * (1 - b + b * lengths[position] / avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+        return scores
+
+    def score_bm25f(self,
+                    terms: Iterable[str],
+                    k1: float = 1.2,
+                    b: float = 0.75,
+                    field_weights: Dict[str, float] = None) -> Dict[int, float]:
+        """
+        Score documents with BM25F, combining the length-normalized title and
+        text frequencies before the saturation.
+
+        Args:
+            terms (list): The query terms.
+            k1 (float): The term frequency saturation.
+            b (float): The field length normalization.
+            field_weights (dict): The weight of each field. Defaults to a title
+                weighted twice as much as the text.
+
+        Returns:
+            dict: The BM25F score of every document containing a query term,
+                keyed by position.
+        """
+        self.__ensure_statistics()
+        if field_weights is None:
+            field_weights = {'title': 2.0, 'text': 1.0}
+
+        scores = dict()
+        for term in set(terms):
+            if term not in self.document_idf:
+                continue
+            weighted_tf = dict()
+            for field, weight in field_weights.items():
+                lengths = self.doc_lengths[field]
+                avg_length = self.avg_lengths[field] or 1.0
+                for position, frequency in self.field_postings[field].get(term, dict()).items():
+                    norm = 1 - b + b * lengths[position] / avg_length
+                    weighted_tf[position] = weighted_tf.get(position, 0.0) + weight * frequency / norm
+
+            idf = self.document_idf[term]
+            for position, tf in weighted_tf.items():
+                scores[position] = scores.get(position, 0.0) + idf * tf * (k1 + 1) / (tf + k1)
+        return scores
@@ -0,0 +1,290 @@
+import uuid
+import logging
+import multiprocessing
+from threading import Lock
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from typing import Any, Callable, Hashable
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = 'pending', 'running', 'done', 'failed', 'cancelled'
+# Worker processes of a queue, each one holding its own copy of the loaded data
+DEFAULT_WORKERS = 2
+
+
+class JobCancelled(Exception):
+    """
+    Raised in a worker by the progress callback of a cancelled job.
+    """
+
+
+def _run_job(job_id: str, fn: Callable, args: tuple, kwargs: dict, progress, cancelled) -> Any:
+    """
+    Run a job function in a worker process with a `report` progress callback.
+
+    Args:
+        job_id (str): The id of the job.
+        fn (callable): The job function, called with the `report` keyword argument.
+        args (tuple): The positional arguments of the function.
+        kwargs (dict): The keyword arguments of the function.
+        progress (dict): The shared progress of the jobs, keyed by job id.
+        cancelled (dict): The shared ids of the cancelled jobs.
+
+    Returns:
+        The result of the function.
+    """
+    def report(stage: str, fraction: float = None) -> None:
+        # Progress reports double as cancellation points
+        if job_id in cancelled:
+            raise JobCancelled(job_id)
+        progress[job_id] = (stage, fraction)
+
+    report('Started', 0.0)
+    return fn(*args, report=report, **kwargs)
+
+
+def _ready() -> bool:
+    """
+    Returns:
+        bool: True, once a worker process is started.
+    """
+    return True
+
+
+class Job:
+    """
+    Class representing a job submitted to a JobQueue.
+    """
+    def __init__(self, job_id: str, key: Hashable, future) -> None:
+        """
+        Initialize a Job object.
+
+        Args:
+            job_id (str): The id of the job.
+            key: The key of the request, shared by identical requests.
+            future (Future): The future of the job in the process pool.
+        """
+        self.id = job_id
+        self.key = key
+        self.future = future
+        self.waiters = 1
+        self.cancelled = False
+
+
+class JobQueue:
+    """
+    Class representing a queue of jobs run by local worker processes.
+
+    Identical requests submitted while a job is in flight share this job, and a
+    job nobody waits for anymore is cancelled. Workers report their progress
+    through a `report(stage, fraction)` callback given to the job function.
+
+    Forked workers share the memory of the process starting them only until
+    they touch it: reference counts soon copy the pages of the loaded corpora,
+    indexes and TF-IDF matrices in every worker. The resident memory thus grows
+    with the number of workers, beyond the `memory_budget` of each process
+    `CorpusRegistry`, so the queue has few workers unless told otherwise.
+    """
+    def __init__(self, max_workers: int = DEFAULT_WORKERS, keep_finished: int = 64) -> None:
+        """
+        Initialize a JobQueue object. The worker processes are started by `start`.
+
+        Args:
+            max_workers (int, optional): The number of worker processes, trading
+                memory for concurrent jobs. Defaults to `DEFAULT_WORKERS`, None
+                starts one per CPU.
+            keep_finished (int): The number of finished jobs kept for their results.
+        """
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        self.__executor = None
+        self.__manager = None
+        self.__progress = None
+        self.__cancelled = None
+        self.__jobs = OrderedDict()
+        self.__in_flight = dict()
+        self.__lock = Lock()
+
+    def start(self, initializer: Callable = None, initargs: tuple = ()) -> None:
+        """
+        Start the worker processes and the shared progress state.
+
+        It should be called from the main thread before serving requests: with the
+        'fork' start method, the workers are copies of the process at this point,
+        inheriting its loaded modules and data, such as the corpora of the
+        `REGISTRY` after a warm-up. Workers started with 'spawn' or 'forkserver'
+        inherit nothing and should load their data with the initializer.
+
+        Args:
+            initializer (callable, optional): Called in every worker process when it starts.
+            initargs (tuple, optional): The arguments of the initializer.
+        """
+        with self.__lock:
+            if self.__executor is not None:
+                return
+            self.__manager = multiprocessing.Manager()
+            self.__progress = self.__manager.dict()
+            self.__cancelled = self.__manager.dict()
+            self.__executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                  initializer=initializer, initargs=initargs)
+        # Forked workers are only created on a first submission, make it now
+        self.__executor.submit(_ready).result()
+
+    def submit(self, key: Hashable, fn: Callable, *args, supersedes: str = None, **kwargs) -> str:
+        """
+        Submit a job, or join the in-flight job of an identical request.
+
+        Args:
+            key: The key of the request, such as its parameters.
+            fn (callable): A picklable function accepting a `report` keyword argument.
+            *args: The positional arguments of the function.
+            supersedes (str, optional): The id of a job this request replaces, which
+                is cancelled unless other requests still wait for it.
+            **kwargs: The keyword arguments of the function.
+
+        Returns:
+            str: The id of the job.
+
+        Raises:
+            RuntimeError: If the queue is not started.
+        """
+        future = None
+        with self.__lock:
+            if self.__executor is None:
+                raise RuntimeError('The job queue must be started before submitting jobs')
+            job_id = self.__in_flight.get(key)
+            if job_id is not None:
+                self.__jobs[job_id].waiters += 1
+            else:
+                job_id = uuid.uuid4().hex
+                future = self.__executor.submit(_run_job, job_id, fn, args, kwargs,
+                                                self.__progress, self.__cancelled)
+                self.__jobs[job_id] = Job(job_id, key, future)
+                self.__in_flight[key] = job_id
+                self.__prune()
+        if future is not None:
+            # Registered out of the lock, the callback runs at once if the job is done
+            future.add_done_callback(lambda _: self.__finish(job_id))
+
+        if supersedes is not None and supersedes != job_id:
+            self.cancel(supersedes)
+        return job_id
+
+    def __finish(self, job_id: str) -> None:
+        """
+        Forget the shared state of a finished job.
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is not None and self.__in_flight.get(job.key) == job_id:
+                del self.__in_flight[job.key]
+        try:
+            self.__progress.pop(job_id, None)
+            self.__cancelled.pop(job_id, None)
+        except (EOFError, OSError, BrokenPipeError) as e:
+            # The manager is already shut down
+            logging.debug(f'Job {job_id} finished after shutdown: {e}')
+
+    def __prune(self) -> None:
+        """
+        Forget the oldest finished jobs beyond `keep_finished`.
+        """
+        finished = [job_id for job_id, job in self.__jobs.items() if job.future.done()]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.__jobs[job_id]
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Stop waiting for a job. The job is cancelled once no request waits for it,
+        a running job stops at its next progress report.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            bool: Whether the job is cancelled.
+        """
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            if job is None or job.future.done():
+                return False
+            job.waiters -= 1
+            if job.waiters > 0:
+                return False
+            job.cancelled = True
+            if self.__in_flight.get(job.key) == job_id:
+                del self.__in_flight[job.key]
+        if not job.future.cancel():
+            self.__cancelled[job_id] = True
+            # The job may have finished, and forgotten its state, in the meantime
+            if job.future.done():
+                self.__cancelled.pop(job_id, None)
+        return True
+
+    def status(self, job_id: str) -> dict:
+        """
+        Get the state of a job.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            dict: The status of the job with the following keys:
+                - state (str): 'pending', 'running', 'done', 'failed' or 'cancelled'.
+                - stage (str): The last stage reported by the job, or None.
+                - progress (float): The last fraction reported by the job, or None.
+                - error (str): The error of a failed job, or None.
+
+        Raises:
+            KeyError: If the job is unknown or was forgotten.
+        """
+        job = self.__jobs[job_id]
+        status = {'state': PENDING, 'stage': None, 'progress': None, 'error': None}
+        future = job.future
+
+        if job.cancelled or future.cancelled():
+            status['state'] = CANCELLED
+        elif future.done():
+            error = future.exception()
+            if isinstance(error, JobCancelled):
+                status['state'] = CANCELLED
+            elif error is not None:
+                status['state'] = FAILED
+                status['error'] = f'{type(error).__name__}: {error}'
+            else:
+                status['state'] = DONE
+        else:
+            reported = self.__progress.get(job_id)
+            if reported is not None:
+                status['state'] = RUNNING
+                status['stage'], status['progress'] = reported
+        return status
+
+    def result(self, job_id: str, timeout: float = None) -> Any:
+        """
+        Get the result of a job, waiting for it to finish.
+
+        Args:
+            job_id (str): The id of the job.
+            timeout (float, optional): The maximum time to wait, in seconds.
+
+        Returns:
+            The result of the job function.
+
+        Raises:
+            KeyError: If the job is unknown or was forgotten.
+            CancelledError: If the job was cancelled.
+        """
+        job = self.__jobs[job_id]
+        try:
+            return job.future.result(timeout)
+        except JobCancelled:
+            raise CancelledError(job_id)
+
+    def shutdown(self) -> None:
+        """
+        Cancel the pending jobs and stop the worker processes.
+        """
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True, cancel_futures=True)
+            self.__manager.shutdown()
+            self.__executor = None
@@ -0,0 +1,135 @@
+from bisect import bisect_left
+from threading import Lock
+from typing import Iterable, List, Tuple
+
+# Upper bounds of the latency buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class Histogram:
+    """
+    Class representing a histogram of durations in fixed buckets.
+    """
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize a Histogram object.
+
+        Args:
+            buckets (list): The sorted upper bounds of the buckets, the last one
+                being infinite.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.__lock = Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Count a duration in its bucket.
+
+        Args:
+            value (float): The duration, in seconds.
+        """
+        with self.__lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        """
+        Returns:
+            list: The upper bound of each bucket with the number of durations
+                lower or equal to it.
+        """
+        total = 0
+        cumulative = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class MetricsRegistry:
+    """
+    Class representing the latency histograms of the stages of the application,
+    and its counters, such as the hits of the caches.
+    """
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Initialize a MetricsRegistry object.
+
+        Args:
+            buckets (list): The buckets of the histograms.
+        """
+        self.buckets = tuple(buckets)
+        self.histograms = dict()
+        self.counters = dict()
+        self.__lock = Lock()
+
+    def observe(self, stage: str, duration: float) -> None:
+        """
+        Count the duration of a stage.
+
+        Args:
+            stage (str): The name of the stage.
+            duration (float): The duration, in seconds.
+        """
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.__lock:
+                histogram = self.histograms.setdefault(stage, Histogram(self.buckets))
+        histogram.observe(duration)
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        """
+        Add to a counter.
+
+        Args:
+            counter (str): The name of the counter.
+            value (int): The increment. Defaults to 1.
+        """
+        with self.__lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def clear(self) -> None:
+        """
+        Remove every histogram and counter.
+        """
+        with self.__lock:
+            self.histograms = dict()
+            self.counters = dict()
+
+    def summary(self) -> dict:
+        """
+        Returns:
+            dict: The number of durations, their sum and mean for every stage.
+        """
+        return {
+            stage: {'count': histogram.count, 'sum': histogram.sum,
+                    'mean': histogram.sum / histogram.count if histogram.count else 0.0}
+            for stage, histogram in sorted(self.histograms.items())
+        }
+
+    def to_prometheus(self, name: str = 'stage_duration_seconds') -> str:
+        """
+        Export the histograms in the Prometheus text format.
+
+        Args:
+            name (str): The name of the metric.
+
+        Returns:
+            str: The exposition text, with a `stage` label per histogram, followed
+                by the counters.
+        """
+        lines = [f'# HELP {name} Duration of the application stages.', f'# TYPE {name} histogram']
+        for stage, histogram in sorted(self.histograms.items()):
+            label = stage.replace('\\', '\\\\').replace('"', '\\"')
+            for bound, count in histogram.cumulative_counts():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{label}",le="{le}"}} {count}')
+            lines.append(f'{name}_sum{{stage="{label}"}} {histogram.sum}')
+            lines.append(f'{name}_count{{stage="{label}"}} {histogram.count}')
+        for counter, value in sorted(self.counters.items()):
+            lines += [f'# TYPE {counter} counter', f'{counter} {value}']
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,155 @@
+import os
+from threading import Lock
+from collections import OrderedDict
+from typing import Callable, Hashable, List
+from modules.snapshot import CorpusSnapshot
+
+# Memory of the tokens, index, TF-IDF model and term statistics of the saved corpora
+# once built, measured with tracemalloc, per byte of their index file and of their documents
+WARM_INDEX_FACTOR = 19
+WARM_DOCUMENTS_FACTOR = 40
+
+
+def estimate_size(corpus) -> int:
+    """
+    Estimate the memory used by a corpus once queried, with its documents and the
+    structures derived from them: tokens, search index, TF-IDF model and term
+    statistics.
+
+    The derived structures are estimated from the size of the persisted index of
+    the corpus when it exists, and from the size of its documents otherwise.
+
+    Args:
+        corpus (Corpus): The corpus.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    documents = corpus.documents
+    if isinstance(documents, CorpusSnapshot):
+        documents_size = os.path.getsize(documents.path)
+    else:
+        documents_size = sum(len(doc.title or '') + len(doc.text or '') + len(doc.url or '')
+                             for doc in documents.values())
+    if corpus.index_path is not None and os.path.exists(corpus.index_path):
+        return documents_size + WARM_INDEX_FACTOR * os.path.getsize(corpus.index_path)
+    return documents_size + WARM_DOCUMENTS_FACTOR * documents_size
+
+
+class CorpusRegistry:
+    """
+    Class representing the loaded corpora, one per topic.
+
+    Each topic has its own corpus, with its own document ids and index. The
+    least recently used topics are evicted once the corpora exceed the memory
+    budget.
+    """
+    def __init__(self,
+                 memory_budget: int = None,
+                 sizeof: Callable = estimate_size) -> None:
+        """
+        Initialize a CorpusRegistry object.
+
+        Args:
+            memory_budget (int, optional): The maximum total size of the corpora,
+                as measured by `sizeof`. Defaults to no limit.
+            sizeof (callable, optional): The function measuring a corpus. Defaults
+                to `estimate_size`.
+        """
+        self.memory_budget = memory_budget
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__corpora = OrderedDict()
+        self.__sizes = dict()
+        self.__lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.__corpora)
+
+    def __contains__(self, topic: Hashable) -> bool:
+        return topic in self.__corpora
+
+    def topics(self) -> List[Hashable]:
+        """
+        Returns:
+            list: The loaded topics, from the least to the most recently used.
+        """
+        return list(self.__corpora)
+
+    def get(self, topic: Hashable):
+        """
+        Get the corpus of a topic and mark it as the most recently used.
+
+        Args:
+            topic: The topic.
+
+        Returns:
+            Corpus | None: The corpus, or None if the topic is not loaded.
+        """
+        with self.__lock:
+            if topic not in self.__corpora:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__corpora.move_to_end(topic)
+            return self.__corpora[topic]
+
+    def put(self, topic: Hashable, corpus) -> None:
+        """
+        Register the corpus of a topic, evicting the least recently used topics
+        beyond the memory budget. The registered corpus itself is never evicted.
+
+        Args:
+            topic: The topic.
+            corpus (Corpus): The corpus of the topic.
+        """
+        size = self.sizeof(corpus)
+        with self.__lock:
+            self.__corpora[topic] = corpus
+            self.__corpora.move_to_end(topic)
+            self.__sizes[topic] = size
+            if self.memory_budget is not None:
+                while len(self.__corpora) > 1 and self.memory_usage() > self.memory_budget:
+                    evicted, _ = self.__corpora.popitem(last=False)
+                    del self.__sizes[evicted]
+                    self.evictions += 1
+
+    def remove(self, topic: Hashable) -> None:
+        """
+        Remove the corpus of a topic, for instance after it changed on disk.
+
+        Args:
+            topic: The topic.
+        """
+        with self.__lock:
+            self.__corpora.pop(topic, None)
+            self.__sizes.pop(topic, None)
+
+    def clear(self) -> None:
+        """
+        Remove every corpus and reset the counters.
+        """
+        with self.__lock:
+            self.__corpora.clear()
+            self.__sizes.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def memory_usage(self) -> int:
+        """
+        Returns:
+            int: The total size of the corpora, as measured when they were registered.
+        """
+        return sum(self.__sizes.values())
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The number of hits, misses and evictions, the loaded topics,
+                their total size and the memory budget.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'topics': self.topics(), 'size': self.memory_usage(), 'budget': self.memory_budget}
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import pickle
+import numpy as np
+from collections.abc import MutableMapping
+from typing import Iterator
+from modules.document import Document, RedditDocument, ArxivDocument
+from modules.store import ColumnarStore, TEXT_FIELDS
+from utils.tools import atomic_open
+
+# File layout: magic, version and header length, the JSON header, then the
+# 8-byte aligned columns and the UTF-8 text blob described by the header
+MAGIC = b'CSNP'
+SNAPSHOT_VERSION = 1
+PREAMBLE = struct.Struct('<4sIQ')
+ALIGNMENT = 8
+
+COLUMNS = {
+    'ids': 'int64',
+    'dates': 'int64',
+    'date_kinds': 'int8',
+    'num_comments': 'int64',
+    'author_codes': 'int64',
+    'source_codes': 'int64',
+    'offsets': 'int64',
+}
+
+
+def write_snapshot(documents, path: str) -> None:
+    """
+    Write documents to a snapshot file.
+
+    Args:
+        documents (dict): The documents keyed by document id, such as `Corpus.documents`.
+        path (str): The path to the snapshot file, replaced atomically.
+    """
+    store = documents if isinstance(documents, ColumnarStore) else ColumnarStore.from_documents(documents)
+
+    # Text offsets of the store count characters, the snapshot ones count UTF-8 bytes
+    texts = [
+        store.get_text(row, field).encode('utf-8')
+        for row in range(len(store)) for field in TEXT_FIELDS
+    ]
+    columns = {name: np.frombuffer(getattr(store, name), dtype=dtype) for name, dtype in COLUMNS.items()
+               if name != 'offsets'}
+    columns['offsets'] = np.concatenate([[0], np.cumsum([len(text) for text in texts], dtype=np.int64)])
+
+    sections = dict()
+    position = 0
+    for name, column in columns.items():
+        sections[name] = {'offset': position, 'dtype': COLUMNS[name], 'count': len(column)}
+        position += -(-column.nbytes // ALIGNMENT) * ALIGNMENT
+    sections['blob'] = {'offset': position, 'count': int(columns['offsets'][-1])}
+
+    header = json.dumps({
+        'n_docs': len(store),
+        'fields': list(TEXT_FIELDS),
+        'authors': store.authors,
+        'sources': store.sources,
+        'sections': sections,
+    }).encode('utf-8')
+    header += b' ' * (-(PREAMBLE.size + len(header)) % ALIGNMENT)
+
+    # Processes loading the same stale snapshot may rewrite it concurrently
+    with atomic_open(path) as file:
+        file.write(PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+        file.write(header)
+        for column in columns.values():
+            data = column.astype(column.dtype.newbyteorder('<'), copy=False).tobytes()
+            file.write(data + b'\x00' * (-len(data) % ALIGNMENT))
+        for text in texts:
+            file.write(text)
+
+
+def convert_pickle(pkl_path: str, snapshot_path: str = None) -> str:
+    """
+    Convert a `data/corpus_*.pkl` corpus pickle to a snapshot.
+
+    Args:
+        pkl_path (str): The path to the corpus pickle.
+        snapshot_path (str, optional): The path to the snapshot. Defaults to the
+            pickle path with the `.snap` extension.
+
+    Returns:
+        str: The path to the snapshot.
+    """
+    if snapshot_path is None:
+        snapshot_path = os.path.splitext(pkl_path)[0] + '.snap'
+    with open(pkl_path, 'rb') as file:
+        corpus = pickle.load(file)
+    write_snapshot(corpus.documents, snapshot_path)
+    return snapshot_path
+
+
+class CorpusSnapshot(MutableMapping):
+    """
+    Class representing a corpus snapshot opened with mmap, as a mapping of
+    document id to document.
+
+    Only the header is read when opening, columns are views of the mapped file
+    and a document is decoded when it is accessed. Documents added afterwards
+    are kept in memory.
+    """
+    def __init__(self, path: str) -> None:
+        """
+        Open a snapshot file.
+
+        Args:
+            path (str): The path to the snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot or has another version.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self.__mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_length = PREAMBLE.unpack_from(self.__mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f'{path} is not a corpus snapshot')
+        if version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f'Unsupported snapshot version {version} in {path}')
+
+        header = json.loads(bytes(self.__mmap[PREAMBLE.size:PREAMBLE.size + header_length]))
+        self.authors = header['authors']
+        self.sources = header['sources']
+        data_start = PREAMBLE.size + header_length
+
+        self.columns = {
+            name: np.frombuffer(self.__mmap, dtype=np.dtype(section['dtype']).newbyteorder('<'),
+                                count=section['count'], offset=data_start + section['offset'])
+            for name, section in header['sections'].items() if name != 'blob'
+        }
+        self.__blob_start = data_start + header['sections']['blob']['offset']
+        self.__row_of = None
+        self.__added = dict()
+
+    def close(self) -> None:
+        """
+        Release the columns and unmap the file.
+        """
+        self.columns = dict()
+        self.__mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict:
+        """
+        Returns:
+            dict: The state to pickle, the path of the file and the added documents.
+        """
+        return {'path': self.path, 'added': self.__added}
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Reopen a pickled snapshot from its file.
+
+        Args:
+            state (dict): The pickled state.
+        """
+        self.__init__(state['path'])
+        self.__added = state['added']
+
+    def __len__(self) -> int:
+        return len(self.columns['ids']) + len(self.__added)
+
+    def __iter__(self) -> Iterator[int]:
+        yield from (int(doc_id) for doc_id in self.columns['ids'])
+        yield from self.__added
+
+    def __contains__(self, doc_id) -> bool:
+        return self.__row(doc_id) is not None or doc_id in self.__added
+
+    def __getitem__(self, doc_id: int) -> Document:
+        row = self.__row(doc_id)
+        if row is None:
+            return self.__added[doc_id]
+        return self.get_row(row)
+
+    def __setitem__(self, doc_id: int, doc) -> None:
+        if doc_id in self:
+            raise KeyError(f'Document {doc_id} is already stored')
+        self.__added[doc_id] = doc
+
+    def __delitem__(self, doc_id: int) -> None:
+        raise TypeError('Documents can not be removed from a snapshot')
+
+    def __row(self, doc_id) -> int | None:
+        """
+        Returns:
+            int | None: The row of a document in the file, or None if it is not there.
+        """
+        if self.__row_of is None:
+            self.__row_of = {int(doc_id): row for row, doc_id in enumerate(self.columns['ids'])}
+        try:
+            return self.__row_of.get(int(doc_id))
+        except (TypeError, ValueError):
+            return None
+
+    def get_text(self, row: int, field: str) -> str:
+        """
+        Decode a text field of a document from the mapped blob.
+
+        Args:
+            row (int): The row of the document.
+            field (str): One of 'title', 'text' or 'url'.
+
+        Returns:
+            str: The text of the field.
+        """
+        position = row * len(TEXT_FIELDS) + TEXT_FIELDS.index(field)
+        offsets = self.columns['offsets']
+        start = self.__blob_start + int(offsets[position])
+        end = self.__blob_start + int(offsets[position + 1])
+        return self.__mmap[start:end].decode('utf-8')
+
+    def get_row(self, row: int) -> Document:
+        """
+        Decode a document from its row.
+
+        Args:
+            row (int): The row of the document.
+
+        Returns:
+            Document: A RedditDocument, an ArxivDocument or a Document depending on its source.
+        """
+        columns = self.columns
+        author_code = int(columns['author_codes'][row])
+        source_code = int(columns['source_codes'][row])
+        author = self.authors[author_code] if author_code >= 0 else None
+        source = self.sources[source_code] if source_code >= 0 else None
+        num_comments = int(columns['num_comments'][row])
+        date = ColumnarStore.decode_date(int(columns['dates'][row]), int(columns['date_kinds'][row]))
+        title, text, url = (self.get_text(row, field) for field in TEXT_FIELDS)
+
+        if num_comments >= 0:
+            return RedditDocument(title=title, date=date, author=author, url=url, text=text,
+                                  source=source, num_comments=num_comments)
+        if source == 'arxiv':
+            return ArxivDocument(title=title, date=date, authors=[author or ''], url=url,
+                                 source=source, text=text)
+        return Document(title=title, date=date, author=author, url=url, source=source, text=text)
+
+
+if __name__ == '__main__':
+    # Convert the corpus pickles given as arguments, such as data/corpus_*.pkl
+    for pkl_path in sys.argv[1:]:
+        print(convert_pickle(pkl_path))
@@ -0,0 +1,338 @@
+import datetime
+from bisect import bisect_right
+import numpy as np
+import pandas as pd
+from array import array
+from collections.abc import Mapping
+from typing import Iterator
+from modules.document import Document
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+NAT = np.iinfo(np.int64).min
+
+# Kind of the stored date, to give back the type the document was added with
+NO_DATE, DATE, DATETIME = 0, 1, 2
+
+# Text fields stored in the shared buffer, in this order for each document
+TEXT_FIELDS = ('title', 'text', 'url')
+
+
+class DocumentView:
+    """
+    Class representing a read-only document stored in a ColumnarStore.
+
+    It has the attributes of a Document but only keeps a reference to its row.
+    """
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row: int) -> None:
+        """
+        Initialize a DocumentView object.
+
+        Args:
+            store (ColumnarStore): The store holding the document.
+            row (int): The row of the document in the store.
+        """
+        self._store = store
+        self._row = row
+
+    @property
+    def title(self) -> str:
+        return self._store.get_text(self._row, 'title')
+
+    @property
+    def text(self) -> str:
+        return self._store.get_text(self._row, 'text')
+
+    @property
+    def url(self) -> str:
+        return self._store.get_text(self._row, 'url')
+
+    @property
+    def author(self) -> str | None:
+        code = self._store.author_codes[self._row]
+        return None if code < 0 else self._store.authors[code]
+
+    @property
+    def source(self) -> str | None:
+        code = self._store.source_codes[self._row]
+        return None if code < 0 else self._store.sources[code]
+
+    @property
+    def date(self) -> datetime.date | datetime.datetime | None:
+        return self._store.get_date(self._row)
+
+    @property
+    def num_comments(self) -> int | None:
+        num_comments = self._store.num_comments[self._row]
+        return None if num_comments < 0 else num_comments
+
+    __repr__ = Document.__repr__
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the document, as its Document class does.
+        """
+        resp = Document.__str__(self)
+        if self.num_comments is not None:
+            resp += f", with {self.num_comments} comments"
+        return resp
+
+
+class ColumnarStore(Mapping):
+    """
+    Class representing documents stored column by column, as a mapping of
+    document id to DocumentView.
+
+    Ids, dates and comment counts are contiguous arrays, titles, texts and URLs
+    are slices of a few large text chunks and authors and sources are interned
+    strings referenced by code.
+    """
+    def __init__(self) -> None:
+        """
+        Initialize an empty ColumnarStore object.
+        """
+        self.ids = array('q')
+        self.dates = array('q')
+        self.date_kinds = array('b')
+        self.num_comments = array('q')
+        self.author_codes = array('q')
+        self.source_codes = array('q')
+        self.offsets = array('q', [0])
+
+        self.authors = list()
+        self.sources = list()
+        self.__author_code = dict()
+        self.__source_code = dict()
+        self.__row_of = dict()
+
+        # Appended texts are joined into a new chunk on the next read, chunks
+        # start at the text offsets of `chunk_starts`
+        self.__chunks = list()
+        self.__chunk_starts = array('q')
+        self.__pending = list()
+
+    @classmethod
+    def from_documents(cls, documents: Mapping):
+        """
+        Build a store from documents.
+
+        Args:
+            documents (dict): The documents, keyed by document id.
+
+        Returns:
+            ColumnarStore: The store holding the documents.
+        """
+        store = cls()
+        for doc_id, doc in documents.items():
+            store[doc_id] = doc
+        return store
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.__row_of)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self.__row_of
+
+    def __getitem__(self, doc_id: int) -> DocumentView:
+        return DocumentView(self, self.__row_of[doc_id])
+
+    def __setitem__(self, doc_id: int, doc) -> None:
+        """
+        Append a document to the store.
+
+        Args:
+            doc_id (int): The ID of the document.
+            doc: The document to store.
+
+        Raises:
+            KeyError: If the ID is already stored, documents can not be replaced.
+        """
+        if doc_id in self.__row_of:
+            raise KeyError(f'Document {doc_id} is already stored')
+
+        self.__row_of[doc_id] = len(self.ids)
+        self.ids.append(doc_id)
+
+        date = doc.date
+        if isinstance(date, datetime.datetime):
+            self.dates.append((date.replace(tzinfo=None) - EPOCH) // MICROSECOND)
+            self.date_kinds.append(DATETIME)
+        elif isinstance(date, datetime.date):
+            self.dates.append((datetime.datetime.combine(date, datetime.time()) - EPOCH) // MICROSECOND)
+            self.date_kinds.append(DATE)
+        else:
+            self.dates.append(NAT)
+            self.date_kinds.append(NO_DATE)
+
+        num_comments = getattr(doc, 'num_comments', None)
+        self.num_comments.append(-1 if num_comments is None else num_comments)
+        self.author_codes.append(self.__intern(self.authors, self.__author_code, doc.author))
+        self.source_codes.append(self.__intern(self.sources, self.__source_code, doc.source))
+
+        for field in TEXT_FIELDS:
+            value = getattr(doc, field) or ''
+            self.__pending.append(value)
+            self.offsets.append(self.offsets[-1] + len(value))
+
+    @staticmethod
+    def __intern(values: list, codes: dict, value: str | None) -> int:
+        """
+        Returns:
+            int: The code of the value, added to the values if new, or -1 for None
+                as in pandas categorical codes.
+        """
+        if value is None:
+            return -1
+        if value not in codes:
+            codes[value] = len(values)
+            values.append(value)
+        return codes[value]
+
+    def __flush(self) -> None:
+        """
+        Join the pending texts into a new chunk.
+
+        The last chunks are merged while they are not larger than the new one, so
+        there are a logarithmic number of chunks and each text is copied a
+        logarithmic number of times, whatever the order of appends and reads.
+        """
+        if not self.__pending:
+            return
+        chunk = ''.join(self.__pending)
+        self.__pending = list()
+        if not chunk:
+            return
+        start = self.offsets[-1] - len(chunk)
+        while self.__chunks and len(self.__chunks[-1]) <= len(chunk):
+            chunk = self.__chunks.pop() + chunk
+            start = self.__chunk_starts.pop()
+        self.__chunks.append(chunk)
+        self.__chunk_starts.append(start)
+
+    @property
+    def buffer(self) -> str:
+        """
+        Returns:
+            str: The titles, texts and URLs of every document, concatenated.
+        """
+        self.__flush()
+        if len(self.__chunks) > 1:
+            self.__chunks = [''.join(self.__chunks)]
+            self.__chunk_starts = array('q', [0])
+        return self.__chunks[0] if self.__chunks else ''
+
+    def get_text(self, row: int, field: str) -> str:
+        """
+        Get a text field of a document.
+
+        Args:
+            row (int): The row of the document.
+            field (str): One of 'title', 'text' or 'url'.
+
+        Returns:
+            str: The text of the field.
+        """
+        position = row * len(TEXT_FIELDS) + TEXT_FIELDS.index(field)
+        start, end = self.offsets[position], self.offsets[position + 1]
+        if start == end:
+            return ''
+        self.__flush()
+        # Texts never span two chunks
+        chunk = bisect_right(self.__chunk_starts, start) - 1
+        chunk_start = self.__chunk_starts[chunk]
+        return self.__chunks[chunk][start - chunk_start:end - chunk_start]
+
+    def get_date(self, row: int) -> datetime.date | datetime.datetime | None:
+        """
+        Get the date of a document, with the type it was added with.
+
+        Args:
+            row (int): The row of the document.
+
+        Returns:
+            date | datetime | None: The date of the document.
+        """
+        return self.decode_date(self.dates[row], self.date_kinds[row])
+
+    @staticmethod
+    def decode_date(value: int, kind: int) -> datetime.date | datetime.datetime | None:
+        """
+        Decode a stored date.
+
+        Args:
+            value (int): The microseconds since the epoch.
+            kind (int): NO_DATE, DATE or DATETIME.
+
+        Returns:
+            date | datetime | None: The date, with the type it was added with.
+        """
+        if kind == NO_DATE:
+            return None
+        date = EPOCH + value * MICROSECOND
+        return date.date() if kind == DATE else date
+
+    def __getstate__(self) -> dict:
+        """
+        Returns:
+            dict: The state to pickle, with the texts joined into a single chunk
+                and without the lookup tables rebuilt by `__setstate__`.
+        """
+        self.buffer
+        state = self.__dict__.copy()
+        for lookup in ('__author_code', '__source_code', '__row_of'):
+            state.pop('_ColumnarStore' + lookup)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Restore a pickled store and rebuild its lookup tables.
+
+        Args:
+            state (dict): The pickled state.
+        """
+        # Stores pickled with a single text buffer
+        buffer = state.pop('_ColumnarStore__buffer', None)
+        if buffer is not None:
+            buffer += ''.join(state.pop('_ColumnarStore__pending', []))
+            state['_ColumnarStore__chunks'] = [buffer] if buffer else []
+            state['_ColumnarStore__chunk_starts'] = array('q', [0] if buffer else [])
+            state['_ColumnarStore__pending'] = list()
+        self.__dict__.update(state)
+        self.__author_code = {author: code for code, author in enumerate(self.authors)}
+        self.__source_code = {source: code for code, source in enumerate(self.sources)}
+        self.__row_of = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Convert the store to a DataFrame.
+
+        The ids, dates, authors and sources columns are read from the store arrays
+        in bulk, pandas copies them into the DataFrame.
+
+        Returns:
+            pd.DataFrame: A DataFrame with the 'id', 'title', 'text', 'author', 'date',
+                'source' and 'url' columns.
+        """
+        buffer = self.buffer
+        offsets = np.frombuffer(self.offsets, dtype=np.int64)
+        step = len(TEXT_FIELDS)
+        texts = {
+            field: [buffer[start:end] for start, end in zip(offsets[i:-1:step], offsets[i + 1::step])]
+            for i, field in enumerate(TEXT_FIELDS)
+        }
+        return pd.DataFrame({
+            'id': np.frombuffer(self.ids, dtype=np.int64),
+            'title': texts['title'],
+            'text': texts['text'],
+            'author': pd.Categorical.from_codes(np.frombuffer(self.author_codes, dtype=np.int64),
+                                                categories=self.authors),
+            'date': np.frombuffer(self.dates, dtype=np.int64).view('datetime64[us]'),
+            'source': pd.Categorical.from_codes(np.frombuffer(self.source_codes, dtype=np.int64),
+                                                categories=self.sources),
+            'url': texts['url'],
+        })
@@ -0,0 +1,37 @@
+from collections import Counter, defaultdict
+from typing import List
+from modules.term_time_index import TermTimeIndex
+
+
+class TermStatistics:
+    """
+    Class representing the term statistics of a corpus, updated document by
+    document as the corpus grows.
+    """
+    def __init__(self) -> None:
+        """
+        Initialize a TermStatistics object.
+        """
+        # Cleaned tokens, as used by the search engine
+        self.term_freq = Counter()
+        self.doc_freq = Counter()
+        self.author_term_freq = defaultdict(Counter)
+        self.author_doc_count = Counter()
+
+        # Lower cased words of the text and title per time bucket, as plotted by the app
+        self.term_time = TermTimeIndex()
+
+    def add(self, doc, tokens: List[str], author_id: int) -> None:
+        """
+        Add the counts of a document.
+
+        Args:
+            doc: The document to add.
+            tokens (list): The cleaned tokens of the document text.
+            author_id (int): The id of the author of the document.
+        """
+        self.term_freq.update(tokens)
+        self.doc_freq.update(set(tokens))
+        self.author_term_freq[author_id].update(tokens)
+        self.author_doc_count[author_id] += 1
+        self.term_time.add(doc)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from collections import Counter, defaultdict
+from typing import Iterable
+
+# Time buckets of a date, labels sort in chronological order
+GRANULARITIES = {
+    'year': lambda date: f'{date.year:04d}',
+    'month': lambda date: f'{date.year:04d}-{date.month:02d}',
+    'week': lambda date: '{:04d}-W{:02d}'.format(*date.isocalendar()[:2]),
+}
+
+
+class TermTimeIndex:
+    """
+    Class representing the counts of every word per time bucket, by year,
+    month and ISO week, updated document by document as the corpus grows.
+
+    Words are the lower cased words of the text and title of the documents.
+    Each word is a sparse row of counts keyed by bucket, so the trend of a
+    few words only reads their rows.
+    """
+    def __init__(self) -> None:
+        """
+        Initialize a TermTimeIndex object.
+        """
+        self.rows = {granularity: defaultdict(Counter) for granularity in GRANULARITIES}
+        self.doc_count = {granularity: Counter() for granularity in GRANULARITIES}
+
+    def add(self, doc) -> None:
+        """
+        Add the word counts of a document to the buckets of its date.
+        Documents without a date are ignored.
+
+        Args:
+            doc: The document to add.
+        """
+        try:
+            buckets = {granularity: bucket(doc.date) for granularity, bucket in GRANULARITIES.items()}
+        except (ValueError, AttributeError, TypeError):
+            return
+
+        words = Counter((doc.text + ' ' + doc.title).lower().split())
+        for granularity, bucket in buckets.items():
+            rows = self.rows[granularity]
+            for word, count in words.items():
+                rows[word][bucket] += count
+            self.doc_count[granularity][bucket] += 1
+
+    def buckets(self, granularity: str = 'year') -> list:
+        """
+        Args:
+            granularity (str): 'year', 'month' or 'week'.
+
+        Returns:
+            list: The sorted labels of the buckets holding documents.
+
+        Raises:
+            ValueError: If the granularity is not supported.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'Unsupported granularity: {granularity}')
+        return sorted(self.doc_count[granularity])
+
+    def series(self,
+               words: Iterable[str],
+               granularity: str = 'year',
+               normalize: bool = False) -> pd.DataFrame:
+        """
+        Get the counts of words over time, aligned on the buckets of the corpus.
+
+        Args:
+            words (list): The words to count, matched lower cased.
+            granularity (str): 'year', 'month' or 'week'. Defaults to 'year'.
+            normalize (bool): Divide the counts by the number of documents of
+                each bucket. Defaults to False.
+
+        Returns:
+            pd.DataFrame: The counts with a column per lower cased word, in the
+                given order, indexed by bucket label. Buckets without the word
+                count 0.
+
+        Raises:
+            ValueError: If the granularity is not supported.
+        """
+        buckets = self.buckets(granularity)
+        columns = list(dict.fromkeys(word.lower() for word in words))
+        position = {bucket: i for i, bucket in enumerate(buckets)}
+
+        counts = np.zeros((len(buckets), len(columns)), dtype=np.int64)
+        rows = self.rows[granularity]
+        for j, word in enumerate(columns):
+            if word in rows:
+                row = rows[word]
+                counts[[position[bucket] for bucket in row], j] = list(row.values())
+
+        data = counts
+        if normalize and len(buckets) > 0:
+            doc_count = self.doc_count[granularity]
+            data = counts / np.array([doc_count[bucket] for bucket in buckets])[:, None]
+        return pd.DataFrame(data, index=pd.Index(buckets, name=granularity), columns=columns)
@@ -0,0 +1,28 @@
+import unittest
+
+from modules.aho_corasick import AhoCorasick
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def setUp(self):
+        self.automaton = AhoCorasick(['he', 'she', 'his', 'hers', 'he', ''])
+
+    def test_patterns(self):
+        self.assertEqual(self.automaton.patterns, ['he', 'she', 'his', 'hers'])
+
+    def test_finditer(self):
+        matches = sorted(
+            (start, end, self.automaton.patterns[index])
+            for start, end, index in self.automaton.finditer('ushers')
+        )
+        self.assertEqual(matches, [(1, 4, 'she'), (2, 4, 'he'), (2, 6, 'hers')])
+        self.assertEqual(list(self.automaton.finditer('')), [])
+
+    def test_finditer_by_start(self):
+        text = 'ushers his hershe'
+        self.assertEqual(list(self.automaton.finditer_by_start(text)), sorted(self.automaton.finditer(text)))
+        self.assertEqual(list(AhoCorasick([]).finditer_by_start(text)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
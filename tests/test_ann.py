@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+from sklearn.preprocessing import normalize
+
+from modules.ann import ClusterIndex
+
+
+class TestClusterIndex(unittest.TestCase):
+    def setUp(self):
+        generator = np.random.default_rng(0)
+        # Three groups of close vectors around distinct directions
+        centers = np.eye(3, 20) * 5
+        self.vectors = normalize(np.vstack([center + generator.random((10, 20)) for center in centers]))
+        self.index = ClusterIndex(n_clusters=3, n_probe=1).fit(self.vectors)
+
+    def test_clusters(self):
+        self.assertEqual(len(self.index), 30)
+        self.assertEqual(sorted(len(members) for members in self.index.members), [10, 10, 10])
+
+    def test_query(self):
+        positions, scores = self.index.query(0, k=3)
+        self.assertEqual(len(positions), 3)
+        self.assertNotIn(0, positions)
+        self.assertTrue(all(position < 10 for position in positions))
+        self.assertTrue(all(scores[:-1] >= scores[1:]))
+
+        exact = self.vectors @ self.vectors[0]
+        exact[0] = 0
+        self.assertEqual(set(positions), set(np.argsort(-exact)[:3]))
+
+    def test_kneighbors(self):
+        positions, scores = self.index.kneighbors(k=2)
+        for position in range(30):
+            expected, expected_scores = self.index.query(position, k=2)
+            np.testing.assert_array_equal(positions[position], expected)
+            np.testing.assert_allclose(scores[position], expected_scores, rtol=1e-5)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            ClusterIndex(n_probe=0)
+        with self.assertRaises(ValueError):
+            ClusterIndex().query(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,41 @@
+import io
 import unittest
+from unittest import mock
+
+import requests
 
 from modules.api import ArxivApi
 
 
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>ArXiv Query</title>
+  {entries}
+</feed>"""
+
+ENTRY = """<entry>
+    <id>http://arxiv.org/abs/{i}</id>
+    <published>2023-12-0{i}T10:00:00Z</published>
+    <title>Paper {i}</title>
+    <summary>Abstract
+ of paper {i}</summary>
+    <author><name>Author {i}</name></author>
+    <author><name>Coauthor</name></author>
+  </entry>"""
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.status_code = 200
+        self.raw = io.BytesIO(content.encode())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
 
 class TestArxivAPI(unittest.TestCase):
     def setUp(self):
@@ -18,5 +51,41 @@ class TestArxivAPI(unittest.TestCase):
         documents = self.arxiv_obj.set_documents()
         assert documents is not None
 
+class TestArxivStreaming(unittest.TestCase):
+    def setUp(self):
+        self.arxiv_obj = ArxivApi(keyword='machine learning', max_results=3, page_size=2)
+        pages = {
+            0: FEED.format(entries=ENTRY.format(i=1) + ENTRY.format(i=2)),
+            2: FEED.format(entries=ENTRY.format(i=3)),
+        }
+        self.arxiv_obj.session = mock.Mock()
+        self.arxiv_obj.session.get.side_effect = lambda url, params, stream: FakeResponse(pages[params['start']])
+
+    @mock.patch('modules.api.time.sleep')
+    def test_iter_documents(self, sleep):
+        documents = list(self.arxiv_obj.iter_documents())
+        sleep.assert_called_once_with(ArxivApi.PAGE_DELAY)
+        self.assertEqual([doc.title for doc in documents], ['Paper 1', 'Paper 2', 'Paper 3'])
+        self.assertEqual(documents[0].author, 'Author 1, Coauthor')
+        self.assertEqual(documents[0].text, 'Abstract  of paper 1')
+        self.assertEqual(documents[2].date.day, 3)
+        windows = [call.kwargs['params']['max_results'] for call in self.arxiv_obj.session.get.call_args_list]
+        self.assertEqual(windows, [2, 1])
+
+    @mock.patch('modules.api.time.sleep')
+    def test_set_documents_streamed(self, sleep):
+        self.assertEqual(len(self.arxiv_obj.set_documents()), 3)
+
+    @mock.patch('modules.api.time.sleep')
+    def test_failed_page(self, sleep):
+        first_page = FEED.format(entries=ENTRY.format(i=1) + ENTRY.format(i=2))
+        self.arxiv_obj.session.get.side_effect = [FakeResponse(first_page), requests.ConnectionError('reset')]
+        # A later page failing must not pass for the complete results
+        with self.assertRaises(ValueError):
+            list(self.arxiv_obj.iter_documents())
+
+        self.arxiv_obj.session.get.side_effect = requests.ConnectionError('reset')
+        self.assertEqual(list(self.arxiv_obj.iter_documents()), [])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,29 @@
+import unittest
+
+from modules.cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUCache(maxsize=2)
+
+    def test_eviction(self):
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.cache.put('c', 3)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_counters(self):
+        self.cache.put('a', 1)
+        self.cache.get('a')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': 2})
+        self.cache.clear()
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 import os
+import pickle
 import unittest
 import datetime
+from unittest import mock
 
+from modules.author import Author
 from modules.corpus import Corpus
 from modules.document import RedditDocument
 
@@ -36,12 +39,83 @@ class TestCorpus(unittest.TestCase):
         matches = self.corpus.search_text('document')
         self.assertIsNotNone(matches)
 
+    def test_search_modes(self):
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        matches = self.corpus.search_text(['lorem', 'ipsum'], mode='literal', max_per_doc=1)
+        self.assertTrue(all(end - start == 5 for start, end, _ in matches))
+        self.assertEqual(len(matches), len({doc_id for _, _, doc_id in matches}))
+        self.assertEqual(self.corpus.search_text('ips.m', max_per_doc=1)[0][:2], (6, 11))
+        with self.assertRaises(ValueError):
+            self.corpus.search_text('lorem', mode='fuzzy')
+
+    def test_search_first_matches(self):
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        # The first matches by position, whatever the order of the keywords
+        for mode in ('regex', 'literal'):
+            for keywords in (['ipsum', 'lorem'], ['lorem', 'ipsum']):
+                matches = self.corpus.search_text(keywords, mode=mode, max_per_doc=1)
+                self.assertEqual([match[:2] for match in matches if match[2] == 1], [(0, 5)])
+
     def test_stats(self):
         df = self.corpus.get_stats()
         self.assertIsNotNone(df)
         self.assertEqual(len(df), 4)
 
+    def test_stats_dataframe(self):
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        df = self.corpus.get_stats(as_dataframe=True)
+        self.assertListEqual(list(df.columns), ['id', 'word', 'count', 'counter_docs'])
+        lorem = df.set_index('word').loc['lorem']
+        self.assertGreaterEqual(lorem['count'], 1)
+        self.assertEqual(lorem['count'], lorem['counter_docs'])
+
+    def test_isolated_corpora(self):
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        other = Corpus()
+        other.add(self.reddit_doc, 'Other Author')
+        self.assertEqual(list(other.documents), [1])
+        self.assertEqual(len(self.corpus.documents), 1)
+
+    def test_author_postings(self):
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        self.corpus.add(self.reddit_doc, 'Other Author')
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        self.assertEqual(list(self.corpus.get_author_documents('Test Author')), [1, 3])
+        stats = self.corpus.get_author_stats('Test Author')
+        self.assertEqual(stats['documents'], 2)
+        self.assertEqual(stats['first_date'], self.date.date())
+        self.assertEqual(stats['sources'], {'reddit': 2})
+        self.assertIn(('lorem', 2), stats['terms'])
+        with self.assertRaises(ValueError):
+            self.corpus.get_author('Missing Author')
+
+        # Authors pickled with the texts of their production get their postings back
+        old_state = lambda author: {'name': author.name, 'production': [self.text], 'nDoc': author.nDoc}
+        with mock.patch.object(Author, '__getstate__', old_state):
+            data = pickle.dumps(self.corpus)
+        corpus = pickle.loads(data)
+        self.assertEqual(corpus.get_author('Test Author').doc_ids, [1, 3])
+
+    def test_similar_documents(self):
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        other = RedditDocument(title='other', date=self.date, author=self.author, url=self.url,
+                               text='dolor sit amet', source='reddit', num_comments=0)
+        self.corpus.add(other, 'Test Author')
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        similar = self.corpus.get_similar_documents(1, k=2, n_probe=3)
+        self.assertEqual([doc_id for doc_id, _ in similar], [3])
+        self.assertAlmostEqual(similar[0][1], 1.0, places=5)
+
+    def test_incremental_stats(self):
+        before = self.corpus.get_term_stats().term_freq['lorem']
+        self.corpus.add(self.reddit_doc, 'Test Author')
+        term_stats = self.corpus.get_term_stats()
+        self.assertEqual(term_stats.term_freq['lorem'], before + 1)
+        year_freq = self.corpus.calculate_word_freq_per_year(['lorem'])
+        self.assertGreaterEqual(year_freq[('lorem', str(self.date.year))], 1)
+
     def test_get_all_docs(self):
+        self.corpus.add(self.reddit_doc, 'Test Author')
         docs = self.corpus.docs_to_collection()
         print(len(docs))
         self.assertIsInstance(docs, list)
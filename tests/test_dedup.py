@@ -0,0 +1,97 @@
+import os
+import pickle
+import tempfile
+import datetime
+import unittest
+
+from modules.corpus import Corpus
+from modules.dedup import NearDuplicateIndex, optimal_bands, shingles
+from modules.document import RedditDocument
+
+TEXT = ('Reddit crossposts and arXiv versioned re-listings produce many near identical '
+        'documents that inflate the corpus and fill the similar content cards with clones')
+
+
+def make_document(title, text):
+    return RedditDocument(title=title, date=datetime.datetime(2023, 1, 1), author='test_author',
+                          url='https://test.com/', text=text, source='reddit', num_comments=0)
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    def test_shingles(self):
+        self.assertEqual(len(shingles('one two three four five six', size=5)), 2)
+        self.assertEqual(len(shingles('One two', size=5)), 1)
+        self.assertEqual(shingles('', size=5), set())
+
+    def test_query(self):
+        index = NearDuplicateIndex(threshold=0.7)
+        self.assertEqual(index.bands * index.rows, 128)
+        index.add(1, TEXT)
+        index.add(2, 'a completely different text about the orbits of the outer planets')
+        index.add(3, '')
+
+        matches = index.query(TEXT.replace('clones', 'copies'))
+        self.assertEqual([key for key, _ in matches], [1])
+        self.assertTrue(0.7 <= matches[0][1] < 1)
+        self.assertEqual(index.query('nothing in common with the indexed texts at all'), [])
+        self.assertEqual(index.query(''), [])
+        with self.assertRaises(ValueError):
+            index.add(1, TEXT)
+        with self.assertRaises(ValueError):
+            NearDuplicateIndex(bands=3)
+
+    def test_optimal_bands(self):
+        bands, rows = optimal_bands(0.9, 128)
+        self.assertEqual(bands * rows, 128)
+        self.assertGreater(rows, optimal_bands(0.3, 128)[1])
+
+
+class TestCorpusDeduplication(unittest.TestCase):
+    def test_add(self):
+        corpus = Corpus()
+        corpus.add(make_document('crosspost', TEXT), 'test_author')
+        corpus.enable_deduplication(threshold=0.8)
+        self.assertIsNone(corpus.add(make_document('crosspost', TEXT), 'other_author'))
+        self.assertEqual(corpus.add(make_document('original', 'lorem ipsum dolor'), 'test_author'), 2)
+        self.assertEqual(len(corpus.documents), 2)
+        self.assertEqual(len(corpus.authors), 1)
+        self.assertEqual(corpus.dedup_report[0]['duplicate_of'], 1)
+        self.assertEqual(corpus.dedup_report[0]['similarity'], 1.0)
+
+        # The detector is rebuilt after unpickling
+        corpus = pickle.loads(pickle.dumps(corpus))
+        self.assertIsNone(corpus.add(make_document('original', 'lorem ipsum dolor'), 'test_author'))
+        self.assertEqual(len(corpus.dedup_report), 2)
+
+    def test_from_pkl_file(self):
+        corpus = Corpus()
+        corpus.enable_deduplication(threshold=0.8)
+        corpus.add(make_document('crosspost', TEXT), 'test_author')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'corpus.pkl')
+            with open(path, 'wb') as file:
+                pickle.dump({'documents': {1: make_document('original', 'lorem ipsum dolor')},
+                             'authors': {}, '__author_to_id': {}}, file)
+            corpus.from_pkl_file(path)
+        # Duplicates are detected against the loaded documents only
+        self.assertEqual(corpus.add(make_document('crosspost', TEXT), 'test_author'), 2)
+        self.assertIsNone(corpus.add(make_document('original', 'lorem ipsum dolor'), 'test_author'))
+
+    def test_from_pkl_file_ids(self):
+        documents = {doc_id: make_document(f'title {doc_id}', f'text number {doc_id}') for doc_id in range(1, 6)}
+        corpus = Corpus()
+        corpus.enable_deduplication(threshold=0.8)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'corpus.pkl')
+            with open(path, 'wb') as file:
+                pickle.dump({'documents': dict(documents), 'authors': {}, '__author_to_id': {}}, file)
+            corpus.from_pkl_file(path)
+        self.assertEqual(corpus.add(make_document('new', 'a new document about orbits'), 'test_author'),
+                         len(documents) + 1)
+        self.assertEqual(len(corpus.documents), len(documents) + 1)
+        for doc_id, doc in documents.items():
+            self.assertEqual(corpus.get_document(doc_id).title, doc.title)
+
+
+if __name__ == '__main__':
+    unittest.main()
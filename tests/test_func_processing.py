@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from modules.index import InvertedIndex
+
+from utils.func_processing import (
+    SIMILARITY_CACHE,
+    cached_similarity_neighbors,
+    calculate_similarity_articles,
+    calculate_similarity_neighbors,
+    process_similarity_pairs,
+)
+
+
+class TestSimilarity(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'id': [1, 2, 3, 4],
+            'source': ['reddit', 'reddit', 'arxiv', 'arxiv'],
+            'title': ['neural networks', 'neural nets', 'galaxy survey', 'cooking'],
+            'text': [
+                'deep neural networks training',
+                'training neural networks on images',
+                'a survey of galaxy clusters',
+                'pasta recipes',
+            ],
+        })
+
+    def test_neighbors_match_dense(self):
+        dense = calculate_similarity_articles(self.df.copy())
+        neighbors = calculate_similarity_neighbors(self.df.copy(), k=2, block_size=3)
+        reddit_1 = neighbors[neighbors['unique_id'] == 'reddit_1']
+        self.assertEqual(reddit_1['similar_id'].tolist(), ['reddit_2'])
+        self.assertAlmostEqual(reddit_1['similarity'].iloc[0], dense.loc['reddit_1', 'reddit_2'])
+        self.assertNotIn('arxiv_4', neighbors['unique_id'].tolist())
+        self.assertTrue((neighbors['unique_id'] != neighbors['similar_id']).all())
+
+    def test_neighbors_block_budget(self):
+        exact = calculate_similarity_neighbors(self.df.copy(), k=2)
+        with mock.patch('utils.func_processing.SIMILARITY_BLOCK_ELEMENTS', 4):
+            pd.testing.assert_frame_equal(calculate_similarity_neighbors(self.df.copy(), k=2), exact)
+
+    def test_neighbors_ann(self):
+        exact = calculate_similarity_neighbors(self.df.copy(), k=2)
+        # Probing every cluster finds the exact neighbors
+        approximate = calculate_similarity_neighbors(self.df.copy(), k=2, method='ann', n_probe=4)
+        pd.testing.assert_frame_equal(approximate, exact, check_dtype=False)
+        with self.assertRaises(ValueError):
+            calculate_similarity_neighbors(self.df.copy(), method='fuzzy')
+
+    def test_neighbors_saved_tfidf(self):
+        index = InvertedIndex()
+        index.fit_tfidf(list(self.df.itertuples(index=False)))
+        neighbors = calculate_similarity_neighbors(self.df.copy(), k=2, tfidf_matrix=index.tfidf_matrix)
+        pd.testing.assert_frame_equal(neighbors, calculate_similarity_neighbors(self.df.copy(), k=2))
+        with self.assertRaises(ValueError):
+            calculate_similarity_neighbors(self.df.head(2).copy(), tfidf_matrix=index.tfidf_matrix)
+
+    def test_neighbors_single_document(self):
+        neighbors = calculate_similarity_neighbors(self.df.head(1).copy())
+        self.assertEqual(len(neighbors), 0)
+
+    def test_process_similarity_pairs(self):
+        similarity_df = calculate_similarity_articles(self.df)
+        pairs = process_similarity_pairs(self.df, similarity_df)
+        self.assertEqual(set(pairs['reddit'].keys()), {'1', '2'})
+        self.assertEqual(pairs['reddit']['1'][0]['similar_id'], '2')
+        self.assertEqual(pairs['arxiv']['4'], [])
+
+        neighbors = calculate_similarity_neighbors(self.df, k=3)
+        from_neighbors = process_similarity_pairs(self.df, neighbors)
+        for source, documents in pairs.items():
+            for doc_id, similar in documents.items():
+                self.assertEqual([s['similar_id'] for s in from_neighbors[source][doc_id]],
+                                 [s['similar_id'] for s in similar])
+
+    def test_process_similarity_pairs_subset(self):
+        similarity_df = calculate_similarity_articles(self.df)
+        pairs = process_similarity_pairs(self.df, similarity_df, ids=['arxiv_3'], top_n=1)
+        self.assertEqual(pairs['reddit'], {})
+        self.assertEqual(list(pairs['arxiv'].keys()), ['3'])
+
+    def test_cached_similarity_neighbors(self):
+        SIMILARITY_CACHE.clear()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            neighbors = cached_similarity_neighbors(self.df.copy(), k=2, cache_dir=tmp_dir)
+            self.assertEqual(len(os.listdir(tmp_dir)), 1)
+            self.assertIs(cached_similarity_neighbors(self.df.copy(), k=2), neighbors)
+            self.assertEqual(SIMILARITY_CACHE.hits, 1)
+
+            SIMILARITY_CACHE.clear()
+            from_disk = cached_similarity_neighbors(self.df.copy(), k=2, cache_dir=tmp_dir)
+            pd.testing.assert_frame_equal(from_disk, neighbors)
+
+            changed = self.df.copy()
+            changed.loc[0, 'text'] = 'other text'
+            cached_similarity_neighbors(changed, k=2, cache_dir=tmp_dir)
+            self.assertEqual(len(os.listdir(tmp_dir)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import time
+import tempfile
+import datetime
+import unittest
+from unittest import mock
+
+from modules.document import RedditDocument
+from utils import func_retrieval
+from utils.func_retrieval import fetch_sources, search_documents
+
+
+class StubApi:
+    """
+    Stub of the Reddit and Arxiv APIs returning canned documents.
+    """
+    def __init__(self, source, delay=0.0, fail=False):
+        self.source = source
+        self.delay = delay
+        self.fail = fail
+
+    def set_documents(self):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ValueError('No data found. Check your credentials.')
+        return [
+            RedditDocument(
+                title=f'{self.source} {i}',
+                date=datetime.datetime.now(),
+                author='test_author',
+                url=f'https://test.com/{self.source}/{i}',
+                text='lorem ipsum',
+                source=self.source,
+                num_comments=0,
+            )
+            for i in range(2)
+        ]
+
+
+class TestFetchSources(unittest.TestCase):
+    def setUp(self):
+        self.processes = [
+            {'type': 'reddit', 'keyword': 'MachineLearning', 'topic': 'test'},
+            {'type': 'arxiv', 'keyword': 'machine learning', 'topic': 'test'},
+        ]
+
+    def stub_factory(self, apis):
+        factory = mock.MagicMock()
+        factory.side_effect = lambda data: mock.Mock(
+            create_document=lambda: apis[data['type_process']]
+        )
+        return factory
+
+    def test_concurrent_order(self):
+        apis = {'reddit': StubApi('reddit', delay=0.05), 'arxiv': StubApi('arxiv')}
+        with mock.patch('utils.func_retrieval.DocumentFactory', self.stub_factory(apis)):
+            reports = fetch_sources(self.processes)
+        self.assertEqual([report['type'] for report in reports], ['reddit', 'arxiv'])
+        self.assertTrue(all(len(report['documents']) == 2 for report in reports))
+        self.assertGreaterEqual(reports[0]['elapsed'], 0.05)
+
+    def test_failure_isolated(self):
+        apis = {'reddit': StubApi('reddit', fail=True), 'arxiv': StubApi('arxiv')}
+        with mock.patch('utils.func_retrieval.DocumentFactory', self.stub_factory(apis)):
+            reports = fetch_sources(self.processes, concurrent=False)
+        self.assertIn('ValueError', reports[0]['error'])
+        self.assertEqual(reports[0]['documents'], [])
+        self.assertIsNone(reports[1]['error'])
+        self.assertEqual(len(reports[1]['documents']), 2)
+
+    def test_incomplete_corpus_not_saved(self):
+        apis = {'reddit': StubApi('reddit', fail=True), 'arxiv': StubApi('arxiv')}
+        with tempfile.TemporaryDirectory() as data_dir, \
+                mock.patch('utils.func_retrieval.DATA_DIR', data_dir), \
+                mock.patch('utils.func_retrieval.DocumentFactory', self.stub_factory(apis)):
+            corpus = search_documents(self.processes)
+            self.assertTrue(corpus.incomplete)
+            self.assertEqual(len(corpus.documents), 2)
+            self.assertEqual(os.listdir(data_dir), [])
+            self.assertNotIn(func_retrieval.registry_key('test'), func_retrieval.REGISTRY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import glob
+import pickle
+import datetime
+import tempfile
+import unittest
+
+from modules.corpus import Corpus
+from modules.document import RedditDocument
+from modules.snapshot import write_snapshot
+from utils import func_retrieval, instrumentation
+from utils.func_warmup import corpus_topics, warm_up
+
+
+class TestWarmUp(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for topic in ('first', 'second'):
+            documents = {
+                i: RedditDocument(title=f'{topic} {i}', date=datetime.datetime(2023, 1, i),
+                                  author='test_author', url=f'https://test.com/{i}',
+                                  text=f'lorem ipsum {topic} dolor {i}', source='reddit',
+                                  num_comments=0)
+                for i in range(1, 4)
+            }
+            write_snapshot(documents, os.path.join(self.tmp_dir.name, f'corpus_{topic}.snap'))
+
+    def tearDown(self):
+        func_retrieval.REGISTRY.clear()
+        self.tmp_dir.cleanup()
+
+    def test_warm_up(self):
+        self.assertEqual(corpus_topics(self.tmp_dir.name), ['first', 'second'])
+        reports = warm_up(['missing'], data_dir=self.tmp_dir.name)
+        self.assertEqual([report['ready'] for report in reports], [True, True, False])
+        self.assertEqual(reports[0]['documents'], 3)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, 'corpus_first.idx')))
+        self.assertEqual(len(glob.glob(os.path.join(self.tmp_dir.name, 'similarity_*.pkl'))), 2)
+
+        corpus = func_retrieval.load_corpus('first', self.tmp_dir.name)
+        self.assertIs(corpus, func_retrieval.load_corpus('first', self.tmp_dir.name))
+        self.assertEqual(func_retrieval.REGISTRY.stats()['hits'], 2)
+
+        # The same topic saved in another directory is another corpus
+        with tempfile.TemporaryDirectory() as other_dir:
+            self.assertIsNone(func_retrieval.load_corpus('first', other_dir))
+
+        # Queries do not tokenize nor count the terms of a warm corpus
+        instrumentation.enable(log=False)
+        try:
+            with instrumentation.collect_spans() as spans:
+                corpus.get_term_stats()
+                corpus.get_index()
+        finally:
+            instrumentation.disable()
+            instrumentation.METRICS.clear()
+        self.assertEqual(spans, [])
+
+
+    def test_stale_snapshot(self):
+        corpus = Corpus()
+        corpus.add(RedditDocument(title='resaved', date=datetime.datetime(2023, 2, 1), author='test_author',
+                                  url='https://test.com/', text='a newer corpus', source='reddit',
+                                  num_comments=0), 'test_author')
+        pkl_file_path = os.path.join(self.tmp_dir.name, 'corpus_first.pkl')
+        snapshot_file_path = os.path.join(self.tmp_dir.name, 'corpus_first.snap')
+        with open(pkl_file_path, 'wb') as file:
+            pickle.dump(corpus, file)
+        # The pickle is saved after the snapshot
+        mtime = os.path.getmtime(snapshot_file_path)
+        os.utime(snapshot_file_path, (mtime - 20, mtime - 20))
+        os.utime(pkl_file_path, (mtime - 10, mtime - 10))
+
+        loaded = func_retrieval.load_corpus('first', self.tmp_dir.name)
+        self.assertEqual([doc.title for doc in loaded.documents.values()], ['resaved'])
+        # The snapshot is converted again and opened on the next loads
+        self.assertGreater(os.path.getmtime(snapshot_file_path), os.path.getmtime(pkl_file_path))
+        func_retrieval.REGISTRY.clear()
+        reopened = func_retrieval.load_corpus('first', self.tmp_dir.name)
+        self.assertEqual([doc.title for doc in reopened.documents.values()], ['resaved'])
+
+
+if __name__ == '__main__':
+    unittest.main()
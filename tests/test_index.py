@@ -0,0 +1,96 @@
+import os
+import datetime
+import tempfile
+import unittest
+
+from modules.index import InvertedIndex
+from modules.document import RedditDocument, ArxivDocument
+from utils.func_retrieval import search_engine, search_engine_page
+
+
+class TestInvertedIndex(unittest.TestCase):
+    def setUp(self):
+        self.date = datetime.datetime.now()
+        self.collection = [
+            RedditDocument(
+                title='test',
+                date=self.date,
+                author='test_author',
+                url="https://test.com/1",
+                text="neural network training with neural layers",
+                source='reddit',
+                num_comments=0,
+            ),
+            ArxivDocument(
+                title='test',
+                date=self.date,
+                authors=['test_author'],
+                url="https://test.com/2",
+                source='arxiv',
+                text="bayesian regression model",
+            ),
+        ]
+        self.index = InvertedIndex(self.collection)
+
+    def test_postings(self):
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.postings['neural'], {0: 2})
+        self.assertEqual(self.index.postings['regression'], {1: 1})
+
+    def test_score_cosine(self):
+        scores = self.index.score_cosine(['neural', 'unknown'])
+        self.assertEqual(list(scores.keys()), [0])
+        self.assertGreater(scores[0], 0)
+
+    def test_score_bm25(self):
+        self.index.update_statistics()
+        self.assertEqual(self.index.avg_lengths['text'], 4.0)
+        scores = self.index.score_bm25(['neural', 'regression'])
+        self.assertEqual(set(scores.keys()), {0, 1})
+        self.assertTrue(all(score > 0 for score in scores.values()))
+
+    def test_score_bm25f(self):
+        scores = self.index.score_bm25f(['test'])
+        self.assertEqual(set(scores.keys()), {0, 1})
+        scores = self.index.score_bm25f(['test'], field_weights={'text': 1.0})
+        self.assertEqual(scores, {})
+
+    def test_search_engine_ranking(self):
+        results = search_engine(self.collection, ['neural'], index=self.index, ranking='bm25')
+        self.assertEqual([result['id'] for result in results], [0])
+        with self.assertRaises(ValueError):
+            search_engine(self.collection, ['neural'], index=self.index, ranking='unknown')
+
+    def test_search_engine_page(self):
+        results, total = search_engine_page(self.collection, ['test'], index=self.index,
+                                            ranking='bm25f', top_k=1)
+        self.assertEqual(total, 2)
+        self.assertEqual(len(results), 1)
+        results, total = search_engine_page(self.collection, ['test'], index=self.index,
+                                            ranking='bm25f', top_k=1, offset=1)
+        self.assertEqual(total, 2)
+        self.assertEqual(len(results), 1)
+        with self.assertRaises(ValueError):
+            search_engine_page(self.collection, ['test'], index=self.index, offset=-1)
+
+    def test_save_load(self):
+        self.index.fit_tfidf(self.collection)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'corpus_test.idx')
+            self.index.save(path, checksum='abc')
+            loaded = InvertedIndex.load(path, checksum='abc')
+            self.assertEqual(loaded.postings, self.index.postings)
+            self.assertEqual(loaded.tfidf_matrix.shape[0], 2)
+            self.assertIsNone(InvertedIndex.load(path, checksum='other'))
+            self.assertIsNone(InvertedIndex.load(os.path.join(tmp_dir, 'missing.idx'), checksum='abc'))
+
+    def test_search_engine(self):
+        results = search_engine(self.collection, ['regression'], index=self.index)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['id'], 1)
+        self.assertEqual(results[0]['source'], 'arxiv')
+        self.assertEqual(search_engine(self.collection, ['unknown']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
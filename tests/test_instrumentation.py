@@ -0,0 +1,58 @@
+import unittest
+
+from modules.metrics import MetricsRegistry
+from utils import instrumentation
+from utils.instrumentation import collect_spans, span, timed
+
+
+@timed('square')
+def square(value):
+    return value * value
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        instrumentation.METRICS.clear()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.METRICS.clear()
+
+    def test_disabled(self):
+        self.assertEqual(square(3), 9)
+        with span('stage'):
+            pass
+        self.assertEqual(instrumentation.METRICS.summary(), {})
+
+    def test_enabled(self):
+        instrumentation.enable(log=False)
+        with collect_spans() as spans:
+            with span('outer'):
+                self.assertEqual(square(3), 9)
+            with self.assertRaises(ValueError), span('failing'):
+                raise ValueError('failed')
+        self.assertEqual([name for name, _ in spans], ['square', 'outer', 'failing'])
+        summary = instrumentation.METRICS.summary()
+        self.assertEqual(summary['square']['count'], 1)
+        self.assertEqual(summary['failing']['count'], 1)
+
+    def test_prometheus(self):
+        metrics = MetricsRegistry(buckets=(0.1, 1.0, float('inf')))
+        for duration in (0.05, 0.5, 5.0):
+            metrics.observe('search', duration)
+        text = metrics.to_prometheus()
+        self.assertIn('stage_duration_seconds_bucket{stage="search",le="1.0"} 2', text)
+        self.assertIn('stage_duration_seconds_bucket{stage="search",le="+Inf"} 3', text)
+        self.assertIn('stage_duration_seconds_count{stage="search"} 3', text)
+
+    def test_counters(self):
+        instrumentation.record_counters({'search_cache_hits_total': 2, 'search_cache_misses_total': 1})
+        instrumentation.record_counters({'search_cache_hits_total': 3})
+        self.assertEqual(instrumentation.METRICS.counters,
+                         {'search_cache_hits_total': 5, 'search_cache_misses_total': 1})
+        text = instrumentation.METRICS.to_prometheus()
+        self.assertIn('# TYPE search_cache_hits_total counter\nsearch_cache_hits_total 5', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import time
+import unittest
+from concurrent.futures import CancelledError
+
+from modules.jobs import JobQueue, DONE, FAILED, CANCELLED
+
+
+def slow_square(value, delay=0.0, report=None):
+    for step in range(10):
+        report('Computing', step / 10)
+        time.sleep(delay / 10)
+    return value * value
+
+
+def failing(report=None):
+    raise ValueError('No data')
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.jobs = JobQueue(max_workers=2)
+        self.jobs.start()
+
+    def tearDown(self):
+        self.jobs.shutdown()
+
+    def wait(self, job_id):
+        while self.jobs.status(job_id)['state'] not in (DONE, FAILED, CANCELLED):
+            time.sleep(0.01)
+        return self.jobs.status(job_id)
+
+    def test_not_started(self):
+        jobs = JobQueue(max_workers=1)
+        with self.assertRaises(RuntimeError):
+            jobs.submit('square', slow_square, 3)
+
+    def test_result(self):
+        job_id = self.jobs.submit('square', slow_square, 3)
+        self.assertEqual(self.jobs.result(job_id, timeout=30), 9)
+        self.assertEqual(self.wait(job_id)['state'], DONE)
+
+        job_id = self.jobs.submit('failing', failing)
+        status = self.wait(job_id)
+        self.assertEqual(status['state'], FAILED)
+        self.assertIn('No data', status['error'])
+
+    def test_shared_job(self):
+        first = self.jobs.submit('square', slow_square, 4, delay=0.5)
+        second = self.jobs.submit('square', slow_square, 4, delay=0.5)
+        self.assertEqual(first, second)
+        # The job still has a waiter
+        self.assertFalse(self.jobs.cancel(first))
+        self.assertEqual(self.jobs.result(second, timeout=30), 16)
+
+    def test_supersede(self):
+        first = self.jobs.submit('slow', slow_square, 5, delay=2.0)
+        second = self.jobs.submit('fast', slow_square, 6, supersedes=first)
+        self.assertEqual(self.jobs.result(second, timeout=30), 36)
+        self.assertEqual(self.wait(first)['state'], CANCELLED)
+        with self.assertRaises(CancelledError):
+            self.jobs.result(first, timeout=30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import pickle
+import datetime
+import tempfile
+import unittest
+
+from modules.corpus import Corpus
+from modules.registry import WARM_INDEX_FACTOR, CorpusRegistry, estimate_size
+from modules.document import RedditDocument
+from utils import func_retrieval
+from utils.func_retrieval import registry_key, search_corpus, search_topics
+
+
+def make_corpus(texts):
+    corpus = Corpus()
+    for i, text in enumerate(texts):
+        corpus.add(RedditDocument(title=f'title {i}', date=datetime.datetime(2023, 1, 1),
+                                  author='test_author', url='https://test.com/', text=text,
+                                  source='reddit', num_comments=0), 'test_author')
+    return corpus
+
+
+class TestCorpusRegistry(unittest.TestCase):
+    def tearDown(self):
+        func_retrieval.REGISTRY.clear()
+
+    def test_eviction(self):
+        registry = CorpusRegistry(memory_budget=2, sizeof=lambda corpus: len(corpus.documents))
+        registry.put('first', make_corpus(['lorem']))
+        registry.put('second', make_corpus(['ipsum']))
+        self.assertIsNotNone(registry.get('first'))
+        registry.put('third', make_corpus(['dolor']))
+        self.assertEqual(registry.topics(), ['first', 'third'])
+        self.assertEqual(registry.stats()['evictions'], 1)
+
+        # A corpus above the budget is kept alone
+        registry.put('large', make_corpus(['lorem', 'ipsum', 'dolor']))
+        self.assertEqual(registry.topics(), ['large'])
+        self.assertEqual(estimate_size(make_corpus(['lorem'])), 41 * len('title 0lorem' + 'https://test.com/'))
+
+    def test_estimate_size_index(self):
+        corpus = make_corpus(['lorem'])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            corpus.index_path = os.path.join(tmp_dir, 'corpus_test.idx')
+            with open(corpus.index_path, 'wb') as file:
+                file.write(b'0' * 100)
+            self.assertEqual(estimate_size(corpus),
+                             len('title 0lorem' + 'https://test.com/') + WARM_INDEX_FACTOR * 100)
+
+    def test_search_topics(self):
+        func_retrieval.REGISTRY.put(registry_key('first'), make_corpus(['lorem ipsum', 'lorem lorem', 'dolor']))
+        func_retrieval.REGISTRY.put(registry_key('second'), make_corpus(['sit amet', 'lorem amet']))
+
+        page, total_hits = search_topics(['first', 'second', 'missing'], ['lorem'], top_k=2)
+        self.assertEqual(total_hits, 3)
+        self.assertEqual(len(page), 2)
+        self.assertTrue(page[0]['score'] >= page[1]['score'])
+        self.assertTrue(all(result['id'] in (1, 2) for result in page))
+
+        all_results, _ = search_topics(['first', 'second'], ['lorem'], concurrent=False)
+        self.assertEqual({result['topic'] for result in all_results}, {'first', 'second'})
+        self.assertEqual(page, all_results[:2])
+
+
+class TestSearchCache(unittest.TestCase):
+    def setUp(self):
+        func_retrieval.SEARCH_CACHE.clear()
+
+    def tearDown(self):
+        func_retrieval.SEARCH_CACHE.clear()
+
+    def test_cache(self):
+        corpus = make_corpus(['lorem ipsum', 'dolor'])
+        page, total_hits = search_corpus(corpus, ['lorem'], ranking='bm25', k1=1.2)
+        page[0]['score'] = 0
+        self.assertEqual(search_corpus(corpus, ['lorem'], ranking='bm25', k1=1.2)[1], total_hits)
+        self.assertTrue(search_corpus(corpus, ['lorem'], ranking='bm25', k1=1.2)[0][0]['score'] > 0)
+        search_corpus(corpus, ['lorem'], ranking='bm25', k1=2.0)
+        self.assertEqual(func_retrieval.SEARCH_CACHE.stats()['hits'], 2)
+        self.assertEqual(func_retrieval.SEARCH_CACHE.stats()['misses'], 2)
+
+        # Adding documents invalidates the cached pages of the corpus
+        corpus.add(make_corpus(['lorem']).get_document(1), 'test_author')
+        self.assertEqual(search_corpus(corpus, ['lorem'], ranking='bm25', k1=1.2)[1], 2)
+        self.assertEqual(search_corpus(make_corpus(['lorem ipsum', 'dolor']), ['lorem'])[1], 1)
+        self.assertEqual(func_retrieval.SEARCH_CACHE.stats()['misses'], 4)
+
+    def test_cache_key(self):
+        corpus = make_corpus(['lorem ipsum', 'dolor'])
+        search_corpus(corpus, ['lorem', 'ipsum'])
+        search_corpus(corpus, ['ipsum', 'lorem', 'ipsum'])
+        self.assertEqual(func_retrieval.SEARCH_CACHE.stats()['hits'], 1)
+
+        # Unpickled copies are distinct corpora, which may then diverge
+        copy = pickle.loads(pickle.dumps(corpus))
+        self.assertNotEqual(copy.uid, corpus.uid)
+        copy.add(make_corpus(['lorem']).get_document(1), 'test_author')
+        corpus.add(make_corpus(['dolor']).get_document(1), 'test_author')
+        self.assertEqual(search_corpus(copy, ['lorem', 'ipsum'])[1], 2)
+        self.assertEqual(search_corpus(corpus, ['lorem', 'ipsum'])[1], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import pickle
+import datetime
+import tempfile
+import unittest
+
+from modules.corpus import Corpus
+from modules.snapshot import CorpusSnapshot, write_snapshot, convert_pickle
+from modules.document import RedditDocument, ArxivDocument
+
+
+class TestCorpusSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.documents = {
+            1: RedditDocument(
+                title='tést',
+                date=datetime.datetime(2023, 12, 1, 10, 30),
+                author='test_author',
+                url="https://test.com/",
+                text="lorem ipsum ☃",
+                source='reddit',
+                num_comments=2,
+            ),
+            2: ArxivDocument(
+                title='paper',
+                date=datetime.date(2022, 5, 4),
+                authors=['first', 'second'],
+                url="https://arxiv.org/",
+                source='arxiv',
+                text="abstract",
+            ),
+        }
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'corpus_test.snap')
+        write_snapshot(self.documents, self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_documents(self):
+        with CorpusSnapshot(self.path) as snapshot:
+            self.assertEqual(list(snapshot), [1, 2])
+            self.assertEqual(snapshot[1].text, 'lorem ipsum ☃')
+            self.assertEqual(str(snapshot[1]), str(self.documents[1]))
+            self.assertEqual(repr(snapshot[2]), repr(self.documents[2]))
+            self.assertEqual(snapshot[2].date, datetime.date(2022, 5, 4))
+            self.assertNotIn(3, snapshot)
+
+    def test_invalid_file(self):
+        with open(self.path, 'r+b') as file:
+            file.write(b'NOPE')
+        with self.assertRaises(ValueError):
+            CorpusSnapshot(self.path)
+
+    def test_corpus(self):
+        corpus = Corpus.from_snapshot(self.path)
+        self.assertEqual(list(corpus.documents), [1, 2])
+        self.assertEqual(corpus.get_document(2).author, 'first, second')
+        self.assertEqual(sorted(author.nDoc for author in corpus.authors.values()), [1, 1])
+
+        corpus.add(self.documents[1], 'test_author')
+        self.assertEqual(len(corpus.documents), 3)
+        self.assertEqual(corpus.get_stats()['count'][0], 2)
+
+        documents = pickle.loads(pickle.dumps(corpus.documents))
+        self.assertEqual(documents[3].title, 'tést')
+
+    def test_convert_pickle(self):
+        pkl_path = os.path.join(self.tmp_dir.name, 'corpus_test.pkl')
+        corpus = Corpus.from_snapshot(self.path)
+        corpus.documents = dict(corpus.documents)
+        with open(pkl_path, 'wb') as file:
+            pickle.dump(corpus, file)
+        self.assertEqual(convert_pickle(pkl_path), self.path)
+        with CorpusSnapshot(self.path) as snapshot:
+            self.assertEqual(snapshot[1].title, 'tést')
+
+
+if __name__ == '__main__':
+    unittest.main()
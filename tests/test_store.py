@@ -0,0 +1,67 @@
+import pickle
+import datetime
+import unittest
+
+from modules.store import ColumnarStore, DocumentView
+from modules.document import RedditDocument, ArxivDocument
+
+
+class TestColumnarStore(unittest.TestCase):
+    def setUp(self):
+        self.reddit_doc = RedditDocument(
+            title='test',
+            date=datetime.datetime(2023, 12, 1, 10, 30),
+            author='test_author',
+            url="https://test.com/",
+            text="lorem ipsum",
+            source='reddit',
+            num_comments=2,
+        )
+        self.arxiv_doc = ArxivDocument(
+            title='paper',
+            date=datetime.date(2022, 5, 4),
+            authors=['first', 'second'],
+            url="https://arxiv.org/",
+            source='arxiv',
+            text="abstract",
+        )
+        self.store = ColumnarStore.from_documents({1: self.reddit_doc, 2: self.arxiv_doc})
+
+    def test_views(self):
+        view = self.store[1]
+        self.assertIsInstance(view, DocumentView)
+        self.assertEqual(str(view), str(self.reddit_doc))
+        self.assertEqual(repr(self.store[2]), repr(self.arxiv_doc))
+        self.assertEqual(self.store[2].date, datetime.date(2022, 5, 4))
+        self.assertIsNone(self.store[2].num_comments)
+        self.assertEqual(list(self.store.keys()), [1, 2])
+        with self.assertRaises(KeyError):
+            self.store[1] = self.reddit_doc
+
+    def test_to_dataframe(self):
+        df = self.store.to_dataframe()
+        self.assertListEqual(list(df.columns), ['id', 'title', 'text', 'author', 'date', 'source', 'url'])
+        self.assertEqual(df['text'].tolist(), ['lorem ipsum', 'abstract'])
+        self.assertEqual(df['source'].astype(str).tolist(), ['reddit', 'arxiv'])
+        self.assertEqual(df['date'].iloc[0], datetime.datetime(2023, 12, 1, 10, 30))
+
+    def test_interleaved_reads(self):
+        store = ColumnarStore()
+        for doc_id in range(1, 51):
+            store[doc_id] = self.reddit_doc if doc_id % 2 else self.arxiv_doc
+            self.assertEqual(store[doc_id].text, 'lorem ipsum' if doc_id % 2 else 'abstract')
+        self.assertEqual([store[doc_id].title for doc_id in (1, 2, 49, 50)],
+                         ['test', 'paper', 'test', 'paper'])
+        self.assertEqual(store.buffer, ''.join(
+            f'{doc.title}{doc.text}{doc.url}' for doc in store.values()))
+
+    def test_pickle(self):
+        store = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(store[2].author, 'first, second')
+        store[3] = self.reddit_doc
+        self.assertEqual(store[3].source, 'reddit')
+        self.assertEqual(store.sources, ['reddit', 'arxiv'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import datetime
+import unittest
+
+from modules.term_time_index import TermTimeIndex
+from modules.document import RedditDocument
+
+
+class TestTermTimeIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TermTimeIndex()
+        for date, text in [
+            (datetime.datetime(2022, 1, 3), 'Lorem ipsum lorem'),
+            (datetime.datetime(2022, 2, 1), 'ipsum'),
+            (datetime.datetime(2023, 2, 1), 'lorem'),
+            (None, 'lorem'),
+        ]:
+            self.index.add(RedditDocument(title='title', date=date, author='test_author',
+                                          url='https://test.com/', text=text, source='reddit',
+                                          num_comments=0))
+
+    def test_series(self):
+        trends = self.index.series(['Lorem', 'ipsum', 'missing', 'lorem'])
+        self.assertEqual(list(trends.columns), ['lorem', 'ipsum', 'missing'])
+        self.assertEqual(list(trends.index), ['2022', '2023'])
+        self.assertEqual(trends['lorem'].tolist(), [2, 1])
+        self.assertEqual(trends['missing'].tolist(), [0, 0])
+
+    def test_granularities(self):
+        self.assertEqual(self.index.buckets('month'), ['2022-01', '2022-02', '2023-02'])
+        self.assertEqual(self.index.buckets('week'), ['2022-W01', '2022-W05', '2023-W05'])
+        trends = self.index.series(['title'], 'month', normalize=True)
+        self.assertEqual(trends['title'].tolist(), [1.0, 1.0, 1.0])
+        with self.assertRaises(ValueError):
+            self.index.series(['lorem'], 'day')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+from utils.tools import TOKENIZER, Tokenizer, atomic_open, clean_paragraph
+
+
+class TestTokenizer(unittest.TestCase):
+    def setUp(self):
+        self.text = "The neural networks, it's the state-of-the-art!"
+
+    def test_tokenize(self):
+        tokens = TOKENIZER.tokenize(self.text)
+        self.assertEqual(tokens, ['the', 'neural', 'networks', 'state', 'art'])
+        self.assertEqual(clean_paragraph(self.text), tokens)
+
+    def test_tokenize_many(self):
+        tokenizer = Tokenizer()
+        tokens = tokenizer.tokenize_many([self.text, '', 'bayesian model'])
+        self.assertEqual(len(tokens), 3)
+        self.assertEqual(tokens[1], [])
+        self.assertEqual(tokens[2], ['bayesian', 'model'])
+        self.assertIsInstance(tokenizer.stopwords, frozenset)
+
+
+class TestAtomicOpen(unittest.TestCase):
+    def test_replace(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'artifact.pkl')
+            with atomic_open(path) as file:
+                file.write(b'first')
+            with self.assertRaises(ValueError), atomic_open(path) as file:
+                file.write(b'partial')
+                raise ValueError('failed')
+            # A failed write leaves the previous file and no temporary file
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read(), b'first')
+            self.assertEqual(os.listdir(directory), ['artifact.pkl'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import pandas as pd
+from typing import Callable
+from utils.tools import clean_paragraph
+from utils.instrumentation import collect_spans, span
+from utils.func_processing import (
+    cached_similarity_neighbors,
+    process_similarity_pairs,
+)
+from utils.func_retrieval import (
+    SEARCH_CACHE,
+    search_documents,
+    search_corpus,
+)
+
+
+def search_pipeline(subreddit_kw:str,
+                    arxiv_kw:str,
+                    keyword_text:str,
+                    ranking:str='cosine',
+                    top_k:int=15,
+                    cache_dir:str=None,
+                    report:Callable=None) -> dict:
+    """
+    Search a topic and gather the results page shown by the app: the ranked
+    documents with their similar documents and the trends of the keywords.
+
+    It only returns plain data so it can run in a worker process, see `modules.jobs`.
+
+    Args:
+        subreddit_kw (str): The subreddit of the topic, also used as its corpus name.
+        arxiv_kw (str): The arXiv subject of the topic.
+        keyword_text (str): The keywords typed by the user.
+        ranking (str, optional): The scoring function of `search_engine`. Defaults to 'cosine'.
+        top_k (int, optional): The number of results. Defaults to 15.
+        cache_dir (str, optional): The directory of the similarity cache.
+        report (callable, optional): Called with a stage name and a completed fraction
+            as the pipeline progresses.
+
+    Returns:
+        dict: The results with the following keys:
+            - total_hits (int): The number of matching documents.
+            - results (list): The ranked documents, each with the 'document' record
+                of `Corpus.to_dataframe` and its 'similar' documents, having a
+                'source', 'title', 'url' and 'similarity'.
+            - trends (pd.DataFrame): The counts of the keywords per year, see
+                `Corpus.get_word_trends`.
+            - spans (list): The stages recorded by `utils.instrumentation` when it
+                is enabled, with their durations.
+            - counters (dict): The hits and misses of the `SEARCH_CACHE` of the
+                process during the search, see `record_counters`.
+    """
+    report = report or (lambda stage, fraction=None: None)
+
+    # The spans and cache counts of a worker process are sent back with the results
+    hits, misses = SEARCH_CACHE.hits, SEARCH_CACHE.misses
+    with collect_spans() as spans, span('search_pipeline'):
+        data = _search_pipeline(subreddit_kw, arxiv_kw, keyword_text, ranking, top_k, cache_dir, report)
+    data['spans'] = spans
+    data['counters'] = {'search_cache_hits_total': SEARCH_CACHE.hits - hits,
+                        'search_cache_misses_total': SEARCH_CACHE.misses - misses}
+    return data
+
+
+def _search_pipeline(subreddit_kw, arxiv_kw, keyword_text, ranking, top_k, cache_dir, report) -> dict:
+    """
+    Run the stages of `search_pipeline`.
+    """
+    report('Loading corpus', 0.1)
+    search_request = [
+        {'type': 'reddit', 'keyword': subreddit_kw, 'topic': subreddit_kw, 'quantity': 100},
+        {'type': 'arxiv', 'keyword': arxiv_kw, 'topic': subreddit_kw, 'quantity': 100}
+    ]
+    corpus = search_documents(search_request)
+    tokens_kw = clean_paragraph(keyword_text)
+
+    report('Ranking documents', 0.3)
+    response_search_engine, total_hits = search_corpus(
+        corpus, tokens_kw, ranking=ranking or 'cosine', top_k=top_k)
+    df_scores = pd.DataFrame(response_search_engine)
+    if len(df_scores) == 0:
+        return {'total_hits': 0, 'results': [], 'trends': None}
+
+    report('Finding similar documents', 0.5)
+    df_corpus = corpus.to_dataframe()
+    # Results hold collection positions, map them back to the corpus ids
+    doc_ids = list(corpus.documents.keys())
+    df_scores['id'] = [str(doc_ids[i]) for i in df_scores['id']]
+    df_corpus['id'] = df_corpus['id'].astype(str)
+    df_corpus['unique_id'] = df_corpus['source'].astype(str) + '_' + df_corpus['id'].astype(str)
+
+    # Keep the ranking order of the results page
+    df_corpus_filtered = df_corpus.set_index('id').loc[df_scores['id']].reset_index()
+    # The TF-IDF model saved with the index is reused, rows follow the corpus order
+    similarity_df = cached_similarity_neighbors(df_corpus, k=3,
+                                                content_hash=corpus.content_hash(),
+                                                cache_dir=cache_dir,
+                                                tfidf_matrix=corpus.get_index().tfidf_matrix)
+    similarity_pairs = process_similarity_pairs(df_corpus, similarity_df,
+                                                ids=df_corpus_filtered['unique_id'])
+
+    results = []
+    for document in df_corpus_filtered.to_dict('records'):
+        similar = []
+        for similar_document in similarity_pairs.get(document['source'], {}).get(str(document['id']), []):
+            similar_doc = corpus.get_document(similar_document['similar_id'])
+            similar.append({
+                'source': similar_doc.source,
+                'title': similar_doc.title,
+                'url': similar_doc.url,
+                'similarity': float(similar_document['similarity']),
+            })
+        results.append({'document': document, 'similar': similar})
+
+    report('Computing trends', 0.9)
+    return {
+        'total_hits': total_hits,
+        'results': results,
+        'trends': corpus.get_word_trends(tokens_kw),
+    }
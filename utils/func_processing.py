@@ -1,9 +1,24 @@
+import os
+import pickle
 import logging
+import numpy as np
 import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
+from modules.ann import ClusterIndex
+from modules.cache import LRUCache
+from utils.tools import atomic_open, hash_documents
+from utils.instrumentation import timed
 
+# Neighbor tables of the most recently used corpora, see `cached_similarity_neighbors`
+SIMILARITY_CACHE = LRUCache(maxsize=16)
+# Number of articles from which the neighbors are approximated, see `cached_similarity_neighbors`
+ANN_MIN_DOCUMENTS = 20000
+# Number of similarities computed at once by `calculate_similarity_neighbors`, 32 MB of floats
+SIMILARITY_BLOCK_ELEMENTS = 2 ** 22
 
+
+@timed('calculate_similarity_articles')
 def calculate_similarity_articles(df):
     """
     Calculate the cosine similarity between articles in a DataFrame using sklearn library.
@@ -15,7 +30,7 @@ def calculate_similarity_articles(df):
         pd.DataFrame: DataFrame containing the cosine similarity scores between articles.
     """
     try:
-        df['unique_id'] = df['source'] + '_' + df['id'].astype(str)
+        df['unique_id'] = df['source'].astype(str) + '_' + df['id'].astype(str)
         df['text_corpus'] = df['title'] + ' ' + df['text'] 
         # Create and apply TF-IDF vectorizer to texts
         vectorizer = TfidfVectorizer(stop_words='english')
@@ -35,15 +50,176 @@ def calculate_similarity_articles(df):
         raise ValueError
 
 
+@timed('calculate_similarity_neighbors')
+def calculate_similarity_neighbors(df, k=3, block_size=None, method='exact', n_probe=None, tfidf_matrix=None):
+    """
+    Calculate the `k` most similar articles of every article in a DataFrame, without
+    materializing the N x N similarity matrix.
+
+    The TF-IDF rows are L2 normalized, so their cosine similarity is their dot product.
+    It is computed for `block_size` rows at a time with a sparse matrix product, and
+    only the best `k` neighbors of each row are kept with a partial selection. The
+    dense block of similarities holds about `SIMILARITY_BLOCK_ELEMENTS` values
+    whatever the number of articles.
+
+    With the 'ann' method, each article is only compared with the articles of the
+    `n_probe` closest clusters of a `modules.ann.ClusterIndex`, and some of its
+    neighbors may be missed.
+
+    The TF-IDF model of a corpus is saved with its index, see `Corpus.get_index`,
+    and its matrix can be given instead of being fitted again on the articles.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing articles with 'source', 'id', 'title', and 'text' columns.
+        k (int): The number of neighbors to keep per article.
+        block_size (int, optional): The number of articles compared with the corpus at
+            once. Defaults to `SIMILARITY_BLOCK_ELEMENTS` divided by the number of articles.
+        method (str): The search of the neighbors, 'exact' or 'ann'.
+        n_probe (int, optional): The number of clusters searched by the 'ann' method.
+        tfidf_matrix (optional): The TF-IDF rows of the articles, in the order of the
+            DataFrame, such as the `tfidf_matrix` of `Corpus.get_index()`.
+
+    Returns:
+        pd.DataFrame: DataFrame with one row per neighbor and the 'unique_id', 'similar_id',
+            'similarity' and 'rank' columns, sorted by article and decreasing similarity.
+            Articles themselves and neighbors with a null similarity are left out.
+
+    Raises:
+        ValueError: If the method is not supported or the TF-IDF matrix does not
+            have one row per article.
+    """
+    if method not in ('exact', 'ann'):
+        raise ValueError(f'Unsupported method: {method}')
+    if tfidf_matrix is not None and tfidf_matrix.shape[0] != len(df):
+        logging.error(f'The TF-IDF matrix has {tfidf_matrix.shape[0]} rows for {len(df)} articles')
+        raise ValueError('The TF-IDF matrix must have one row per article')
+    try:
+        df['unique_id'] = df['source'].astype(str) + '_' + df['id'].astype(str)
+        if tfidf_matrix is None:
+            df['text_corpus'] = df['title'] + ' ' + df['text']
+            vectorizer = TfidfVectorizer(stop_words='english')
+            tfidf_matrix = vectorizer.fit_transform(df['text_corpus'])
+    except TypeError as e:
+        logging.error(e)
+        raise TypeError
+    except ValueError as e:
+        logging.error(e)
+        raise ValueError
+
+    unique_ids = df['unique_id'].to_numpy()
+    n_docs = tfidf_matrix.shape[0]
+    k = min(k, n_docs - 1)
+    block_size = block_size or max(1, SIMILARITY_BLOCK_ELEMENTS // max(1, n_docs))
+    rows, neighbors, similarities = [], [], []
+
+    if method == 'ann' and k > 0:
+        index = ClusterIndex(**({} if n_probe is None else {'n_probe': n_probe})).fit(tfidf_matrix)
+        top, top_scores = index.kneighbors(k)
+        keep = top >= 0
+        rows.append(np.repeat(np.arange(n_docs), k).reshape(-1, k)[keep])
+        neighbors.append(top[keep])
+        similarities.append(top_scores[keep])
+
+    for start in range(0, n_docs if k > 0 and method == 'exact' else 0, block_size):
+        block = (tfidf_matrix[start:start + block_size] @ tfidf_matrix.T).toarray()
+        block_rows = np.arange(block.shape[0])
+        block[block_rows, block_rows + start] = 0  # not its own neighbor
+
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        keep = top_scores > 0
+        rows.append(np.repeat(block_rows + start, k).reshape(-1, k)[keep])
+        neighbors.append(top[keep])
+        similarities.append(top_scores[keep])
 
+    if not rows:
+        return pd.DataFrame({'unique_id': [], 'similar_id': [], 'similarity': [], 'rank': []})
 
-def process_similarity_pairs(df_corpus, similarity_df):
+    rows = np.concatenate(rows)
+    neighbors = np.concatenate(neighbors)
+    neighbors_df = pd.DataFrame({
+        'unique_id': unique_ids[rows],
+        'similar_id': unique_ids[neighbors],
+        'similarity': np.concatenate(similarities),
+    })
+    neighbors_df['rank'] = neighbors_df.groupby('unique_id', sort=False).cumcount() + 1
+    return neighbors_df
+
+
+@timed('cached_similarity_neighbors')
+def cached_similarity_neighbors(df, k=3, content_hash=None, cache_dir=None, method=None, tfidf_matrix=None):
+    """
+    Get the neighbors of `calculate_similarity_neighbors` from a cache keyed by the
+    content hash of the corpus, so they are computed once per corpus version.
+
+    The neighbor tables are kept in the in-memory `SIMILARITY_CACHE` and, when
+    `cache_dir` is given, in `similarity_<hash>_<k>.pkl` files of that directory,
+    `similarity_<hash>_<k>_ann.pkl` for approximated neighbors.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing articles with 'source', 'id', 'title', and 'text' columns.
+        k (int): The number of neighbors to keep per article.
+        content_hash (str, optional): The content hash of the corpus, such as
+            `Corpus.content_hash()`. Defaults to the hash of the DataFrame articles.
+        cache_dir (str, optional): The directory of the on-disk cache.
+        method (str, optional): The method of `calculate_similarity_neighbors`. Defaults
+            to 'ann' from `ANN_MIN_DOCUMENTS` articles and to 'exact' below.
+        tfidf_matrix (optional): The TF-IDF rows of the articles given to
+            `calculate_similarity_neighbors` on a cache miss.
+
+    Returns:
+        pd.DataFrame: The neighbors table of `calculate_similarity_neighbors`.
+    """
+    if content_hash is None:
+        content_hash = hash_documents(df[['id', 'source', 'title', 'text']].itertuples(index=False))
+    if method is None:
+        method = 'ann' if len(df) >= ANN_MIN_DOCUMENTS else 'exact'
+    key = (content_hash, k, method)
+
+    neighbors_df = SIMILARITY_CACHE.get(key)
+    if neighbors_df is not None:
+        return neighbors_df
+
+    cache_path = None
+    if cache_dir is not None:
+        suffix = '_ann' if method == 'ann' else ''
+        cache_path = os.path.join(cache_dir, f'similarity_{content_hash}_{k}{suffix}.pkl')
+        if os.path.exists(cache_path):
+            try:
+                neighbors_df = pd.read_pickle(cache_path)
+            except (pickle.UnpicklingError, EOFError, ValueError) as e:
+                logging.warning(f'Ignoring unreadable similarity cache {cache_path}: {e}')
+
+    if neighbors_df is None:
+        neighbors_df = calculate_similarity_neighbors(df, k=k, method=method, tfidf_matrix=tfidf_matrix)
+        if cache_path is not None:
+            # Other processes may read or write the same cache file meanwhile
+            with atomic_open(cache_path) as file:
+                neighbors_df.to_pickle(file)
+
+    SIMILARITY_CACHE.put(key, neighbors_df)
+    return neighbors_df
+
+
+@timed('process_similarity_pairs')
+def process_similarity_pairs(df_corpus, similarity_df, ids=None, top_n=3):
     """
     Process similarity pairs based on the given dataframe corpus and similarity dataframe.
 
+    The most similar articles of each article are selected on the similarity matrix
+    with a partial sort per row, the article itself and null similarities masked out.
+
     Args:
         df_corpus (pandas.DataFrame): The dataframe corpus containing unique IDs.
-        similarity_df (pandas.DataFrame): The similarity dataframe.
+        similarity_df (pandas.DataFrame): The similarity dataframe, either the matrix of
+            `calculate_similarity_articles` or the neighbors of `calculate_similarity_neighbors`.
+        ids (list, optional): The unique IDs to process, such as the displayed articles.
+            Defaults to every article of the corpus.
+        top_n (int, optional): The number of similar articles per article. Defaults to 3.
 
     Returns:
         dict: A dictionary containing similarity pairs categorized by source and ID.
@@ -72,25 +248,49 @@ def process_similarity_pairs(df_corpus, similarity_df):
                     ...
                 }
             }
+            The similar articles are sorted by decreasing similarity.
     """
     similarity_pairs = {'reddit': {}, 'arxiv': {}}
-    
-    for idx in df_corpus['unique_id'].tolist():
-        similarity_pairs[idx.split('_')[0]][idx.split('_')[1]] = []
-        selected_rows = similarity_df.loc[df_corpus['unique_id'], idx]
-        selected_df = selected_rows.reset_index()
-        selected_df_sorted = selected_df.sort_values(by=idx, ascending=False)
-        selected_df_sorted = selected_df_sorted.drop(selected_df_sorted[selected_df_sorted['unique_id'] == idx].index)
-        selected_df_sorted = selected_df_sorted.drop(selected_df_sorted[selected_df_sorted[idx] <= float(0.0)].index)
-        
-        if len(selected_df_sorted) > 0:
-            selected_df_filtered = selected_df_sorted.tail(3)
-            
-            for i in selected_df_filtered['unique_id'].tolist():
-                similarity_pairs[idx.split('_')[0]][idx.split('_')[1]].append({
-                    'similar_source': i.split('_')[0],
-                    'similar_id': i.split('_')[1],
-                    'similarity': selected_df_filtered[selected_df_filtered['unique_id'] == i][idx].values[0]
-                })
-    
-    return similarity_pairs
\ No newline at end of file
+    corpus_ids = df_corpus['unique_id'].tolist()
+    row_ids = corpus_ids if ids is None else list(ids)
+    if len(row_ids) == 0:
+        return similarity_pairs
+
+    if 'similar_id' in similarity_df.columns:
+        neighbors = similarity_df[similarity_df['unique_id'].isin(row_ids)
+                                  & similarity_df['similar_id'].isin(corpus_ids)
+                                  & (similarity_df['similarity'] > 0)]
+        neighbors = neighbors.sort_values('similarity', ascending=False, kind='stable')
+        grouped = neighbors.groupby('unique_id', sort=False)
+        similar = {
+            idx: list(zip(group['similar_id'].head(top_n), group['similarity'].head(top_n)))
+            for idx, group in grouped
+        }
+    else:
+        matrix = similarity_df.loc[row_ids, corpus_ids].to_numpy(dtype=float, copy=True)
+        column_of = {idx: i for i, idx in enumerate(corpus_ids)}
+        matrix[np.arange(len(row_ids)), [column_of[idx] for idx in row_ids]] = 0  # not its own neighbor
+
+        k = min(top_n, len(corpus_ids))
+        top = np.argpartition(-matrix, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(matrix, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        similar = {
+            idx: [(corpus_ids[j], score) for j, score in zip(top[i], top_scores[i]) if score > 0]
+            for i, idx in enumerate(row_ids)
+        }
+
+    for idx in row_ids:
+        source, doc_id = idx.split('_')[0], idx.split('_')[1]
+        similarity_pairs.setdefault(source, {})[doc_id] = [
+            {
+                'similar_source': similar_idx.split('_')[0],
+                'similar_id': similar_idx.split('_')[1],
+                'similarity': similarity,
+            }
+            for similar_idx, similarity in similar.get(idx, [])
+        ]
+
+    return similarity_pairs
@@ -1,19 +1,162 @@
 import os
+import time
+import heapq
 import logging
-import numpy as np
 import pickle
-from scipy.sparse import csr_matrix
-from sklearn.metrics.pairwise import cosine_similarity
-from utils.tools import clean_paragraph
+from itertools import islice
+from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
+from modules.cache import LRUCache
 from modules.corpus import Corpus
+from modules.registry import CorpusRegistry
+from modules.index import InvertedIndex
 from modules.factory import DocumentFactory
 from modules.document import Document
+from utils.instrumentation import span, timed
 
+# Directory of the saved corpora and of their search indexes
+DATA_DIR = 'data'
+# Loaded corpora, one per topic and data directory, see `load_corpus` and `registry_key`
+REGISTRY = CorpusRegistry(memory_budget=512 * 2**20)
+# Result pages of the latest queries, see `search_corpus`
+SEARCH_CACHE = LRUCache(maxsize=256)
+# Similarity above which fetched documents are skipped as near-duplicates
+DEDUP_THRESHOLD = 0.8
 
 
-def search_documents(processes:list[dict]) -> Document:
+def fetch_source(process:dict) -> dict:
+    """
+    Fetch the documents of a single process through the `DocumentFactory`.
+
+    Args:
+        process (dict): The process details, as described in `search_documents`.
+
+    Returns:
+        dict: The fetch report of the process with the following keys:
+            - type (str): The type of the process.
+            - keyword (str): The keyword searched.
+            - documents (list): The retrieved documents, empty on failure.
+            - elapsed (float): The time spent fetching, in seconds.
+            - error (str): The error message, or None if the fetch succeeded.
+    """
+    process_type = process.get("type")
+    report = {'type': process_type, 'keyword': process.get("keyword"), 'documents': [], 'error': None}
+    start = time.perf_counter()
+    try:
+        args = {
+            "type_process": process_type,
+            "keyword": process.get("keyword"),
+            "max_results": process.get("quantity", 10)
+        }
+        retrieved_documents = DocumentFactory(data=args).create_document()
+        document_collection = retrieved_documents.set_documents()
+
+        # Check if data is not empty
+        if document_collection is None or len(document_collection) == 0:
+            raise TypeError(f'No data provided by the API {process_type}')
+        report['documents'] = list(document_collection)
+    except Exception as e:
+        # A failing source must not abort the other ones, see `fetch_sources`
+        logging.error(f'{process_type} fetch failed: {e}')
+        report['error'] = f'{type(e).__name__}: {e}'
+    report['elapsed'] = time.perf_counter() - start
+    return report
+
+
+@timed('fetch_sources')
+def fetch_sources(processes:list[dict], concurrent:bool=True, max_workers:int=None) -> list[dict]:
+    """
+    Fetch the documents of every process, in parallel threads when `concurrent` is set.
+
+    Args:
+        processes (list): The process details, as described in `search_documents`.
+        concurrent (bool, optional): Run the processes in a thread pool. Defaults to True.
+        max_workers (int, optional): The size of the thread pool. Defaults to one
+            thread per process.
+
+    Returns:
+        list: The fetch reports of `fetch_source`, in the order of the processes.
+    """
+    if not concurrent or len(processes) < 2:
+        return [fetch_source(process) for process in processes]
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(processes)) as executor:
+        return list(executor.map(fetch_source, processes))
+
+
+def registry_key(topic:str, data_dir:str=None) -> tuple:
+    """
+    Get the key of the corpus of a topic in the `REGISTRY`.
+
+    Args:
+        topic (str): The topic of the corpus.
+        data_dir (str, optional): The directory of the corpus files. Defaults to `DATA_DIR`.
+
+    Returns:
+        tuple: The absolute path of the directory and the topic, so corpora of the
+            same topic saved in different directories are kept apart.
+    """
+    return os.path.abspath(DATA_DIR if data_dir is None else data_dir), topic
+
+
+def load_corpus(topic:str, data_dir:str=None) -> Corpus | None:
+    """
+    Load the saved corpus of a topic, keeping it in the `REGISTRY` for the next calls.
+
+    The corpus is opened from its `corpus_<topic>.snap` snapshot, see `modules.snapshot`,
+    or loaded from its `corpus_<topic>.pkl` pickle, which is then converted to a snapshot.
+    A pickle saved after the snapshot is converted again, the snapshot being stale.
+    Its search index is persisted next to it, see `Corpus.get_index`.
+
+    Args:
+        topic (str): The topic of the corpus.
+        data_dir (str, optional): The directory of the corpus files. Defaults to `DATA_DIR`.
+
+    Returns:
+        Corpus | None: The corpus, or None if the topic has no saved corpus.
+    """
+    data_dir = DATA_DIR if data_dir is None else data_dir
+    pkl_file_path = os.path.join(data_dir, f'corpus_{topic}.pkl')
+    snapshot_file_path = os.path.join(data_dir, f'corpus_{topic}.snap')
+
+    corpus = REGISTRY.get(registry_key(topic, data_dir))
+    if corpus is not None:
+        return corpus
+
+    stale_snapshot = (os.path.exists(snapshot_file_path) and os.path.exists(pkl_file_path)
+                      and os.path.getmtime(pkl_file_path) > os.path.getmtime(snapshot_file_path))
+    if os.path.exists(snapshot_file_path) and not stale_snapshot:
+        with span('load_corpus', format='snapshot', topic=topic):
+            corpus = Corpus.from_snapshot(snapshot_file_path)
+    elif os.path.exists(pkl_file_path):
+        with span('load_corpus', format='pickle', topic=topic):
+            with open(pkl_file_path, 'rb') as file:
+                corpus = pickle.load(file)
+        # Convert the pickle once, the snapshot is opened on the next loads
+        corpus.save_snapshot(snapshot_file_path)
+    else:
+        return None
+
+    corpus.index_path = os.path.join(data_dir, f'corpus_{topic}.idx')
+    REGISTRY.put(registry_key(topic, data_dir), corpus)
+    return corpus
+
+
+@timed('search_documents')
+def search_documents(processes:list[dict],
+                     concurrent:bool=True,
+                     max_workers:int=None,
+                     dedup_threshold:float=DEDUP_THRESHOLD) -> Document:
     """
     Search documents based on the given processes.
+
+    Sources are fetched in parallel unless `concurrent` is False. Their documents are
+    added to the corpus in the order of the processes whatever the order in which
+    the sources answer. A failing source is reported in `corpus.ingestion_report`
+    without discarding the documents of the other sources, the corpus is then marked
+    `incomplete` and is neither saved nor registered, so that the next search fetches
+    every source again. Near-duplicates, such as
+    crossposts, are skipped and listed in `corpus.dedup_report`.
     
     Args:
         processes (list): A list of dictionaries containing the process details.
@@ -27,50 +170,62 @@ def search_documents(processes:list[dict]) -> Document:
                 {'type':'reddit', 'keyword':'MachineLearning'},
                 {'type':'arxiv', 'keyword':'machine learning'}
             ]
+        concurrent (bool, optional): Fetch the sources in parallel. Defaults to True.
+        max_workers (int, optional): The number of fetching threads.
+        dedup_threshold (float, optional): The similarity of the near-duplicates, see
+            `Corpus.enable_deduplication`. Defaults to `DEDUP_THRESHOLD`, None keeps them.
 
     Returns:
         api_results (Document): The retrieved documents.
 
     Raises:
         ValueError: If no data is provided or if the credentials are incorrect.
-        TypeError: If there is a type error.
+        TypeError: If there is a type error or if every source failed.
     """
     
-    # pkl_file_name = f'corpus{datetime.datetime.now().strftime("%d%m%y")}{processes[0].get("topic")}.pkl'
-    pkl_file_name = f'corpus_{processes[0].get("topic")}.pkl'
-    pkl_file_path = 'data/' + pkl_file_name
+    topic = processes[0].get("topic")
+    snapshot_file_path = os.path.join(DATA_DIR, f'corpus_{topic}.snap')
     
-    # Check if the pickle file exists to avoid recharacterizing the corpus
-    if os.path.exists(pkl_file_path):
-        with open(pkl_file_path, 'rb') as file:
-            corpus = pickle.load(file)
-        # logging.warn(f'Corpus loaded from {pkl_file_path}')
-    else:
+    # Check if the corpus is loaded or saved to avoid recharacterizing it
+    corpus = load_corpus(topic)
+    if corpus is None:
         try:
             for process in processes:
                 if process.get("type") is None or process.get("keyword") is None:
                     raise TypeError('Missing arguments')
-                process_type = process.get("type")
-                keyword = process.get("keyword")
-                quantity = process.get("quantity", 10)
-                
-                args = {
-                    "type_process": process_type,
-                    "keyword": keyword,
-                    "max_results": quantity
-                }
-                retrieved_documents = DocumentFactory(data=args).create_document()
-                document_collection = retrieved_documents.set_documents()
-                
-                corpus = Corpus()
-                
-                # Check if data is not empty
-                if len(document_collection) == 0:
-                    raise TypeError(f'No data provided by the API {process_type}')
-                for i in range(len(document_collection)):
-                    doc = document_collection[i]
+
+            reports = fetch_sources(processes, concurrent=concurrent, max_workers=max_workers)
+            for report in reports:
+                logging.info(f"{report['type']} fetched {len(report['documents'])} documents "
+                             f"in {report['elapsed']:.2f}s")
+            if all(report['error'] is not None for report in reports):
+                raise TypeError('No data provided by the APIs: '
+                                + ', '.join(report['error'] for report in reports))
+
+            corpus = Corpus()
+            if dedup_threshold is not None:
+                corpus.enable_deduplication(threshold=dedup_threshold)
+            for report in reports:
+                added = 0
+                for doc in report['documents']:
                     author = doc.author if doc.author is not None else 'Anonymous'
-                    corpus.add(author=author , doc=doc)
+                    if corpus.add(author=author , doc=doc) is not None:
+                        added += 1
+                report['duplicates'] = len(report['documents']) - added
+                if report['duplicates']:
+                    logging.info(f"{report['type']} skipped {report['duplicates']} near-duplicates")
+            corpus.ingestion_report = [
+                {
+                    'type': report['type'],
+                    'keyword': report['keyword'],
+                    'count': len(report['documents']),
+                    'duplicates': report['duplicates'],
+                    'elapsed': report['elapsed'],
+                    'error': report['error'],
+                }
+                for report in reports
+            ]
+            corpus.incomplete = any(report['error'] is not None for report in reports)
                     
         except TypeError as t:
             logging.error(t)
@@ -78,85 +233,226 @@ def search_documents(processes:list[dict]) -> Document:
         except ValueError as v:
             logging.error(v)
             raise ValueError
-    # Save the corpus to a pickle file
-    with open(pkl_file_path, 'wb') as file:
-        pickle.dump(corpus, file, fix_imports=False)
+        if corpus.incomplete:
+            logging.warning(f'Corpus {topic} is incomplete, it is not saved')
+            return corpus
+        # Save the corpus to a snapshot file
+        corpus.save_snapshot(snapshot_file_path)
+        corpus.index_path = os.path.join(DATA_DIR, f'corpus_{topic}.idx')
+        REGISTRY.put(registry_key(topic), corpus)
     return corpus
 
-def search_engine(collection:list, keywords:list):
+def search_engine(collection:list,
+                  keywords:list,
+                  index:InvertedIndex=None,
+                  ranking:str='cosine',
+                  top_k:int=None,
+                  offset:int=0,
+                  **ranking_params):
     """
     Search engine function that takes a collection of documents and a list of keywords,
     and returns a sorted list of documents ids based on their similarity to the keywords 
     and a score this is a custom IT-IDF.
 
+    Only the postings of the keywords are scored, so the cost of a query depends on
+    the documents containing the keywords rather than on the whole vocabulary.
+
     Args::
         collection (list): A list of documents.
         keywords (list): A list of keywords.
+        index (InvertedIndex, optional): The index built over the collection. If None,
+            it is built from the collection.
+        ranking (str, optional): The scoring function, one of 'cosine', 'bm25' or 'bm25f'.
+            Defaults to 'cosine'.
+        top_k (int, optional): The maximum number of results to return. Defaults to all.
+        offset (int, optional): The number of best results to skip. Defaults to 0.
+        **ranking_params: Parameters of the scoring function, such as `k1`, `b` or the
+            BM25F `field_weights`.
 
     Returns:
-        list: A sorted list of dictionaries containing the document URL, similarity score,
-              and document text.
+        list: A sorted list of dictionaries containing the document position in the
+              collection, its source and the similarity score.
+
+    Raises:
+        ValueError: If the ranking is not supported.
     """
-    
-    # Rest of the code...
-    
-    # Create a dict to store corpus vocabulary
-    # Getting Vocabulary
-    new_collection = dict()
-    vocab = list()
-    
-    for i, doc in enumerate(collection):
-        
-        new_collection[i] = dict()
-        
-        words = clean_paragraph(doc.text)
-        unique_words = set(words)
-        vocab += unique_words
-        word_counts = dict()
-        
-        for word in unique_words:
-            word_counts[word] = words.count(word)
-            
-        new_collection[i] = dict((('doc', doc), ('word_counts', word_counts)))
-    
-    vocab = list(set(vocab))
-    
-    mat_tf = csr_matrix((len(collection), len(vocab)), dtype=int).toarray()
+    results, _ = search_engine_page(collection, keywords, index=index, ranking=ranking,
+                                    top_k=top_k, offset=offset, **ranking_params)
+    return results
 
-    for i, doc in new_collection.items():
-        for j, word in enumerate(vocab):
-            if word in doc['word_counts'].keys():
-                mat_tf[i, j] += doc['word_counts'][word]
-                
-    query_vector = np.zeros((1, len(vocab)))
 
-    # Set the weights of the query vector based on the importance of the keywords
-    for i, word in enumerate(vocab):
-        if word in keywords:
-            query_vector[0, i] = 1  # Set the weight to 1 if the word is in the keywords
+@timed('search_engine')
+def search_engine_page(collection:list,
+                       keywords:list,
+                       index:InvertedIndex=None,
+                       ranking:str='cosine',
+                       top_k:int=None,
+                       offset:int=0,
+                       **ranking_params) -> Tuple[list, int]:
+    """
+    Rank the collection like `search_engine` and return one page of results with
+    the total number of hits.
 
-    # Calculate cosine similarity
-    similarity_scores = cosine_similarity(query_vector, mat_tf)
+    When `top_k` is given, only the best `offset + top_k` hits are selected with a
+    bounded heap instead of sorting every hit.
 
-    # Get indices of articles with highest similarity scores
-    top_articles_indices = np.argsort(similarity_scores)[0][::-1]
+    Args::
+        collection (list): A list of documents.
+        keywords (list): A list of keywords.
+        index (InvertedIndex, optional): The index built over the collection.
+        ranking (str, optional): The scoring function, one of 'cosine', 'bm25' or 'bm25f'.
+        top_k (int, optional): The size of the page. Defaults to all the hits.
+        offset (int, optional): The number of best results to skip. Defaults to 0.
+        **ranking_params: Parameters of the scoring function.
 
-    # Create a list to store the results
-    results = []
+    Returns:
+        tuple: The page of results as in `search_engine` and the total number of
+            documents with a positive score.
 
-    # Store the document URL, similarity score, and document text in a dictionary
-    for i in top_articles_indices:
-        result = {
+    Raises:
+        ValueError: If the ranking is not supported or the page is invalid.
+    """
+    scorers = {
+        'cosine': InvertedIndex.score_cosine,
+        'bm25': InvertedIndex.score_bm25,
+        'bm25f': InvertedIndex.score_bm25f,
+    }
+    if ranking not in scorers:
+        raise ValueError(f'Unsupported ranking: {ranking}')
+    if offset < 0 or (top_k is not None and top_k < 0):
+        raise ValueError('top_k and offset must be positive')
+
+    if index is None:
+        index = InvertedIndex(collection)
+
+    similarity_scores = scorers[ranking](index, keywords, **ranking_params)
+
+    # filter out results with 0 similarity score and keep the requested page
+    hits = [(i, score) for i, score in similarity_scores.items() if score > 0]
+    rank_key = lambda x: (-x[1], x[0])
+    if top_k is None:
+        sorted_scores = sorted(hits, key=rank_key)[offset:]
+    else:
+        sorted_scores = heapq.nsmallest(offset + top_k, hits, key=rank_key)[offset:]
+
+    page = [
+        {
             'id': i,
             'source': collection[i].source,
-            'score': similarity_scores[0, i],
+            'score': score,
         }
-        results.append(result)
+        for i, score in sorted_scores
+    ]
+
+    return page, len(hits)
+
+
+def _freeze(value):
+    """
+    Convert the lists and dictionaries of a ranking parameter to hashable tuples.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
 
-    # sort results and filter out results with 0 similarity score
-    sorted_scores = sorted(results, key=lambda x: x['score'], reverse=True)
-    filtered_results = list(filter(lambda x: x['score'] > 0, sorted_scores))
-    
 
-    return filtered_results
+def search_corpus(corpus:Corpus,
+                  keywords:list,
+                  ranking:str='cosine',
+                  top_k:int=None,
+                  offset:int=0,
+                  **ranking_params) -> Tuple[list, int]:
+    """
+    Rank the documents of a corpus like `search_engine_page`, through the `SEARCH_CACHE`.
+
+    Pages are cached by corpus, corpus version, keywords and ranking parameters.
+    Adding documents to the corpus changes its version, so the pages computed
+    before are not served anymore and age out of the cache.
+
+    Args::
+        corpus (Corpus): The corpus to search.
+        keywords (list): A list of keywords, as returned by `clean_paragraph`.
+        ranking (str, optional): The scoring function, one of 'cosine', 'bm25' or 'bm25f'.
+        top_k (int, optional): The size of the page. Defaults to all the hits.
+        offset (int, optional): The number of best results to skip. Defaults to 0.
+        **ranking_params: Parameters of the scoring function.
+
+    Returns:
+        tuple: The page of results as in `search_engine` and the total number of hits.
+
+    Raises:
+        ValueError: If the ranking is not supported or the page is invalid.
+    """
+    # Rankings score the set of keywords, whatever their order and repetitions
+    key = (corpus.uid, corpus.version, len(corpus.documents), tuple(sorted(set(keywords))),
+           ranking, top_k, offset, _freeze(ranking_params))
+    cached = SEARCH_CACHE.get(key)
+    if cached is None:
+        cached = search_engine_page(corpus.docs_to_collection(), keywords,
+                                    index=corpus.get_index(), ranking=ranking,
+                                    top_k=top_k, offset=offset, **ranking_params)
+        SEARCH_CACHE.put(key, cached)
+    page, total_hits = cached
+    # Callers may edit their results, the cached page is kept intact
+    return [dict(result) for result in page], total_hits
+
+
+@timed('search_topics')
+def search_topics(topics:list,
+                  keywords:list,
+                  ranking:str='cosine',
+                  top_k:int=None,
+                  offset:int=0,
+                  concurrent:bool=True,
+                  max_workers:int=None,
+                  **ranking_params) -> Tuple[list, int]:
+    """
+    Search the corpora of several topics and merge their ranked results.
+
+    Each topic corpus is searched with its own index, in parallel threads unless
+    `concurrent` is False. Scores are computed per corpus, with the document
+    frequencies of that corpus. Topics without a saved corpus are skipped.
+
+    Args::
+        topics (list): The topics to search, loaded with `load_corpus`.
+        keywords (list): A list of keywords.
+        ranking (str, optional): The scoring function, one of 'cosine', 'bm25' or 'bm25f'.
+        top_k (int, optional): The size of the page. Defaults to all the hits.
+        offset (int, optional): The number of best results to skip. Defaults to 0.
+        concurrent (bool, optional): Search the topics in parallel. Defaults to True.
+        max_workers (int, optional): The number of searching threads.
+        **ranking_params: Parameters of the scoring function.
+
+    Returns:
+        tuple: The page of results, with the 'topic', the corpus 'id', the 'source'
+            and the 'score' of each document, and the total number of hits.
+
+    Raises:
+        ValueError: If the ranking is not supported or the page is invalid.
+    """
+    shard_size = None if top_k is None else offset + top_k
+
+    def search_topic(topic):
+        corpus = load_corpus(topic)
+        if corpus is None:
+            logging.warning(f'No saved corpus for topic {topic}')
+            return [], 0
+        page, total_hits = search_corpus(corpus, keywords, ranking=ranking,
+                                         top_k=shard_size, **ranking_params)
+        doc_ids = list(corpus.documents.keys())
+        return [{'topic': topic, 'id': doc_ids[result['id']], 'source': result['source'],
+                 'score': result['score']} for result in page], total_hits
+
+    topics = list(dict.fromkeys(topics))
+    if concurrent and len(topics) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers or len(topics)) as executor:
+            shards = list(executor.map(search_topic, topics))
+    else:
+        shards = [search_topic(topic) for topic in topics]
 
+    # Shard pages are sorted by decreasing score, ties keep the order of the topics
+    merged = heapq.merge(*(page for page, _ in shards), key=lambda result: -result['score'])
+    page = list(islice(merged, offset, None if top_k is None else offset + top_k))
+    return page, sum(total_hits for _, total_hits in shards)
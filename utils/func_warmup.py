@@ -0,0 +1,121 @@
+import os
+import re
+import glob
+import time
+import logging
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from utils.func_processing import cached_similarity_neighbors
+from utils import func_retrieval
+from utils.func_retrieval import load_corpus
+
+CORPUS_FILE_PATTERN = re.compile(r'corpus_(.+)\.(?:pkl|snap)$')
+
+
+def corpus_topics(data_dir:str=None) -> list[str]:
+    """
+    List the topics having a saved corpus.
+
+    Args:
+        data_dir (str, optional): The directory of the corpus files. Defaults to
+            the `DATA_DIR` of `utils.func_retrieval`.
+
+    Returns:
+        list: The sorted topics of the `corpus_<topic>.pkl` and `corpus_<topic>.snap` files.
+    """
+    data_dir = func_retrieval.DATA_DIR if data_dir is None else data_dir
+    topics = set()
+    for file_path in glob.glob(os.path.join(data_dir, 'corpus_*')):
+        match = CORPUS_FILE_PATTERN.search(os.path.basename(file_path))
+        if match:
+            topics.add(match.group(1))
+    return sorted(topics)
+
+
+def warm_topic(topic:str, data_dir:str=None, k:int=3, in_memory:bool=True) -> dict:
+    """
+    Load the corpus of a topic and build its search index and similarity neighbors.
+
+    Both are persisted next to the corpus, see `Corpus.get_index` and
+    `cached_similarity_neighbors`, and kept in memory by the calling process.
+    With `in_memory`, the tokens and term statistics read by the queries, which
+    are not persisted, are built as well.
+
+    Args:
+        topic (str): The topic of the corpus.
+        data_dir (str, optional): The directory of the corpus files.
+        k (int, optional): The number of similarity neighbors per document. Defaults to 3.
+        in_memory (bool, optional): Build the tokens and term statistics. Defaults to True.
+
+    Returns:
+        dict: The warm-up report of the topic with the following keys:
+            - topic (str): The topic.
+            - documents (int): The number of documents of the corpus.
+            - ready (bool): Whether the corpus is loaded with its structures built.
+            - elapsed (float): The time spent, in seconds.
+            - error (str): The error message, or None if the warm-up succeeded
+                or the topic has no saved corpus.
+    """
+    data_dir = func_retrieval.DATA_DIR if data_dir is None else data_dir
+    report = {'topic': topic, 'documents': 0, 'ready': False, 'error': None}
+    start = time.perf_counter()
+    try:
+        corpus = load_corpus(topic, data_dir)
+        if corpus is not None:
+            corpus.get_index()
+            if in_memory:
+                corpus.get_term_stats()
+            cached_similarity_neighbors(corpus.to_dataframe(), k=k,
+                                        content_hash=corpus.content_hash(), cache_dir=data_dir,
+                                        tfidf_matrix=corpus.get_index().tfidf_matrix)
+            report['documents'] = len(corpus.documents)
+            report['ready'] = True
+    except Exception as e:
+        # A failing topic must not abort the warm-up of the other ones
+        logging.error(f'{topic} warm-up failed: {e}')
+        report['error'] = f'{type(e).__name__}: {e}'
+    report['elapsed'] = time.perf_counter() - start
+    return report
+
+
+def warm_up(topics:list[str]=None,
+            data_dir:str=None,
+            k:int=3,
+            concurrent:bool=True,
+            max_workers:int=None) -> list[dict]:
+    """
+    Warm up the saved corpora before serving queries.
+
+    The search indexes and similarity neighbors of the topics are built in parallel
+    worker processes, which persist them. The corpora are then loaded with their
+    persisted structures in the calling process, where their tokens and term
+    statistics are built, so a first query on a topic does not build anything.
+
+    Args:
+        topics (list, optional): Topics to warm up in addition to the saved corpora
+            of `corpus_topics`. Topics without a saved corpus are reported as not ready.
+        data_dir (str, optional): The directory of the corpus files.
+        k (int, optional): The number of similarity neighbors per document. Defaults to 3.
+        concurrent (bool, optional): Build the topics in a process pool. Defaults to True.
+        max_workers (int, optional): The size of the process pool.
+
+    Returns:
+        list: The reports of `warm_topic`, in the order of the topics.
+    """
+    start = time.perf_counter()
+    topics = list(dict.fromkeys(corpus_topics(data_dir) + list(topics or [])))
+
+    if concurrent and len(topics) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            reports = list(executor.map(warm_topic, topics, repeat(data_dir), repeat(k), repeat(False)))
+        # Load the structures persisted by the workers in this process
+        reports = [warm_topic(report['topic'], data_dir, k) if report['ready'] else report
+                   for report in reports]
+    else:
+        reports = [warm_topic(topic, data_dir, k) for topic in topics]
+
+    ready = [report for report in reports if report['ready']]
+    logging.info(f'Warm-up ready: {len(ready)} of {len(reports)} topics, '
+                 f'{sum(report["documents"] for report in ready)} documents '
+                 f'in {time.perf_counter() - start:.2f}s')
+    return reports
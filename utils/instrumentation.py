@@ -0,0 +1,161 @@
+import json
+import time
+import logging
+import functools
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Tuple
+from modules.metrics import MetricsRegistry
+
+# Latency histograms of the stages recorded in this process
+METRICS = MetricsRegistry()
+logger = logging.getLogger('instrumentation')
+
+_enabled = False
+_log = False
+_no_span = nullcontext()
+_current_span = ContextVar('current_span', default=None)
+_collected_spans = ContextVar('collected_spans', default=None)
+
+
+def enable(log:bool=True) -> None:
+    """
+    Enable the recording of spans. Worker processes forked afterwards record
+    their spans too.
+
+    Args:
+        log (bool, optional): Also log every span as a JSON line on the
+            'instrumentation' logger. Defaults to True.
+    """
+    global _enabled, _log
+    _enabled = True
+    _log = log
+    if log and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def disable() -> None:
+    """
+    Disable the recording of spans, `span` and `timed` then cost a flag check.
+    """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    """
+    Returns:
+        bool: Whether spans are recorded.
+    """
+    return _enabled
+
+
+@contextmanager
+def _record_span(name:str, fields:dict):
+    """
+    Time the enclosed code, count it in `METRICS` and log it.
+    """
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    status = 'ok'
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        METRICS.observe(name, duration)
+        collected = _collected_spans.get()
+        if collected is not None:
+            collected.append((name, duration))
+        if _log:
+            logger.info(json.dumps({'span': name, 'parent': parent, 'duration': duration,
+                                    'status': status, **fields}, default=str))
+
+
+def span(name:str, **fields):
+    """
+    Record the duration of the enclosed code as a stage:
+
+        with span('tokenize', documents=len(texts)):
+            ...
+
+    Args:
+        name (str): The name of the stage.
+        **fields: Values added to the logged span.
+
+    Returns:
+        A context manager, doing nothing when instrumentation is disabled.
+    """
+    if not _enabled:
+        return _no_span
+    return _record_span(name, fields)
+
+
+def timed(name:str=None) -> Callable:
+    """
+    Decorator recording the duration of every call of a function as a stage.
+
+    Args:
+        name (str, optional): The name of the stage. Defaults to the function name.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(function:Callable) -> Callable:
+        stage = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _record_span(stage, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_spans():
+    """
+    Collect the spans recorded in the enclosed code, for instance to send the
+    spans of a worker process back to the process serving the metrics.
+
+    Yields:
+        list: The name and duration of each recorded span, filled as they end.
+    """
+    spans = []
+    token = _collected_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _collected_spans.reset(token)
+
+
+def record_spans(spans:List[Tuple[str, float]]) -> None:
+    """
+    Count spans recorded in another process in `METRICS`.
+
+    Args:
+        spans (list): The name and duration of each span, as given by `collect_spans`.
+    """
+    for name, duration in spans:
+        METRICS.observe(name, duration)
+
+
+def record_counters(counters:Dict[str, int]) -> None:
+    """
+    Add counts of another process to the counters of `METRICS`.
+
+    Args:
+        counters (dict): The increment of each counter.
+    """
+    for counter, value in counters.items():
+        METRICS.increment(counter, value)
@@ -1,17 +1,13 @@
 import os
 import re
 import string
-from typing import List
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, FrozenSet, Iterable, Iterator, List
 import nltk
-from nltk.tokenize import RegexpTokenizer
 from nltk.corpus import stopwords
 
-try:
-    from nltk.corpus import stopwords
-except ImportError:
-    nltk.download('stopwords')
-    from nltk.corpus import stopwords
-
 from modules.auth import RedditAuth
 
         
@@ -41,6 +37,79 @@ def set_vars() -> RedditAuth:
 
 
 
+class Tokenizer:
+    """
+    Class representing the compiled tokenizer behind `clean_paragraph`.
+
+    The token pattern, the punctuation table and the stopwords are built once,
+    and every text is cleaned in a single pass over its tokens.
+    """
+
+    # Same pattern and flags as nltk `RegexpTokenizer(r"\w'|\w+|[^\w\s]")`
+    TOKEN_PATTERN = re.compile(r'''\w'|\w+|[^\w\s]''', re.UNICODE | re.MULTILINE | re.DOTALL)
+    PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+    def __init__(self, language: str = 'english') -> None:
+        """
+        Initialize a Tokenizer object.
+
+        Args:
+            language (str): The language of the nltk stopwords.
+        """
+        self.language = language
+        self.__stopwords = None
+
+    @property
+    def stopwords(self) -> FrozenSet[str]:
+        """
+        Returns:
+            frozenset: The stopwords, loaded on first use.
+        """
+        if self.__stopwords is None:
+            try:
+                words = stopwords.words(self.language)
+            except LookupError:
+                nltk.download('stopwords', quiet=True)
+                words = stopwords.words(self.language)
+            self.__stopwords = frozenset(words)
+        return self.__stopwords
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        Clean a text into lower case tokens without punctuation and stopwords.
+
+        Args:
+            text (str): The text to be cleaned.
+
+        Returns:
+            List[str]: The cleaned tokens.
+        """
+        stopwords_set = self.stopwords
+        table = self.PUNCTUATION_TABLE
+        # Punctuation tokens are at most two characters long, so the length
+        # filter also drops them
+        return [
+            token.translate(table).lower()
+            for token in self.TOKEN_PATTERN.findall(text)
+            if len(token) > 2 and token not in stopwords_set
+        ]
+
+    def tokenize_many(self, texts: Iterable[str]) -> List[List[str]]:
+        """
+        Clean several texts.
+
+        Args:
+            texts (list): The texts to be cleaned.
+
+        Returns:
+            List[List[str]]: The cleaned tokens of each text.
+        """
+        return [self.tokenize(text) for text in texts]
+
+
+TOKENIZER = Tokenizer()
+
+
 def clean_paragraph(text: str) -> List[str]:
     """
     Cleans the given text by removing special characters, punctuation, and stopwords.
@@ -51,18 +120,55 @@ def clean_paragraph(text: str) -> List[str]:
     Returns:
         List[str]: The cleaned text as list.
     """
+    return TOKENIZER.tokenize(text)
 
-    stopwords_set = set(stopwords.words('english'))
-    
-    # Separing, removing all special characters and not used words in tokenized text
-    token = RegexpTokenizer(r'''\w'|\w+|[^\w\s]''')
-    tokens = token.tokenize(text)
-    tokens = [token for token in tokens if token not in string.punctuation]
-    tokens = [token for token in tokens if token not in stopwords_set]
-    tokens = [token for token in tokens if len(token) > 2]
-    tokens = [token.translate(str.maketrans('', '', string.punctuation)).lower() for token in tokens]
-    
-    return tokens
+
+def hash_documents(documents: Iterable[tuple]) -> str:
+    """
+    Hash the fields of a sequence of documents.
+
+    Args:
+        documents (list): The documents as tuples of fields, such as
+            (id, source, title, text).
+
+    Returns:
+        str: The SHA-256 hex digest of the documents.
+    """
+    digest = hashlib.sha256()
+    for fields in documents:
+        for value in fields:
+            digest.update(str(value).encode('utf-8'))
+            digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_open(path: str) -> Iterator[BinaryIO]:
+    """
+    Open a file to replace atomically, so readers and concurrent writers of
+    the path only ever see a complete file:
+
+        with atomic_open(path) as file:
+            pickle.dump(value, file)
+
+    The content is written to a unique temporary file of the same directory,
+    which replaces the path once the block succeeds and is removed otherwise.
+
+    Args:
+        path (str): The path of the file to write.
+
+    Yields:
+        BinaryIO: The temporary file, opened for binary writing.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            yield file
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 def clean_text(text: str) -> str: